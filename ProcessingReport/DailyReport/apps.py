@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DailyreportConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'DailyReport'
+
+    def ready(self):
+        from . import dashboard_cache  # noqa: F401  (connects the invalidation receiver)
@@ -0,0 +1,78 @@
+"""Management dashboard for ASGI servers: cards computed concurrently, streamed in order.
+
+A page of projects is split into chunks of ``DASHBOARD_ASYNC_CHUNK`` projects.
+Each chunk is computed and rendered (``cached_dashboard_data`` plus the card
+template) in a worker thread, with at most ``DASHBOARD_ASYNC_CONCURRENCY``
+chunks in flight. The page head goes out at once, and cards follow in page
+order as soon as every chunk before them is ready.
+
+Worker threads are not request threads, so each one closes its database
+connection when it is done (``close_old_connections`` honours CONN_MAX_AGE).
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+
+from .dashboard_cache import cached_dashboard_data
+from .metrics import compute_metrics
+from .models import ProjectAccess
+
+
+CARD_TEMPLATE = 'dashboard_card.html'
+
+
+def render_cards(today, project_ids):
+    """Rendered dashboard cards of ``project_ids``, in id order."""
+    try:
+        blocks, _, _ = cached_dashboard_data(
+            today, ProjectAccess.objects.filter(pk__in=project_ids).order_by('id'))
+        return [render_to_string(CARD_TEMPLATE, {'item': block, 'today': today}) for block in blocks]
+    finally:
+        close_old_connections()
+
+
+def project_detail(project_id, today):
+    """Activity tables and summary of one project (the card body)."""
+    try:
+        project = get_object_or_404(ProjectAccess, id=project_id)
+        frame = compute_metrics([project.id], today)
+        return {
+            'project_id': project.id,
+            'today': today,
+            **frame.project_activities(project.id),
+            **frame.project_summary(project.id),
+        }
+    finally:
+        close_old_connections()
+
+
+async def project_detail_async(project_id, today):
+    return await sync_to_async(project_detail, thread_sensitive=False)(project_id, today)
+
+
+async def iter_cards(today, project_ids, chunk_size=None, concurrency=None):
+    """Rendered cards of ``project_ids`` in the given order, computed chunk-wise in parallel."""
+    chunk_size = chunk_size or getattr(settings, 'DASHBOARD_ASYNC_CHUNK', 5)
+    semaphore = asyncio.Semaphore(concurrency or getattr(settings, 'DASHBOARD_ASYNC_CONCURRENCY', 2))
+    render = sync_to_async(render_cards, thread_sensitive=False)
+
+    async def chunk_cards(chunk):
+        async with semaphore:
+            return await render(today, chunk)
+
+    tasks = [
+        asyncio.ensure_future(chunk_cards(project_ids[start:start + chunk_size]))
+        for start in range(0, len(project_ids), chunk_size)
+    ]
+    try:
+        for task in tasks:
+            for card in await task:
+                yield card
+    finally:
+        # The client went away: drop the chunks that have not started yet.
+        for task in tasks:
+            task.cancel()
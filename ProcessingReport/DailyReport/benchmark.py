@@ -0,0 +1,279 @@
+"""View benchmarks over synthetic portfolios (see ``manage.py run_benchmarks``).
+
+Each scenario drives one view through the test client and records wall time
+(min/median/max over the repeats), the time until the first project card
+arrived (on pages made of cards), the response size, the number of SQL queries
+and the peak Python memory allocated during one extra traced run. Async views go through the
+ASGI test client; their queries run in worker threads and are not counted.
+
+``editor_payloads`` compares the plan editor's columnar payload with the
+per-item objects it replaced, under both JSON serializers.
+"""
+import json
+from statistics import median
+import time
+import tracemalloc
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import AsyncClient, Client
+from django.utils import timezone
+
+from .dashboard_cache import dashboard_cache
+from .editor_payload import _orjson_dumps, _std_dumps, build_plan_payload, orjson
+from .metrics import compute_metrics
+from .models import ProgressItem, ProjectAccess, Section
+from .pdf import prune_cache
+from .profiling import QueryCounter
+from .synthetic import USER_PREFIX, generate_portfolio
+
+
+CARD_MARKER = b'<div class="card mb-4'
+
+
+def plan_payload(project):
+    """The planning editor form for ``project`` exactly as saved (a no-op save)."""
+    payload = {'project_id': project.id}
+    sections = list(Section.objects.filter(project=project).prefetch_related('items').order_by('id'))
+    payload['total_sections'] = len(sections)
+    for idx, section in enumerate(sections):
+        payload[f'section_id_{idx}'] = section.id
+        payload[f'section_title_{idx}'] = section.title
+        items = sorted(section.items.all(), key=lambda item: (item.order, item.id))
+        columns = {
+            'item_id': [item.id for item in items],
+            'description': [item.description for item in items],
+            'uom': [item.uom for item in items],
+            'scope': ['' if item.scope is None else item.scope for item in items],
+            'targeted_start_date': [d.strftime('%d-%m-%Y') if d else '' for d in (item.targeted_start_date for item in items)],
+            'targeted_end_date': [d.strftime('%d-%m-%Y') if d else '' for d in (item.targeted_end_date for item in items)],
+        }
+        for name, values in columns.items():
+            payload[f'{name}_{idx}[]'] = values
+    return payload
+
+
+def patch_payload(project, run):
+    """A one-cell plan edit for the row-level endpoint: the first item's scope."""
+    item = ProgressItem.objects.filter(section__project=project).order_by('id').first()
+    version = ProjectAccess.objects.values_list('plan_version', flat=True).get(pk=project.pk)
+    return json.dumps({'version': version, 'ops': [
+        {'op': 'update', 'type': 'item', 'id': item.id, 'values': {'scope': str((item.scope or 0) + run + 1)}},
+    ]})
+
+
+def progress_payload(project, run):
+    item_ids = ProgressItem.objects.filter(section__project=project).values_list('id', flat=True)
+    return {f'progress_{item_id}': str(run % 3 + 1) for item_id in item_ids}
+
+
+def scenarios():
+    """``(name, prepare, request)`` triples; ``prepare(ctx, run)`` runs untimed before each call."""
+    def clear_dashboard(ctx, run):
+        dashboard_cache().clear()
+
+    def clear_pdfs(ctx, run):
+        prune_cache(max_bytes=0)
+
+    def plan(ctx, run):
+        ctx['payload'] = plan_payload(ctx['project'])
+
+    def patch(ctx, run):
+        ctx['payload'] = patch_payload(ctx['project'], run)
+
+    def progress(ctx, run):
+        ctx['payload'] = progress_payload(ctx['project'], run)
+
+    def nothing(ctx, run):
+        pass
+
+    project_url = lambda ctx: f"/custom-admin/project-sections/?project_id={ctx['project'].id}"
+    return [
+        ('admin_dashboard', clear_dashboard, lambda ctx: ctx['admin'].get('/admin-dashboard/')),
+        ('admin_dashboard_cached', nothing, lambda ctx: ctx['admin'].get('/admin-dashboard/')),
+        ('admin_dashboard_stream', clear_dashboard,
+         lambda ctx: async_to_sync(ctx['admin_async'].get)('/admin-dashboard/stream/')),
+        ('admin_dashboard_stream_cached', nothing,
+         lambda ctx: async_to_sync(ctx['admin_async'].get)('/admin-dashboard/stream/')),
+        ('admin_project_sections_get', nothing, lambda ctx: ctx['admin'].get(project_url(ctx))),
+        ('admin_project_sections_post', plan,
+         lambda ctx: ctx['admin'].post('/custom-admin/project-sections/', ctx['payload'])),
+        ('admin_project_sections_patch', patch,
+         lambda ctx: ctx['admin'].patch(f"/custom-admin/project-sections/{ctx['project'].id}/rows/",
+                                        ctx['payload'], content_type='application/json')),
+        ('user_project_sections_get', nothing, lambda ctx: ctx['user'].get('/user/sections/')),
+        ('user_project_sections_post', progress,
+         lambda ctx: ctx['user'].post('/user/sections/', ctx['payload'])),
+        ('export_project_pdf', clear_pdfs, lambda ctx: ctx['admin'].get(f"/export-pdf/{ctx['project'].id}/")),
+        ('export_project_pdf_cached', nothing, lambda ctx: ctx['admin'].get(f"/export-pdf/{ctx['project'].id}/")),
+        ('project_rollup', nothing, lambda ctx: ctx['admin'].get(f"/projects/{ctx['project'].id}/rollup/")),
+        ('project_rollup_report', nothing,
+         lambda ctx: ctx['admin'].get(f"/projects/{ctx['project'].id}/rollup/report/?period=week")),
+    ]
+
+
+def row_payload(sections, metrics):
+    """The plan editor data as it was sent before the columnar payload: one object per item."""
+    def format_date(day):
+        return day.strftime("%d-%m-%Y") if day else ''
+
+    sections_data = []
+    for section in sections:
+        section_items = []
+        for item in sorted(section.items.all(), key=lambda item: item.order if item.order is not None else 0):
+            values = {'expected_today': 'N/A', 'today_progress': 0, 'completed': 0, 'balance': 'N/A',
+                      'status': 'Missing Dates'}
+            if item.targeted_start_date and item.targeted_end_date and item.scope is not None:
+                values = metrics.item(item.id)
+            section_items.append({
+                'id': item.id,
+                'description': item.description,
+                'uom': item.uom,
+                'order': item.order,
+                'scope': item.scope,
+                'targeted_start_date': format_date(item.targeted_start_date),
+                'targeted_end_date': format_date(item.targeted_end_date),
+                'expected_today': values['expected_today'],
+                'today_progress': values['today_progress'],
+                'completed': values['completed'],
+                'balance': values['balance'],
+                'status': values['status'],
+                'actual_start_date': format_date(item.scope_assigned_date),
+                'actual_end_date': format_date(item.scope_completed_date),
+            })
+        sections_data.append({'id': section.id, 'title': section.title, 'items': section_items})
+    return sections_data
+
+
+def editor_payloads(project, repeat):
+    """Size and build/serialize time of ``project``'s plan editor data, row vs columnar, json vs orjson.
+
+    ``rows_json`` is what the editor page embedded before (``json.dumps``
+    with its defaults). orjson figures are left out when it is not installed.
+    """
+    sections = list(Section.objects.filter(project=project).prefetch_related('items'))
+    metrics = compute_metrics([project.id], timezone.now().date())
+    builds = {
+        'rows': lambda: row_payload(sections, metrics),
+        'columnar': lambda: build_plan_payload(sections, metrics, project.plan_version),
+    }
+    serializers = {'json': {'rows': json.dumps, 'columnar': _std_dumps}}
+    if orjson is not None:
+        serializers['orjson'] = {'rows': _orjson_dumps, 'columnar': _orjson_dumps}
+
+    def timed(fn, *args):
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn(*args)
+            times.append(time.perf_counter() - started)
+        return result, round(median(times) * 1000, 2)
+
+    results = {}
+    for layout, build in builds.items():
+        data, build_ms = timed(build)
+        for name, dumps in serializers.items():
+            text, dumps_ms = timed(dumps[layout], data)
+            results[f'{layout}_{name}'] = {
+                'kb': round(len(text.encode()) / 1024, 1),
+                'build_ms': build_ms,
+                'dumps_ms': dumps_ms,
+            }
+    return results
+
+
+def _consume(response, started):
+    """Read the whole response; returns its status, when the first card arrived and its size."""
+    first_card = None
+    size = 0
+
+    def chunk(data):
+        nonlocal first_card, size
+        size += len(data)
+        if first_card is None and CARD_MARKER in data:
+            first_card = time.perf_counter() - started
+
+    async def read_async():
+        async for data in response.streaming_content:
+            chunk(data)
+
+    if not response.streaming:
+        chunk(response.content)
+    elif getattr(response, 'is_async', False):
+        async_to_sync(read_async)()
+    else:
+        for data in response.streaming_content:
+            chunk(data)
+    return response.status_code, first_card, size
+
+
+def _reset_clients(ctx):
+    # A flash message left by a POST would change how the next request is served.
+    for client in (ctx['admin'], ctx['admin_async'], ctx['user']):
+        client.cookies.pop('messages', None)
+
+
+def run_scenarios(repeat, only=None):
+    """Run every scenario against the first synthetic project; returns ``{name: figures}``."""
+    project = ProjectAccess.objects.filter(user__username__startswith=USER_PREFIX).order_by('id').first()
+    ctx = {'project': project, 'admin': Client(), 'admin_async': AsyncClient(), 'user': Client()}
+    admin = User.objects.get(username=f'{USER_PREFIX}admin')
+    ctx['admin'].force_login(admin)
+    ctx['admin_async'].force_login(admin)
+    ctx['user'].force_login(project.user)
+
+    results = {}
+    for name, prepare, request in scenarios():
+        if only and name not in only:
+            continue
+        times, first_cards, queries, sizes, statuses = [], [], [], [], set()
+        for run in range(repeat):
+            _reset_clients(ctx)
+            prepare(ctx, run)
+            with QueryCounter() as counter:
+                started = time.perf_counter()
+                status, first_card, size = _consume(request(ctx), started)
+                times.append(time.perf_counter() - started)
+            statuses.add(status)
+            sizes.append(size)
+            queries.append(counter.count)
+            if first_card is not None:
+                first_cards.append(first_card)
+
+        _reset_clients(ctx)
+        prepare(ctx, repeat)
+        tracemalloc.start()
+        try:
+            _consume(request(ctx), time.perf_counter())
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        results[name] = {
+            'status': sorted(statuses),
+            'wall_ms': {
+                'min': round(min(times) * 1000, 2),
+                'median': round(median(times) * 1000, 2),
+                'max': round(max(times) * 1000, 2),
+            },
+            'first_card_ms': round(median(first_cards) * 1000, 2) if first_cards else None,
+            'response_kb': round(max(sizes) / 1024, 1),
+            'queries': max(queries),
+            'peak_kb': round(peak / 1024, 1),
+        }
+    return results
+
+
+def run_scale(scale, repeat, only=None, seed=0):
+    """Flush the database, generate one synthetic ``scale`` and benchmark it.
+
+    Returns the report entry: the scale, the generated row counts, the
+    figures of each scenario and the editor payload comparison.
+    """
+    call_command('flush', interactive=False, verbosity=0)
+    dashboard_cache().clear()
+    rows = generate_portfolio(**scale, seed=seed)
+    project = ProjectAccess.objects.filter(user__username__startswith=USER_PREFIX).order_by('id').first()
+    return {**scale, 'rows': rows, 'scenarios': run_scenarios(repeat, only),
+            'editor_payload': editor_payloads(project, repeat)}
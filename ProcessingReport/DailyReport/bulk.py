@@ -0,0 +1,13 @@
+from django.db import connections
+
+
+def upsert_options(unique_fields, update_fields, using='default'):
+    """``bulk_create`` kwargs that upsert on ``unique_fields`` on any backend.
+
+    MySQL cannot name the conflict target (it upserts on any unique key), so
+    ``unique_fields`` is only passed where the backend supports it.
+    """
+    options = {'update_conflicts': True, 'update_fields': list(update_fields)}
+    if connections[using].features.supports_update_conflicts_with_target:
+        options['unique_fields'] = list(unique_fields)
+    return options
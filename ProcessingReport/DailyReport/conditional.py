@@ -0,0 +1,133 @@
+"""Conditional GET for pages that only change with their projects.
+
+Every write under a project bumps ``ProjectAccess.version`` (see
+``touch_projects``), so a page's ETag can be built from the versions it shows
+plus the user, the current date and the CSRF secret, read with one small
+query. A browser revalidating an unchanged page then gets ``304 Not Modified``
+before the view computes anything.
+"""
+from datetime import datetime, time
+from functools import wraps
+import hashlib
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.http import HttpResponse
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import ProjectAccess
+
+
+def portfolio_state(request, *args, **kwargs):
+    """Tag and last change over all projects: any edit, addition or removal changes it."""
+    state = ProjectAccess.objects.aggregate(
+        n=Count('id'), versions=Sum('version'), last_id=Max('id'), modified=Max('modified_at'))
+    if not state['n']:
+        return None
+    return f"{state['n']}.{state['versions']}.{state['last_id']}", state['modified']
+
+
+def project_state(project_filter):
+    """State function for the one project matched by ``project_filter(request, ...)``."""
+    def state(request, *args, **kwargs):
+        row = (ProjectAccess.objects.filter(**project_filter(request, *args, **kwargs))
+               .values_list('id', 'version', 'modified_at').first())
+        if row is None:
+            return None
+        return f"{row[0]}.{row[1]}", row[2]
+    return state
+
+
+def query_part(name):
+    """ETag part for a numeric query parameter (page number, selected project)."""
+    def part(request):
+        return f"-{name}{''.join(filter(str.isdigit, request.GET.get(name, '')))}"
+    return part
+
+
+def csrf_part(request):
+    """Short digest of the CSRF secret and session key.
+
+    Pages carry ``{% csrf_token %}`` forms, and Django rotates the secret on
+    login; a page cached before a logout must not be revalidated after it.
+    """
+    if settings.CSRF_USE_SESSIONS:
+        secret = ''
+    else:
+        secret = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    session = getattr(request, 'session', None)
+    key = f"{secret}:{session.session_key if session is not None else ''}"
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+def project_condition(scope, state_func, extra=None):
+    """``condition`` decorator driven by ``state_func(request, ...) -> (tag, modified_at)``.
+
+    ``extra(request)`` adds request-specific parts to the ETag (page, selected
+    project); returning ``None`` from it or from ``state_func`` skips the
+    conditional handling. Responses are marked ``private, no-cache`` so
+    browsers always revalidate instead of guessing a freshness lifetime.
+    """
+    def state(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+            # Flash messages are shown once; such a response is never reusable.
+            return None
+        if not hasattr(request, '_project_state'):
+            parts = extra(request) if extra else ''
+            current = state_func(request, *args, **kwargs) if parts is not None else None
+            request._project_state = current and (parts, *current)
+        return request._project_state
+
+    def etag(request, *args, **kwargs):
+        current = state(request, *args, **kwargs)
+        if current is None:
+            return None
+        parts, tag, _ = current
+        today = timezone.now().date().isoformat()
+        return f"{scope}-u{request.user.pk}-{tag}-{today}-c{csrf_part(request)}{parts}"
+
+    def last_modified(request, *args, **kwargs):
+        current = state(request, *args, **kwargs)
+        if current is None:
+            return None
+        # Pages show "today" figures, so they also change at midnight.
+        midnight = timezone.make_aware(datetime.combine(timezone.now().date(), time.min))
+        return max(current[2], midnight)
+
+    conditional = condition(etag_func=etag, last_modified_func=last_modified)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            return async_decorator(view)
+        view_with_condition = conditional(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view_with_condition(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+
+    def async_decorator(view):
+        # ``condition`` would call the state functions (database queries) on
+        # the event loop, so the check runs in a thread against a stand-in view.
+        check = sync_to_async(conditional(lambda request, *args, **kwargs: HttpResponse()))
+
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            checked = await check(request, *args, **kwargs)
+            response = checked if checked.status_code != 200 else await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                for header in ('ETag', 'Last-Modified'):
+                    if header in checked and header not in response:
+                        response[header] = checked[header]
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
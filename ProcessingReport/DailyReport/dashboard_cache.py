@@ -0,0 +1,110 @@
+"""Per-project cache of the management dashboard cards.
+
+Two entries per project and day, both in the ``dashboard`` cache:
+
+* the computed summary block, stored with the project version it was built
+  from, so a block computed while a write was committing is never reused;
+* the rendered card HTML (``{% cache %}`` fragment ``dashboard_card``), which
+  is trusted only when the block was a hit and is dropped whenever the block
+  is rebuilt.
+
+``project_changed`` (sent after every committed write under a project)
+deletes both entries of that project, and hits and misses are counted in the
+cache itself so every worker reports the same figures.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .metrics import build_dashboard_data
+from .models import ProjectAccess
+from .signals import project_changed
+
+
+CACHE_ALIAS = 'dashboard'
+FRAGMENT_NAME = 'dashboard_card'
+HITS_KEY = 'dashboard:stats:hits'
+MISSES_KEY = 'dashboard:stats:misses'
+
+
+def dashboard_cache():
+    return caches[CACHE_ALIAS if CACHE_ALIAS in settings.CACHES else 'default']
+
+
+# Bumped whenever the block layout changes, so old blocks are not reused.
+BLOCK_FORMAT = 2
+
+
+def block_key(project_id, day):
+    return f"dashboard:block{BLOCK_FORMAT}:{project_id}:{day.isoformat()}"
+
+
+def fragment_key(project_id, day):
+    return make_template_fragment_key(FRAGMENT_NAME, [project_id, day])
+
+
+def _count(key, amount):
+    if not amount:
+        return
+    cache = dashboard_cache()
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+
+
+def cache_stats():
+    cache = dashboard_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    return {
+        'backend': settings.CACHES.get(CACHE_ALIAS, settings.CACHES['default'])['BACKEND'],
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+    }
+
+
+def cached_dashboard_data(today, projects):
+    """``build_dashboard_data(today, projects, activities=False)``, reusing cached blocks.
+
+    Returns ``(blocks, hits, misses)``.
+    """
+    cache = dashboard_cache()
+    projects = list(projects.select_related('user'))
+    keys = {project.id: block_key(project.id, today) for project in projects}
+    stored = cache.get_many(list(keys.values()))
+
+    blocks = {}
+    stale = []
+    for project in projects:
+        cached = stored.get(keys[project.id])
+        if cached and cached[0] == project.version:
+            blocks[project.id] = cached[1]
+        else:
+            stale.append(project)
+
+    if stale:
+        versions = {project.id: project.version for project in stale}
+        fresh = build_dashboard_data(
+            today, ProjectAccess.objects.filter(pk__in=versions), activities=False)
+        cache.set_many({keys[block['project_id']]: (versions[block['project_id']], block) for block in fresh})
+        cache.delete_many([fragment_key(project_id, today) for project_id in versions])
+        blocks.update((block['project_id'], block) for block in fresh)
+
+    hits = len(projects) - len(stale)
+    _count(HITS_KEY, hits)
+    _count(MISSES_KEY, len(stale))
+    return [blocks[project.id] for project in projects], hits, len(stale)
+
+
+@receiver(project_changed)
+def invalidate_projects(sender, project_ids, **kwargs):
+    today = timezone.now().date()
+    keys = []
+    for project_id in project_ids:
+        keys += [block_key(project_id, today), fragment_key(project_id, today)]
+    dashboard_cache().delete_many(keys)
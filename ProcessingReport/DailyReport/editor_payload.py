@@ -0,0 +1,138 @@
+"""Columnar JSON payload of the plan editor (``admin_project_sections``).
+
+Instead of one object per item, the items of all sections are sent as one
+array per field, in section order; each section says how many of them it
+holds. Dates are day offsets from ``epoch`` (the earliest date in the
+plan) and statuses indexes into ``statuses``. ``null`` stands for a missing
+value. ``decodePlan`` in the template turns the payload back into rows;
+``decode_plan_payload`` does the same in Python.
+
+The text comes from ``dumps``: orjson when it is installed, the standard
+library otherwise (``JSON_SERIALIZER`` = ``'orjson'`` or ``'json'`` forces
+one). Either way it is escaped for embedding in a ``<script>`` element.
+"""
+from datetime import date, timedelta
+import json
+
+from django.conf import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .metrics import STATUS_LABELS, STATUS_MISSING
+
+
+FORMAT = 1
+
+ITEM_COLUMNS = (
+    'id', 'description', 'uom', 'scope',
+    'targeted_start_date', 'targeted_end_date', 'actual_start_date', 'actual_end_date',
+    'expected_today', 'today_progress', 'completed', 'balance', 'status',
+)
+DATE_COLUMNS = ('targeted_start_date', 'targeted_end_date', 'actual_start_date', 'actual_end_date')
+
+# Same escapes as Django's json_script: the text cannot close the <script>.
+SCRIPT_ESCAPES = {ord('<'): '\\u003C', ord('>'): '\\u003E', ord('&'): '\\u0026'}
+
+
+def _std_dumps(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+def _orjson_dumps(data):
+    return orjson.dumps(data).decode()
+
+
+def serializer():
+    """The configured ``dumps(data) -> str``."""
+    name = getattr(settings, 'JSON_SERIALIZER', 'auto')
+    if name == 'orjson' or (name == 'auto' and orjson is not None):
+        return _orjson_dumps
+    return _std_dumps
+
+
+def dumps(data):
+    """Compact JSON text of ``data``, safe inside a ``<script>`` element."""
+    return serializer()(data).translate(SCRIPT_ESCAPES)
+
+
+def build_plan_payload(sections, metrics, version=None):
+    """Columnar payload of ``sections`` (items prefetched) with figures from ``metrics``.
+
+    ``version`` is the plan version the editor sends back with its edits.
+    """
+    columns = {name: [] for name in ITEM_COLUMNS}
+    section_rows = []
+    for section in sections:
+        items = sorted(section.items.all(), key=lambda item: item.order if item.order is not None else 0)
+        section_rows.append({'id': section.id, 'title': section.title, 'items': len(items)})
+        for item in items:
+            columns['id'].append(item.id)
+            columns['description'].append(item.description)
+            columns['uom'].append(item.uom)
+            columns['scope'].append(item.scope)
+            columns['targeted_start_date'].append(item.targeted_start_date)
+            columns['targeted_end_date'].append(item.targeted_end_date)
+            columns['actual_start_date'].append(item.scope_assigned_date)
+            columns['actual_end_date'].append(item.scope_completed_date)
+            if item.targeted_start_date and item.targeted_end_date and item.scope is not None:
+                values = metrics.item(item.id)
+                columns['expected_today'].append(values['expected_today'])
+                columns['today_progress'].append(values['today_progress'])
+                columns['completed'].append(values['completed'])
+                columns['balance'].append(values['balance'])
+                columns['status'].append(STATUS_LABELS.index(values['status']))
+            else:
+                columns['expected_today'].append(None)
+                columns['today_progress'].append(0)
+                columns['completed'].append(0)
+                columns['balance'].append(None)
+                columns['status'].append(STATUS_LABELS.index(STATUS_MISSING))
+
+    days = [day for name in DATE_COLUMNS for day in columns[name] if day is not None]
+    epoch = min(days) if days else date(1970, 1, 1)
+    base = epoch.toordinal()
+    for name in DATE_COLUMNS:
+        columns[name] = [None if day is None else day.toordinal() - base for day in columns[name]]
+
+    return {
+        'format': FORMAT,
+        'version': version,
+        'epoch': epoch.isoformat(),
+        'statuses': list(STATUS_LABELS),
+        'sections': section_rows,
+        'items': columns,
+    }
+
+
+def decode_plan_payload(plan):
+    """The section rows ``decodePlan`` builds from ``plan`` (a parsed payload).
+
+    Dates come back as ``dd-mm-yyyy`` text and missing figures as the
+    editor shows them, as in the per-item objects the editor was sent before.
+    """
+    if not plan:
+        return []
+    epoch = date.fromisoformat(plan['epoch'])
+
+    def day(offset):
+        return '' if offset is None else (epoch + timedelta(days=offset)).strftime('%d-%m-%Y')
+
+    columns = plan['items']
+    sections, start = [], 0
+    for section in plan['sections']:
+        items = []
+        for i in range(start, start + section['items']):
+            row = {name: columns[name][i] for name in ITEM_COLUMNS}
+            row.update({name: day(row[name]) for name in DATE_COLUMNS})
+            row['scope'] = '' if row['scope'] is None else row['scope']
+            row['expected_today'] = 'N/A' if row['expected_today'] is None else row['expected_today']
+            row['balance'] = 'N/A' if row['balance'] is None else row['balance']
+            row['status'] = plan['statuses'][row['status']]
+            items.append(row)
+        start += section['items']
+        sections.append({'id': section['id'], 'title': section['title'], 'items': items})
+    return sections
+
@@ -0,0 +1,90 @@
+"""Raw ProgressEntry history as CSV or XLSX, in constant memory.
+
+Rows are read in keyset pages along the unique (item, date) index, each page
+through ``.iterator(chunk_size=...)``: MySQL client libraries buffer a whole
+result set, so a single iterator over millions of rows would not stay small.
+"""
+import csv
+
+from django.db.models import Q
+from openpyxl import Workbook
+
+from .models import ProgressEntry
+
+
+COLUMNS = (
+    ('Project ID', 'item__section__project_id'),
+    ('Project', 'item__section__project__project_name'),
+    ('Location', 'item__section__project__location'),
+    ('Section', 'item__section__title'),
+    ('Item ID', 'item_id'),
+    ('Activity', 'item__description'),
+    ('UOM', 'item__uom'),
+    ('Scope', 'item__scope'),
+    ('Date', 'date'),
+    ('Progress Done', 'progress_done'),
+    ('Entered By', 'user__username'),
+)
+HEADER = [title for title, _ in COLUMNS]
+ITEM_ID = HEADER.index('Item ID')
+DATE = HEADER.index('Date')
+
+
+def entry_queryset(project_ids=None, start=None, end=None):
+    entries = ProgressEntry.objects.all()
+    if project_ids:
+        entries = entries.filter(item__section__project_id__in=project_ids)
+    if start:
+        entries = entries.filter(date__gte=start)
+    if end:
+        entries = entries.filter(date__lte=end)
+    return entries
+
+
+def iter_entry_rows(entries, chunk_size=2000):
+    """Value tuples of ``entries`` in (item, date) order, ``chunk_size`` rows per query."""
+    rows = entries.order_by('item_id', 'date').values_list(*(lookup for _, lookup in COLUMNS))
+    last = None
+    while True:
+        page = rows
+        if last is not None:
+            page = rows.filter(Q(item_id__gt=last[0]) | Q(item_id=last[0], date__gt=last[1]))
+        count = 0
+        for row in page[:chunk_size].iterator(chunk_size=chunk_size):
+            count += 1
+            yield row
+        if count < chunk_size:
+            return
+        last = (row[ITEM_ID], row[DATE])
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows, rows_per_chunk=500):
+    """CSV text of HEADER + ``rows``, a few hundred lines per yielded string."""
+    writer = csv.writer(_Echo())
+    lines = [writer.writerow(HEADER)]
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) >= rows_per_chunk:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def write_xlsx(rows, output):
+    """Save HEADER + ``rows`` as an XLSX workbook into ``output`` (path or binary file).
+
+    openpyxl's write-only mode streams rows to a temporary file instead of
+    keeping cells in memory.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Progress Entries')
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(output)
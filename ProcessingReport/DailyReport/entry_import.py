@@ -0,0 +1,342 @@
+"""Bulk import of historical ProgressEntry rows from CSV or XLSX.
+
+The file is read row by row. Its columns follow the entry export (Project ID
+or Project, Section, Activity, Date, Progress Done; Item ID may replace the
+section and activity). Items are resolved through one lookup per project,
+built with a single query the first time the project appears. Each item's new
+total is checked against its scope using the stored rollup and the values
+being replaced.
+
+The surviving rows are upserted on (item, date) in ``BATCH_SIZE`` batches.
+Afterwards the actual start and completion dates of the touched items are
+recomputed from their full entry history. A dry run stops before writing and
+reports the same figures and row errors.
+"""
+import codecs
+import csv
+from datetime import date, datetime
+from functools import lru_cache
+import math
+
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from .bulk import upsert_options
+from .models import ProgressEntry, ProgressItem, ProjectAccess
+
+
+BATCH_SIZE = 5000
+ID_CHUNK = 1000
+AMBIGUOUS = -1
+
+HEADERS = {
+    'project id': 'project_id',
+    'project': 'project',
+    'project name': 'project',
+    'section': 'section',
+    'item id': 'item_id',
+    'activity': 'description',
+    'item': 'description',
+    'description': 'description',
+    'date': 'date',
+    'progress done': 'quantity',
+    'quantity': 'quantity',
+}
+# Accepted besides ISO dates (the planning editor uses dd-mm-yyyy).
+DATE_FORMATS = ('%d-%m-%Y', '%d/%m/%Y')
+
+
+class ImportFileError(Exception):
+    pass
+
+
+def _key(value):
+    return ' '.join(str(value).split()).casefold() if value is not None else ''
+
+
+def _blank(value):
+    return value is None or str(value).strip() == ''
+
+
+def read_rows(upload, filename):
+    """``(line number, {field: value})`` for each non-empty row of a CSV or XLSX file."""
+    workbook = None
+    if filename.lower().endswith('.xlsx'):
+        try:
+            workbook = load_workbook(upload, read_only=True, data_only=True)
+        except Exception as exc:
+            raise ImportFileError(f"Not a readable XLSX file: {exc}")
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+    else:
+        rows = csv.reader(codecs.iterdecode(upload, 'utf-8-sig'))
+
+    try:
+        header = next(rows, None)
+        if header is None:
+            raise ImportFileError("The file is empty.")
+        columns = {}
+        for position, title in enumerate(header):
+            field = HEADERS.get(_key(title))
+            if field and field not in columns:
+                columns[field] = position
+        if not ({'project', 'project_id'} & columns.keys() and {'date', 'quantity'} <= columns.keys()
+                and {'item_id', 'description'} & columns.keys()):
+            raise ImportFileError(
+                "Columns needed: Project ID or Project, Date, Progress Done, and Item ID or Activity.")
+
+        for line, row in enumerate(rows, start=2):
+            if all(_blank(value) for value in row):
+                continue
+            yield line, {field: row[position] if position < len(row) else None
+                         for field, position in columns.items()}
+    except UnicodeDecodeError:
+        raise ImportFileError("CSV files must be UTF-8 encoded.")
+    finally:
+        if workbook is not None:
+            workbook.close()
+
+
+def parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return _parse_date_text(str(value).strip())
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_text(text):
+    # A file repeats the same few hundred dates; strptime is the slow part of a row.
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid date '{text}'.")
+
+
+def parse_id(value):
+    """Row id from a cell; None unless it is a finite whole number."""
+    try:
+        number = float(str(value).strip()) if isinstance(value, str) else float(value)
+        return int(number) if number.is_integer() else None
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def parse_quantity(value):
+    try:
+        quantity = float(str(value).strip()) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid quantity '{value}'.")
+    if not math.isfinite(quantity):
+        raise ValueError(f"Invalid quantity '{value}'.")
+    if quantity < 0:
+        raise ValueError("Negative value not allowed.")
+    return quantity
+
+
+class EntryImport:
+    """Validated entries of one import run; see ``import_entries``."""
+
+    def __init__(self, user, today=None):
+        self.user = user
+        self.today = today or timezone.now().date()
+        self.rows = 0
+        self.errors = []
+        self.values = {}        # (item id, date) -> (quantity, line)
+        self.items = {}         # item id -> item row
+        self.entries = []
+        self.created = self.updated = self.unchanged = 0
+        self._project_ids = self._project_names = None
+        self._lookups = {}
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+    # -- resolving ------------------------------------------------------
+
+    def project_id(self, row):
+        if self._project_ids is None:
+            self._project_ids, self._project_names = set(), {}
+            for pk, name in ProjectAccess.objects.values_list('id', 'project_name'):
+                self._project_ids.add(pk)
+                key = _key(name)
+                self._project_names[key] = AMBIGUOUS if key in self._project_names else pk
+
+        if not _blank(row.get('project_id')):
+            pk = parse_id(row['project_id'])
+            if pk is None:
+                raise ValueError(f"Invalid project id '{row['project_id']}'.")
+            if pk not in self._project_ids:
+                raise ValueError(f"Unknown project id {pk}.")
+            return pk
+        pk = self._project_names.get(_key(row.get('project')))
+        if pk is None:
+            raise ValueError(f"Unknown project '{row.get('project')}'.")
+        if pk == AMBIGUOUS:
+            raise ValueError(f"Several projects are named '{row['project']}'; use Project ID.")
+        return pk
+
+    def lookup(self, project_id):
+        """Items of a project by id, by (section, activity) and by activity alone."""
+        if project_id not in self._lookups:
+            by_id, by_name = {}, {}
+            items = ProgressItem.objects.filter(section__project_id=project_id).values(
+                'id', 'section__title', 'description', 'scope',
+                'targeted_start_date', 'targeted_end_date', 'cumulative_done')
+            for item in items:
+                by_id[item['id']] = item
+                for key in {(_key(item['section__title']), _key(item['description'])),
+                            ('', _key(item['description']))}:
+                    by_name[key] = AMBIGUOUS if key in by_name else item['id']
+            self._lookups[project_id] = by_id, by_name
+        return self._lookups[project_id]
+
+    def item(self, project_id, row):
+        by_id, by_name = self.lookup(project_id)
+        if not _blank(row.get('item_id')):
+            item = by_id.get(parse_id(row['item_id']))
+            if item is None:
+                raise ValueError(f"Item id '{row['item_id']}' is not in this project.")
+            return item
+        description = row.get('description')
+        item_id = by_name.get((_key(row.get('section')), _key(description)))
+        if item_id is None:
+            where = f"section '{row.get('section')}'" if not _blank(row.get('section')) else "this project"
+            raise ValueError(f"No activity '{description}' in {where}.")
+        if item_id == AMBIGUOUS:
+            raise ValueError(f"Activity '{description}' is not unique; give its Section or Item ID.")
+        return by_id[item_id]
+
+    # -- reading --------------------------------------------------------
+
+    def add(self, line, row):
+        self.rows += 1
+        try:
+            item = self.item(self.project_id(row), row)
+            day = parse_date(row.get('date'))
+            quantity = parse_quantity(row.get('quantity'))
+        except ValueError as exc:
+            self.error(line, str(exc))
+            return
+        if not item['targeted_start_date'] or not item['targeted_end_date'] or item['scope'] is None:
+            self.error(line, f"Cannot enter progress for '{item['description']}' due to missing dates.")
+            return
+        if day > self.today:
+            self.error(line, f"Date {day.isoformat()} is in the future.")
+            return
+        key = (item['id'], day)
+        if key in self.values:
+            self.error(line, f"Duplicate of line {self.values[key][1]} ('{item['description']}', {day.isoformat()}).")
+            return
+        self.values[key] = (quantity, line)
+        self.items[item['id']] = item
+
+    def check_scope(self):
+        """Drop the rows of items whose new total would exceed their scope."""
+        spans = {}
+        for item_id, day in self.values:
+            low, high = spans.get(item_id, (day, day))
+            spans[item_id] = (min(low, day), max(high, day))
+
+        existing = {}
+        item_ids = list(spans)
+        for start in range(0, len(item_ids), ID_CHUNK):
+            chunk = item_ids[start:start + ID_CHUNK]
+            rows = ProgressEntry.objects.filter(
+                item_id__in=chunk,
+                date__gte=min(spans[item_id][0] for item_id in chunk),
+                date__lte=max(spans[item_id][1] for item_id in chunk),
+            ).values_list('item_id', 'date', 'progress_done')
+            existing.update(((item_id, day), value) for item_id, day, value in rows
+                            if (item_id, day) in self.values)
+
+        totals = {item_id: item['cumulative_done'] for item_id, item in self.items.items()}
+        first_line = {}
+        for (item_id, day), (quantity, line) in self.values.items():
+            totals[item_id] += quantity - existing.get((item_id, day), 0)
+            first_line[item_id] = min(line, first_line.get(item_id, line))
+
+        rejected = set()
+        for item_id, total in totals.items():
+            item = self.items[item_id]
+            if total > item['scope'] + 1e-9:
+                rejected.add(item_id)
+                self.error(first_line[item_id],
+                           f"Progress for '{item['description']}' would total {round(total, 2)}, "
+                           f"above its scope of {item['scope']}; none of its rows were imported.")
+
+        self.entries = []
+        for (item_id, day), (quantity, line) in self.values.items():
+            if item_id in rejected:
+                continue
+            if (item_id, day) not in existing:
+                self.created += 1
+            elif existing[(item_id, day)] != quantity:
+                self.updated += 1
+            else:
+                self.unchanged += 1
+                continue
+            self.entries.append(ProgressEntry(item_id=item_id, user=self.user, date=day, progress_done=quantity))
+        for item_id in rejected:
+            del self.items[item_id]
+
+    # -- writing --------------------------------------------------------
+
+    def save(self):
+        with transaction.atomic():
+            ProgressEntry.objects.bulk_create(
+                self.entries, batch_size=BATCH_SIZE, **upsert_options(('item', 'date'), ('progress_done',)))
+            recompute_item_dates({entry.item_id for entry in self.entries})
+
+    def summary(self, dry_run):
+        return {
+            'dry_run': dry_run,
+            'rows': self.rows,
+            'items': len(self.items),
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'errors': sorted(self.errors),
+        }
+
+
+def import_entries(upload, filename, user, dry_run=False, today=None):
+    """Import ``upload`` (a binary file) as ``user``; returns the run's summary.
+
+    Raises ImportFileError when the file itself cannot be read.
+    """
+    run = EntryImport(user, today)
+    for line, row in read_rows(upload, filename):
+        run.add(line, row)
+    run.check_scope()
+    if not dry_run and run.entries:
+        run.save()
+    return run.summary(dry_run)
+
+
+def recompute_item_dates(item_ids):
+    """Reset the actual start and completion dates of items from their entries.
+
+    Same rule as ``reconcile_item_dates --reset``: the start is the first day
+    with progress (kept as is without any) and the completion the first day
+    the running total reaches the scope. Returns the number of items changed.
+    """
+    changed = []
+    item_ids = sorted(item_ids)
+    for start in range(0, len(item_ids), ID_CHUNK):
+        items = ProgressItem.objects.filter(pk__in=item_ids[start:start + ID_CHUNK])
+        dates = items.entry_dates()
+        for item in items.only('id', 'scope', 'cumulative_done', 'scope_assigned_date', 'scope_completed_date'):
+            if item.set_auto_dates_if_missing(*dates.get(item.id, (None, None)), reset=True):
+                changed.append(item)
+
+    ProgressItem.objects.bulk_update(changed, ['scope_assigned_date', 'scope_completed_date'],
+                                     batch_size=BATCH_SIZE)
+    return len(changed)
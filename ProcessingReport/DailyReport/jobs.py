@@ -0,0 +1,86 @@
+"""Database-backed queue for PDF exports.
+
+``enqueue_pdf_job`` records a PdfJob row; the ``pdf_worker`` command claims
+queued rows and renders them in a process pool through the same cached
+pipeline as the synchronous exports (see ``pdf.project_pdf`` and
+``pdf.rollup_pdf``). Claiming is a
+conditional UPDATE on the row's status, so several workers can share the
+table without a broker or row locks.
+"""
+from datetime import date, timedelta
+import os
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import PdfJob
+from .pdf import project_pdf, rollup_pdf
+
+
+# A running job not finished after this long is assumed lost with its worker.
+STALE_AFTER = timedelta(minutes=15)
+
+
+def rollup_report(kind, start, end):
+    """``PdfJob.report`` of a rollup report."""
+    return f"rollup:{kind}:{start.isoformat()}:{end.isoformat()}"
+
+
+def enqueue_pdf_job(project, report_date, user=None, report=PdfJob.PROJECT_REPORT):
+    """Queue a render of one of ``project``'s reports, reusing a pending job for it."""
+    pending = PdfJob.objects.filter(
+        project=project, report=report, report_date=report_date, status__in=[PdfJob.QUEUED, PdfJob.RUNNING],
+    ).first()
+    if pending:
+        return pending
+    return PdfJob.objects.create(
+        project=project, report=report, report_date=report_date,
+        requested_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def render_job(job):
+    """Render (or find in the cache) the PDF of ``job``: ``(path, hit)``."""
+    if job.report == PdfJob.PROJECT_REPORT:
+        return project_pdf(job.project, job.report_date)
+    _, kind, start, end = job.report.split(':')
+    return rollup_pdf(job.project, job.report_date, kind, date.fromisoformat(start), date.fromisoformat(end))
+
+
+def requeue_stale_jobs(older_than):
+    """Return running jobs whose worker vanished (started before ``older_than``) to the queue."""
+    return PdfJob.objects.filter(
+        status=PdfJob.RUNNING, started_at__lt=timezone.now() - older_than,
+    ).update(status=PdfJob.QUEUED, started_at=None)
+
+
+def claim_jobs(limit):
+    """Mark up to ``limit`` queued jobs as running and return their ids."""
+    claimed = []
+    candidates = PdfJob.objects.filter(status=PdfJob.QUEUED).values_list('pk', flat=True)[:limit]
+    for pk in list(candidates):
+        if PdfJob.objects.filter(pk=pk, status=PdfJob.QUEUED).update(
+                status=PdfJob.RUNNING, started_at=timezone.now()):
+            claimed.append(pk)
+    return claimed
+
+
+def fail_job(pk, error):
+    PdfJob.objects.filter(pk=pk).update(
+        status=PdfJob.FAILED, error=error[:2000], finished_at=timezone.now())
+
+
+def run_pdf_job(pk):
+    """Render one claimed job. Runs inside a pool process."""
+    close_old_connections()
+    try:
+        job = PdfJob.objects.select_related('project__user').get(pk=pk)
+        path, _ = render_job(job)
+    except PdfJob.DoesNotExist:
+        return pk, 'missing'
+    except Exception as exc:
+        fail_job(pk, f"{type(exc).__name__}: {exc}")
+        return pk, PdfJob.FAILED
+    PdfJob.objects.filter(pk=pk).update(
+        status=PdfJob.DONE, file_path=os.fspath(path), error='', finished_at=timezone.now())
+    return pk, PdfJob.DONE
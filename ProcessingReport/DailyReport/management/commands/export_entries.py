@@ -0,0 +1,43 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from DailyReport.entry_export import csv_chunks, entry_queryset, iter_entry_rows, write_xlsx
+
+
+class Command(BaseCommand):
+    help = "Export raw ProgressEntry rows with their item, section and project to CSV or XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Output file; the format follows its extension (.csv or .xlsx).")
+        parser.add_argument('--project', type=int, action='append', dest='projects',
+                            help="ProjectAccess id to include; repeat for several.")
+        parser.add_argument('--from', type=date.fromisoformat, dest='start', help="First date (ISO).")
+        parser.add_argument('--to', type=date.fromisoformat, dest='end', help="Last date (ISO).")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Rows fetched per query.")
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output.endswith(('.csv', '.xlsx')):
+            raise CommandError("Output must end in .csv or .xlsx.")
+
+        count = 0
+
+        def counted(rows):
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+
+        rows = counted(iter_entry_rows(
+            entry_queryset(options['projects'], options['start'], options['end']),
+            chunk_size=options['chunk_size'],
+        ))
+        if output.endswith('.xlsx'):
+            write_xlsx(rows, output)
+        else:
+            with open(output, 'w', newline='', encoding='utf-8') as handle:
+                for chunk in csv_chunks(rows):
+                    handle.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} entries to {output}."))
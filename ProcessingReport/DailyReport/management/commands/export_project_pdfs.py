@@ -0,0 +1,40 @@
+from datetime import date
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from DailyReport.models import ProjectAccess
+from DailyReport.pdf import zip_members
+from DailyReport.zipstream import stream_zip
+
+
+class Command(BaseCommand):
+    help = "Export the PDF reports of several projects (default: all) into one ZIP file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Path of the ZIP file to write.")
+        parser.add_argument('--project', type=int, action='append', dest='projects',
+                            help="ProjectAccess id to include; repeat for several.")
+        parser.add_argument('--date', type=date.fromisoformat, help="Report date (default: today).")
+        parser.add_argument('--processes', type=int, default=max((os.cpu_count() or 2) - 1, 1),
+                            help="Number of render processes (default: CPUs - 1).")
+
+    def handle(self, *args, **options):
+        today = options['date'] or timezone.now().date()
+        projects = ProjectAccess.objects.order_by('id')
+        if options['projects']:
+            projects = projects.filter(id__in=options['projects'])
+        project_ids = list(projects.values_list('id', flat=True))
+        if not project_ids:
+            raise CommandError("No matching projects.")
+
+        processes = min(options['processes'], len(project_ids))
+        written = 0
+        with open(options['output'], 'wb') as output:
+            for chunk in stream_zip(zip_members(project_ids, today, processes)):
+                output.write(chunk)
+                written += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(project_ids)} report(s), {written / 1024:.0f} KB, to {options['output']}."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from DailyReport.synthetic import PASSWORD, USER_PREFIX, clear_portfolio, generate_portfolio
+
+
+class Command(BaseCommand):
+    help = "Create a synthetic portfolio (projects, sections, items and entry history) for testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=5)
+        parser.add_argument('--sections', type=int, default=4, help="Sections per project.")
+        parser.add_argument('--items', type=int, default=15, help="Items per section.")
+        parser.add_argument('--days', type=int, default=60, help="Days of entry history.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clear', action='store_true',
+                            help=f"Delete existing synthetic data ({USER_PREFIX}* users) first.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['clear']:
+                clear_portfolio()
+            counts = generate_portfolio(
+                options['projects'], options['sections'], options['items'], options['days'],
+                seed=options['seed'], log=self.stdout.write if options['verbosity'] > 1 else None,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            "Created {projects} projects, {sections} sections, {items} items and {entries} entries.".format(**counts)))
+        self.stdout.write(f"Log in as {USER_PREFIX}admin or {USER_PREFIX}site<N> with password '{PASSWORD}'.")
@@ -0,0 +1,36 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from DailyReport.entry_import import ImportFileError, import_entries
+
+
+class Command(BaseCommand):
+    help = "Import historical ProgressEntry rows from a CSV or XLSX file (same columns as export_entries)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or XLSX file.")
+        parser.add_argument('--user', required=True, help="Username recorded as the entries' author.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and report without writing.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user '{options['user']}'.")
+
+        try:
+            with open(options['path'], 'rb') as handle:
+                result = import_entries(handle, options['path'], user, dry_run=options['dry_run'])
+        except (OSError, ImportFileError) as exc:
+            raise CommandError(str(exc))
+
+        shown = result['errors'] if options['verbosity'] > 1 else result['errors'][:50]
+        for line, message in shown:
+            self.stderr.write(f"line {line}: {message}")
+        if len(shown) < len(result['errors']):
+            self.stderr.write(f"... {len(result['errors']) - len(shown)} more errors (use -v 2 to list all).")
+
+        verb = "Would import" if result['dry_run'] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['created']} new and {result['updated']} changed entries for {result['items']} items "
+            f"({result['rows']} rows, {result['unchanged']} unchanged, {len(result['errors'])} errors)."))
@@ -0,0 +1,60 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from DailyReport.jobs import STALE_AFTER, claim_jobs, fail_job, requeue_stale_jobs, run_pdf_job
+from DailyReport.pool import process_pool
+
+
+class Command(BaseCommand):
+    help = "Render queued PDF export jobs in a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=max((os.cpu_count() or 2) - 1, 1),
+                            help="Number of render processes (default: CPUs - 1).")
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help="Seconds to wait between polls of an empty queue.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once the queue is drained instead of polling forever.")
+        parser.add_argument('--stale-minutes', type=float, default=STALE_AFTER.total_seconds() / 60,
+                            help="Requeue running jobs started longer ago than this.")
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        stale_after = timedelta(minutes=options['stale_minutes'])
+        pool = process_pool(processes)
+        running = {}
+        done = 0
+        self.stdout.write(f"PDF worker started with {processes} process(es).")
+        try:
+            while True:
+                requeue_stale_jobs(stale_after)
+                free = processes - len(running)
+                if free:
+                    for pk in claim_jobs(free):
+                        running[pool.submit(run_pdf_job, pk)] = pk
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                finished, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pk = running.pop(future)
+                    try:
+                        _, status = future.result()
+                    except Exception as exc:
+                        fail_job(pk, f"{type(exc).__name__}: {exc}")
+                        status = 'failed'
+                    done += 1
+                    self.stdout.write(f"job {pk}: {status}")
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping; unfinished jobs will be requeued.")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} job(s)."))
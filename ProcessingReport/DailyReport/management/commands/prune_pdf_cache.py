@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from DailyReport.pdf import cache_dir, cache_max_bytes, prune_cache
+
+
+class Command(BaseCommand):
+    help = "Evict least recently used PDFs from the export cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-mb', type=float,
+                            help="Size limit in MB (default: PDF_CACHE_MAX_BYTES).")
+        parser.add_argument('--max-age-days', type=float,
+                            help="Also remove files not downloaded for this many days.")
+        parser.add_argument('--all', action='store_true', help="Empty the cache.")
+
+    def handle(self, *args, **options):
+        max_bytes = cache_max_bytes()
+        if options['max_mb'] is not None:
+            max_bytes = int(options['max_mb'] * 1024 * 1024)
+        max_age = None
+        if options['max_age_days'] is not None:
+            max_age = options['max_age_days'] * 86400
+        if options['all']:
+            max_bytes, max_age = 0, None
+
+        removed, freed = prune_cache(max_bytes=max_bytes, max_age=max_age)
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {removed} file(s), {freed / 1024 / 1024:.1f} MB from {cache_dir()}."))
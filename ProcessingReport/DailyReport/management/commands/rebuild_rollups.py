@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from DailyReport.models import ProgressEntry, ProgressItem
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ProgressItem entry rollups from ProgressEntry rows, or verify them with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only compare stored rollups with the entries; exit non-zero on mismatch.")
+        parser.add_argument('--project', type=int, help="Limit to one ProjectAccess id.")
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help="Items rebuilt per UPDATE statement.")
+
+    def handle(self, *args, **options):
+        items = ProgressItem.objects.all()
+        if options['project']:
+            items = items.filter(section__project_id=options['project'])
+
+        mismatched = self.find_mismatches(items)
+        if options['check']:
+            for item_id, stored, actual in mismatched[:50]:
+                self.stdout.write(f"item {item_id}: stored {stored} != entries {actual}")
+            if mismatched:
+                raise CommandError(f"{len(mismatched)} item(s) have stale rollups.")
+            self.stdout.write(self.style.SUCCESS("All rollups match their entries."))
+            return
+
+        item_ids = list(items.order_by('pk').values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        for start in range(0, len(item_ids), batch_size):
+            with transaction.atomic():
+                ProgressItem.objects.filter(pk__in=item_ids[start:start + batch_size]).refresh_rollups()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups for {len(item_ids)} item(s); {len(mismatched)} were stale."))
+
+    def find_mismatches(self, items):
+        actual = {
+            row['item_id']: (row['total'] or 0, row['last'], row['n'])
+            for row in ProgressEntry.objects.filter(item__in=items).order_by()
+            .values('item_id').annotate(total=Sum('progress_done'), last=Max('date'), n=Count('id'))
+        }
+        mismatched = []
+        for item_id, *stored in items.values_list('pk', *ProgressItem.ROLLUP_FIELDS).iterator():
+            expected = actual.get(item_id, (0, None, 0))
+            stored = tuple(stored)
+            if abs(stored[0] - expected[0]) > 1e-6 or stored[1:] != expected[1:]:
+                mismatched.append((item_id, stored, expected))
+        return mismatched
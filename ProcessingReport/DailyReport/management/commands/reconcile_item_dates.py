@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from DailyReport.models import ProgressItem
+
+
+DATE_FIELDS = ['scope_assigned_date', 'scope_completed_date']
+
+
+class Command(BaseCommand):
+    help = ("Fill in missing actual start and completion dates of ProgressItems from their entries, "
+            "and clear completion dates of items that are no longer complete.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only print the date changes that would be made.")
+        parser.add_argument('--reset', action='store_true',
+                            help="Replace existing dates with the ones found in the entries as well.")
+        parser.add_argument('--project', type=int, help="Limit to one ProjectAccess id.")
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help="Items written per UPDATE statement.")
+
+    def handle(self, *args, **options):
+        items = ProgressItem.objects.all()
+        if options['project']:
+            items = items.filter(section__project_id=options['project'])
+        dates = items.entry_dates()
+
+        batch_size = options['batch_size']
+        changed, batch = 0, []
+        stream = (items.order_by('pk')
+                  .only('id', 'description', 'scope', 'cumulative_done', *DATE_FIELDS)
+                  .iterator(chunk_size=batch_size))
+        for item in stream:
+            before = (item.scope_assigned_date, item.scope_completed_date)
+            item.set_auto_dates_if_missing(*dates.get(item.id, (None, None)), reset=options['reset'])
+            after = (item.scope_assigned_date, item.scope_completed_date)
+            if after == before:
+                continue
+            changed += 1
+            if options['dry_run']:
+                self.stdout.write(self.diff_line(item, before, after))
+                continue
+            batch.append(item)
+            if len(batch) >= batch_size:
+                self.write(batch)
+                batch = []
+        self.write(batch)
+
+        verb = "would change" if options['dry_run'] else "changed"
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {len(dates)} item(s) with entries; dates {verb} on {changed} item(s)."))
+
+    def write(self, items):
+        if items:
+            with transaction.atomic():
+                ProgressItem.objects.bulk_update(items, DATE_FIELDS)
+
+    def diff_line(self, item, before, after):
+        changes = [
+            f"{name} {old or '-'} -> {new or '-'}"
+            for name, old, new in zip(('start', 'completed'), before, after) if old != new
+        ]
+        return f"item {item.id} ({item.description}): " + ', '.join(changes)
@@ -0,0 +1,43 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from DailyReport.models import ProgressItem
+
+
+class Command(BaseCommand):
+    help = ("Recompute the stored status and delay days of every ProgressItem. "
+            "Schedule it just after midnight: statuses move with the date even when nothing is edited.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Evaluate as of this day (YYYY-MM-DD); defaults to today.")
+        parser.add_argument('--project', type=int, help="Limit to one ProjectAccess id.")
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help="Items read and written per transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            today = date.fromisoformat(options['date']) if options['date'] else timezone.now().date()
+        except ValueError:
+            raise CommandError(f"Invalid --date: {options['date']}")
+
+        items = ProgressItem.objects.all()
+        if options['project']:
+            items = items.filter(section__project_id=options['project'])
+
+        batch_size = options['batch_size']
+        last_pk, seen, changed = 0, 0, 0
+        while True:
+            # Keyset pagination: each batch starts after the last pk of the previous one.
+            item_ids = list(items.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not item_ids:
+                break
+            with transaction.atomic():
+                changed += ProgressItem.objects.filter(pk__in=item_ids).refresh_status(today)
+            seen += len(item_ids)
+            last_pk = item_ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed the status of {seen} item(s) as of {today}; {changed} row(s) written."))
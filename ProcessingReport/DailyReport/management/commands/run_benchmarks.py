@@ -0,0 +1,97 @@
+from datetime import datetime
+import json
+import platform
+import subprocess
+import tempfile
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from DailyReport.benchmark import run_scale, scenarios
+
+
+def parse_scale(value):
+    try:
+        projects, sections, items, days = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise CommandError(f"Scale {value!r} is not PROJECTSxSECTIONSxITEMSxDAYS.")
+    return {'projects': projects, 'sections': sections, 'items': items, 'days': days}
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the main views on synthetic portfolios in a throwaway SQLite database "
+            "and write a JSON report. Run with DATABASE_ENGINE=sqlite.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', action='append', dest='scales', type=parse_scale,
+                            help="PROJECTSxSECTIONSxITEMSxDAYS; repeat for several (default: 3 scales).")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per scenario.")
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            choices=[name for name, _, _ in scenarios()], help="Only run these scenarios.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--page-size', type=int,
+                            help="Dashboard projects per page (default: DASHBOARD_PAGE_SIZE).")
+        parser.add_argument('--output', default=f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json",
+                            help="Report path.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Benchmarks run on SQLite only; set DATABASE_ENGINE=sqlite.")
+        scales = options['scales'] or [
+            parse_scale('5x4x10x30'), parse_scale('20x5x20x60'), parse_scale('50x6x25x90'),
+        ]
+
+        report = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'commit': self.git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'dashboard_page_size': options['page_size'] or getattr(settings, 'DASHBOARD_PAGE_SIZE', 20),
+            'scales': [],
+        }
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory() as pdf_dir, override_settings(
+                PDF_CACHE_DIR=pdf_dir,
+                PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                DASHBOARD_PAGE_SIZE=options['page_size'] or getattr(settings, 'DASHBOARD_PAGE_SIZE', 20),
+            ):
+                for scale in scales:
+                    self.stdout.write("Scale {projects}x{sections}x{items}x{days}...".format(**scale))
+                    entry = run_scale(scale, options['repeat'], options['scenarios'], options['seed'])
+                    report['scales'].append(entry)
+                    for name, figures in entry['scenarios'].items():
+                        first_card = figures['first_card_ms']
+                        first_card = '' if first_card is None else f"{first_card:.1f} ms"
+                        self.stdout.write(
+                            f"  {name:<30} {figures['wall_ms']['median']:>9.1f} ms"
+                            f" {first_card:>11} 1st card {figures['response_kb']:>8.1f} KB out"
+                            f" {figures['queries']:>5} queries {figures['peak_kb']:>9.0f} KB"
+                            f"  {figures['status']}")
+                    for name, figures in entry['editor_payload'].items():
+                        self.stdout.write(
+                            f"  editor payload {name:<15} {figures['kb']:>8.1f} KB"
+                            f" {figures['build_ms']:>9.1f} ms build {figures['dumps_ms']:>9.1f} ms dumps")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as handle:
+            json.dump(report, handle, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}."))
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from DailyReport.bulk import upsert_options
+from DailyReport.metrics import build_snapshots
+from DailyReport.models import ProjectDailySnapshot
+
+
+def parse_day(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Store ProjectDailySnapshot rows for every project, for one day (default: yesterday) or a range."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Day to snapshot (YYYY-MM-DD). Defaults to yesterday.")
+        parser.add_argument('--start', help="First day of a range to snapshot (YYYY-MM-DD).")
+        parser.add_argument('--end', help="Last day of the range (YYYY-MM-DD). Defaults to yesterday.")
+
+    def handle(self, *args, **options):
+        yesterday = timezone.now().date() - timedelta(days=1)
+        if options['start']:
+            start = parse_day(options['start'])
+            end = parse_day(options['end']) if options['end'] else yesterday
+        else:
+            start = end = parse_day(options['date']) if options['date'] else yesterday
+        if start > end:
+            raise CommandError("--start must not be after --end.")
+
+        upsert = upsert_options(('project', 'date'), ProjectDailySnapshot.FIGURES + ('created_at',))
+        day = start
+        total = 0
+        while day <= end:
+            snapshots = build_snapshots(day)
+            with transaction.atomic():
+                ProjectDailySnapshot.objects.bulk_create(snapshots, batch_size=500, **upsert)
+            total += len(snapshots)
+            day += timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {total} snapshot(s) for {start} to {end}."))
@@ -0,0 +1,403 @@
+"""Vectorized project metrics.
+
+The one calculator behind the management dashboard, the PDF export and the
+section views. The items of the requested projects are loaded with a single
+query and laid out as flat NumPy arrays (scope, target dates, cumulative and
+today's progress); every per-item and per-project figure is then computed
+with array operations. Rules in one place:
+
+* status follows ProgressItem.get_status (Missing Dates without a target end
+  date; a finished item is judged by its completion date, anything else by
+  today against the target end date). For the current date it is read from
+  the stored ``ProgressItem.status`` column, refreshed first for any item
+  not yet evaluated today; past dates compute it with ``date_status``;
+* expected today is the remaining scope over the remaining days, rounded up;
+* an unfinished item is forecast to complete when its balance runs out at
+  its average daily progress over the last ``FORECAST_WINDOW_DAYS`` days
+  (counted from its actual start if that is more recent); an item that is
+  on time today but forecast past its target end is a Forecast Delay, and
+  still counts as on time in the project figures. Items with no progress
+  in the window get no forecast;
+* project averages are rounded to whole percents, the overall completion
+  half-up.
+"""
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ProjectAccess, ProjectDailySnapshot, ProgressEntry, ProgressItem
+
+
+STATUS_MISSING = 'Missing Dates'
+STATUS_ONTIME = 'Ontime'
+STATUS_DELAY = 'Delay'
+STATUS_FORECAST_DELAY = 'Forecast Delay'
+
+MISSING, ONTIME, DELAY, FORECAST_DELAY = 0, 1, 2, 3
+STATUS_LABELS = (STATUS_MISSING, STATUS_ONTIME, STATUS_DELAY, STATUS_FORECAST_DELAY)
+STATUS_CODES = {label: code for code, label in enumerate(STATUS_LABELS)}
+
+NO_DATE = -1
+
+ITEM_FIELDS = (
+    'id', 'section__project_id', 'description', 'uom', 'scope',
+    'targeted_start_date', 'targeted_end_date',
+    'scope_assigned_date', 'scope_completed_date',
+)
+
+
+def custom_round(value):
+    return int(Decimal(value).quantize(0, rounding=ROUND_HALF_UP))
+
+
+def forecast_window():
+    return getattr(settings, 'FORECAST_WINDOW_DAYS', 14)
+
+
+def load_item_rows(project_ids, today):
+    """All items of the given projects with their total, ``today``'s and recent progress.
+
+    For the current date the stored rollup and status are used; for an
+    earlier date the total is summed over the entries up to that date, so
+    past days can be recomputed (see ProjectDailySnapshot). ``recent_done``
+    covers the forecast window ending on ``today``.
+    """
+    items = ProgressItem.objects.filter(section__project_id__in=project_ids)
+    window_start = today - timedelta(days=forecast_window())
+    stored = ()
+    if today < timezone.now().date():
+        items = items.annotate(
+            total_done=Coalesce(Sum('entries__progress_done', filter=Q(entries__date__lte=today)), 0.0),
+            today_progress=Sum('entries__progress_done', filter=Q(entries__date=today)),
+            recent_done=Sum('entries__progress_done',
+                            filter=Q(entries__date__gt=window_start, entries__date__lte=today)),
+        )
+    else:
+        today_entry = ProgressEntry.objects.filter(item=OuterRef('pk'), date=today).values('progress_done')[:1]
+        recent = (ProgressEntry.objects.filter(item=OuterRef('pk'), date__gt=window_start, date__lte=today)
+                  .values('item').annotate(total=Sum('progress_done')).values('total'))
+        # Normally a no-op read: the nightly refresh_item_status has been through.
+        items.exclude(status_date=today).refresh_status(today)
+        items = items.annotate(total_done=F('cumulative_done'), today_progress=Subquery(today_entry),
+                               recent_done=Subquery(recent))
+        stored = ('status', 'delay_days')
+    return list(items.order_by('id').values(*ITEM_FIELDS, 'total_done', 'today_progress', 'recent_done', *stored))
+
+
+def _ordinals(dates):
+    return np.array([d.toordinal() if d else NO_DATE for d in dates], dtype=np.int64)
+
+
+def _floats(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _group_max(index, values, mask, size):
+    out = np.full(size, NO_DATE, dtype=np.int64)
+    np.maximum.at(out, index[mask], values[mask])
+    return out
+
+
+def date_status(scope, total, end, completed, t):
+    """Status codes, delay days and "completed by then" flags as of ordinal ``t``.
+
+    ``scope`` and ``total`` are float arrays (0 for no scope), ``end`` and
+    ``completed`` ordinal arrays with NO_DATE for missing dates. A completion
+    recorded after ``t`` had not happened yet on that day.
+    """
+    has_completed = (completed != NO_DATE) & (completed <= t)
+    finished = (scope != 0) & (total >= scope) & has_completed
+    on_time = np.where(finished, completed <= end, t <= end)
+    status = np.where(end != NO_DATE, np.where(on_time, ONTIME, DELAY), MISSING)
+    actual_end = np.where(has_completed, completed, t)
+    delay_days = np.where(status == DELAY, np.maximum(actual_end - end, 0), 0)
+    return status, delay_days, has_completed
+
+
+def stored_status(rows, today):
+    """``(status label, delay days)`` per ``(scope, total, end, completed)`` row as of ``today``."""
+    if not rows:
+        return []
+    status, delay_days, _ = date_status(
+        np.nan_to_num(_floats([row[0] for row in rows])),
+        _floats([row[1] or 0 for row in rows]),
+        _ordinals([row[2] for row in rows]),
+        _ordinals([row[3] for row in rows]),
+        today.toordinal(),
+    )
+    return [(STATUS_LABELS[code], days) for code, days in zip(status.tolist(), delay_days.tolist())]
+
+
+class MetricsFrame:
+    """Per-item and per-project metrics for a set of item rows as of ``today``."""
+
+    def __init__(self, rows, today, project_ids=()):
+        self.rows = rows
+        self.today = today
+        t = today.toordinal()
+
+        self.item_ids = np.array([row['id'] for row in rows], dtype=np.int64)
+        self.project_ids, self.project_index = np.unique(
+            np.array([row['section__project_id'] for row in rows] + list(project_ids), dtype=np.int64),
+            return_inverse=True,
+        )
+        self.project_index = self.project_index[:len(rows)]
+        self._position = {item_id: i for i, item_id in enumerate(self.item_ids.tolist())}
+
+        scope = _floats([row['scope'] for row in rows])
+        self.scope_known = ~np.isnan(scope)
+        self.scope = np.nan_to_num(scope)
+        self.has_scope = self.scope != 0
+
+        self.total = _floats([row['total_done'] or 0 for row in rows])
+        self.today_progress = np.nan_to_num(_floats([row['today_progress'] for row in rows]))
+        self.done_before = self.total - self.today_progress
+
+        self.end = _ordinals([row['targeted_end_date'] for row in rows])
+        self.has_end = self.end != NO_DATE
+        self.completed = _ordinals([row['scope_completed_date'] for row in rows])
+        self.status, self.delay_days, self.has_completed = date_status(
+            self.scope, self.total, self.end, self.completed, t)
+        if rows and 'status' in rows[0]:
+            self.status = np.array([STATUS_CODES[row['status']] for row in rows], dtype=np.int64)
+            self.delay_days = np.array([row['delay_days'] for row in rows], dtype=np.int64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.percentage = np.where(self.has_scope, np.round(self.total / self.scope * 100, 2), 0.0)
+
+            remaining_days = self.end - t + 1
+            remaining_scope = np.maximum(self.scope - self.done_before, 0)
+            self.expected_is_rate = remaining_days > 0
+            self.expected_today = np.where(
+                self.expected_is_rate, np.ceil(remaining_scope / remaining_days), remaining_scope)
+
+        self.balance = np.maximum(self.scope - self.total, 0)
+
+        self._forecast(rows, t)
+        self._project_totals()
+
+    def _forecast(self, rows, t):
+        """Projected completion from the recent run-rate, and the slip past the target end."""
+        window = forecast_window()
+        recent = np.nan_to_num(_floats([row['recent_done'] for row in rows]))
+        started = _ordinals([row['scope_assigned_date'] for row in rows])
+        active_days = np.where((started != NO_DATE) & (started <= t),
+                               np.clip(t - started + 1, 1, window), window)
+        self.run_rate = recent / active_days
+
+        unfinished = self.has_scope & (self.total < self.scope)
+        forecast = unfinished & (self.run_rate > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_needed = np.ceil(self.balance / self.run_rate)
+        # A trickle against a huge balance must still give a valid date.
+        days_needed = np.minimum(np.nan_to_num(days_needed), date.max.toordinal() - t)
+        self.forecast_end = np.where(forecast, t + days_needed, NO_DATE).astype(np.int64)
+        self.slip_days = np.where(forecast & self.has_end, np.maximum(self.forecast_end - self.end, 0), 0)
+        self.status = np.where((self.status == ONTIME) & (self.slip_days > 0), FORECAST_DELAY, self.status)
+
+    def _project_totals(self):
+        idx, size = self.project_index, len(self.project_ids)
+        # Forecast delays are still on time today.
+        ontime = (self.status == ONTIME) | (self.status == FORECAST_DELAY)
+        delay = self.status == DELAY
+
+        def count(mask):
+            return np.bincount(idx, weights=mask, minlength=size)
+
+        def total(values, mask):
+            return np.bincount(idx, weights=np.where(mask, values, 0), minlength=size)
+
+        self.count_today = count(self.today_progress > 0)
+        self.count_ontime = count(ontime)
+        self.count_delay = count(delay)
+        self.count_missing = count(self.status == MISSING)
+        self.count_forecast_delay = count(self.status == FORECAST_DELAY)
+
+        self.sum_ontime_percent = total(self.percentage, ontime)
+        self.sum_delay_percent = total(self.percentage, delay)
+        self.sum_delay_days = total(self.delay_days, delay)
+        self.total_scope = total(self.scope, self.has_scope)
+        self.total_completed = total(self.total, self.has_scope)
+        self.latest_target = _group_max(idx, self.end, self.has_end, size)
+        self.latest_completed = _group_max(idx, self.completed, self.has_completed, size)
+        self.max_slip_days = _group_max(idx, self.slip_days, self.slip_days > 0, size)
+
+    # -- per item -------------------------------------------------------
+
+    def item(self, item_id):
+        """Computed figures of one item, as plain Python values."""
+        i = self._position[item_id]
+        # Clamped and scope-less values stay plain ints, as the templates showed them.
+        balance = self.balance[i].item() or 0
+        expected = self.expected_today[i].item()
+        if not (self.scope_known[i] and self.has_end[i]):
+            expected = None
+        elif self.expected_is_rate[i]:
+            expected = int(expected)
+        else:
+            expected = expected or 0
+        return {
+            'today_progress': self.today_progress[i].item(),
+            'done_before': self.done_before[i].item(),
+            'completed': self.total[i].item(),
+            'balance': balance if self.scope_known[i] else None,
+            'expected_today': expected,
+            'status': STATUS_LABELS[self.status[i]],
+            'percentage': self.percentage[i].item() if self.has_scope[i] else 0,
+            'delay_days': int(self.delay_days[i]),
+            'forecast_end_date': (date.fromordinal(int(self.forecast_end[i]))
+                                  if self.forecast_end[i] != NO_DATE else None),
+            'slip_days': int(self.slip_days[i]),
+        }
+
+    # -- per project ----------------------------------------------------
+
+    def _project_position(self, project_id):
+        return int(np.searchsorted(self.project_ids, project_id))
+
+    def project_summary(self, project_id):
+        p = self._project_position(project_id)
+        count_ontime = int(self.count_ontime[p])
+        count_delay = int(self.count_delay[p])
+
+        avg_ontime = round(float(self.sum_ontime_percent[p]) / count_ontime) if count_ontime else 0
+        avg_delay = round(float(self.sum_delay_percent[p]) / count_delay) if count_delay else 0
+        if count_ontime + count_delay:
+            overall_completion_percent = custom_round(
+                float(self.sum_ontime_percent[p] + self.sum_delay_percent[p]) / (count_ontime + count_delay))
+        else:
+            overall_completion_percent = 0
+
+        project_completed = self.total_scope[p] > 0 and self.total_completed[p] >= self.total_scope[p]
+        if project_completed and self.latest_completed[p] != NO_DATE and self.latest_target[p] != NO_DATE:
+            project_delay_days = max(int(self.latest_completed[p] - self.latest_target[p]), 0)
+        else:
+            project_delay_days = int(self.sum_delay_days[p])
+
+        return {
+            'count_today': int(self.count_today[p]),
+            'count_delay': count_delay,
+            'count_ontime': count_ontime,
+            'count_missing': int(self.count_missing[p]),
+            'count_forecast_delay': int(self.count_forecast_delay[p]),
+
+            'avg_ontime_percent': avg_ontime,
+            'avg_delay_percent': avg_delay,
+            'project_delay_days': project_delay_days,
+            'overall_completion_percent': overall_completion_percent,
+            'forecast_slip_days': max(int(self.max_slip_days[p]), 0),
+        }
+
+    def project_activities(self, project_id):
+        """Activity tables of one project, in the layout the templates expect."""
+        p = self._project_position(project_id)
+        activities_today = []
+        delay_activities = []
+        ontime_activities = []
+        missing_activities = []
+
+        for i in np.flatnonzero(self.project_index == p).tolist():
+            row = self.rows[i]
+            values = self.item(row['id'])
+            has_scope = bool(self.has_scope[i])
+            base = {
+                'description': row['description'],
+                'uom': row['uom'],
+                'scope': row['scope'],
+                'targeted_start_date': row['targeted_start_date'],
+                'targeted_end_date': row['targeted_end_date'],
+                'scope_assigned_date': row['scope_assigned_date'],
+                'scope_completed_date': row['scope_completed_date'] if self.has_completed[i] else None,
+                'total_progress': values['completed'],
+            }
+
+            if values['today_progress'] > 0:
+                expected_today = values['expected_today']
+                activities_today.append({
+                    **base,
+                    'balance': values['balance'] if has_scope else 'N/A',
+                    'expected_today': expected_today if has_scope and expected_today is not None else 'N/A',
+                    'status': values['status'],
+                    'today_progress': values['today_progress'],
+                })
+
+            activity_data = {
+                **base,
+                'balance': values['balance'] if has_scope else 0,
+                'percentage': values['percentage'],
+                'status': values['status'],
+                'forecast_end_date': values['forecast_end_date'],
+                'slip_days': values['slip_days'],
+            }
+            if self.status[i] == MISSING:
+                missing_activities.append(activity_data)
+            elif self.status[i] in (ONTIME, FORECAST_DELAY):
+                ontime_activities.append(activity_data)
+            else:
+                activity_data['delay_days'] = values['delay_days']
+                delay_activities.append(activity_data)
+
+        return {
+            'activities_today': activities_today,
+            'delay_activities': delay_activities,
+            'ontime_activities': ontime_activities,
+            'missing_activities': missing_activities,
+        }
+
+
+def compute_metrics(project_ids, today):
+    project_ids = list(project_ids)
+    return MetricsFrame(load_item_rows(project_ids, today), today, project_ids)
+
+
+def project_report(project, today, frame=None):
+    """Summary and activity tables of one project (dashboard card or PDF body)."""
+    frame = frame or compute_metrics([project.id], today)
+    return {
+        **frame.project_activities(project.id),
+        **frame.project_summary(project.id),
+    }
+
+
+def build_dashboard_data(today, projects=None, activities=True):
+    """Dashboard blocks for ``projects`` (default: all) in a constant number of queries.
+
+    With ``activities=False`` only the summary figures are included.
+    """
+    if projects is None:
+        projects = ProjectAccess.objects.all()
+    projects = list(projects.select_related('user'))
+    frame = compute_metrics([project.id for project in projects], today)
+    figures = project_report if activities else (
+        lambda project, today, frame: frame.project_summary(project.id))
+
+    return [
+        {
+            'project_id': project.id,
+            'project_name': project.project_name,
+            'user': project.user.username,
+            'location': project.location,
+            'type': project.type_of_project,
+            **figures(project, today, frame),
+        }
+        for project in projects
+    ]
+
+
+def build_snapshots(day, projects=None):
+    """Unsaved ProjectDailySnapshot rows holding each project's figures as of ``day``."""
+    if projects is None:
+        projects = ProjectAccess.objects.all()
+    project_ids = list(projects.values_list('id', flat=True))
+    frame = compute_metrics(project_ids, day)
+    snapshots = []
+    for project_id in project_ids:
+        summary = frame.project_summary(project_id)
+        snapshots.append(ProjectDailySnapshot(
+            project_id=project_id, date=day, **{name: summary[name] for name in ProjectDailySnapshot.FIGURES}))
+    return snapshots
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:00
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_rollups(apps, schema_editor):
+    ProgressItem = apps.get_model('DailyReport', 'ProgressItem')
+    ProgressEntry = apps.get_model('DailyReport', 'ProgressEntry')
+    entries = ProgressEntry.objects.filter(item=OuterRef('pk')).order_by().values('item')
+    ProgressItem.objects.update(
+        cumulative_done=Coalesce(
+            Subquery(entries.annotate(total=Sum('progress_done')).values('total')), 0.0,
+            output_field=models.FloatField()),
+        last_entry_date=Subquery(entries.annotate(last=Max('date')).values('last')),
+        entry_count=Coalesce(Subquery(entries.annotate(n=Count('id')).values('n')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DailyReport', '0004_progressentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='progressitem',
+            name='cumulative_done',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='progressitem',
+            name='entry_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='progressitem',
+            name='last_entry_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
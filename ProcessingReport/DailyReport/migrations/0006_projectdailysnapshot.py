@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DailyReport', '0005_progressitem_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectDailySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('count_today', models.PositiveIntegerField(default=0)),
+                ('count_ontime', models.PositiveIntegerField(default=0)),
+                ('count_delay', models.PositiveIntegerField(default=0)),
+                ('count_missing', models.PositiveIntegerField(default=0)),
+                ('avg_ontime_percent', models.FloatField(default=0)),
+                ('avg_delay_percent', models.FloatField(default=0)),
+                ('overall_completion_percent', models.FloatField(default=0)),
+                ('project_delay_days', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='DailyReport.projectaccess')),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['date'], name='DailyReport_date_ed4cd7_idx')],
+                'unique_together': {('project', 'date')},
+            },
+        ),
+    ]
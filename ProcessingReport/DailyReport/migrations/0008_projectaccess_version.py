@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DailyReport', '0007_pdfjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectaccess',
+            name='modified_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='projectaccess',
+            name='version',
+            field=models.PositiveBigIntegerField(default=1),
+        ),
+    ]
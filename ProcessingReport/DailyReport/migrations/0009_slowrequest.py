@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DailyReport', '0008_projectaccess_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('view_name', models.CharField(blank=True, max_length=200)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('total_ms', models.FloatField()),
+                ('view_ms', models.FloatField()),
+                ('db_ms', models.FloatField()),
+                ('template_ms', models.FloatField()),
+                ('query_count', models.PositiveIntegerField()),
+                ('duplicate_count', models.PositiveIntegerField(default=0)),
+                ('duplicate_sql', models.TextField(blank=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['view_name', 'created_at'], name='DailyReport_view_na_62bc0e_idx')],
+            },
+        ),
+    ]
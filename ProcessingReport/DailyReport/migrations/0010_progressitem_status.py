@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DailyReport', '0009_slowrequest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='progressitem',
+            name='delay_days',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='progressitem',
+            name='status',
+            field=models.CharField(choices=[('Missing Dates', 'Missing Dates'), ('Ontime', 'Ontime'), ('Delay', 'Delay')], db_index=True, default='Missing Dates', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='progressitem',
+            name='status_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
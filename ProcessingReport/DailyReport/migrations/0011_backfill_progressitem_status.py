@@ -0,0 +1,34 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def backfill_status(apps, schema_editor):
+    # Same rule as ProgressItem.objects.refresh_status(), which the historical
+    # model does not have.
+    from DailyReport.metrics import stored_status
+
+    ProgressItem = apps.get_model('DailyReport', 'ProgressItem')
+    today = timezone.now().date()
+    last_pk = 0
+    while True:
+        items = list(ProgressItem.objects.filter(pk__gt=last_pk).order_by('pk').only(
+            'scope', 'cumulative_done', 'targeted_end_date', 'scope_completed_date')[:2000])
+        if not items:
+            break
+        rows = [(item.scope, item.cumulative_done, item.targeted_end_date, item.scope_completed_date)
+                for item in items]
+        for item, (status, delay_days) in zip(items, stored_status(rows, today)):
+            item.status, item.delay_days, item.status_date = status, delay_days, today
+        ProgressItem.objects.bulk_update(items, ['status', 'delay_days', 'status_date'])
+        last_pk = items[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DailyReport', '0010_progressitem_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DailyReport', '0011_backfill_progressitem_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectaccess',
+            name='plan_version',
+            field=models.PositiveBigIntegerField(default=1),
+        ),
+    ]
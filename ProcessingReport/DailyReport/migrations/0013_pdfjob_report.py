@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DailyReport', '0012_projectaccess_plan_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfjob',
+            name='report',
+            field=models.CharField(default='project', max_length=64),
+        ),
+    ]
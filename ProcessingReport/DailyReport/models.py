@@ -1,9 +1,42 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Max, Min, OuterRef, Q, RowRange, Subquery, Sum, Value, When, Window
+from django.db.models.functions import Coalesce, RowNumber
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
+import uuid
+
+from .signals import project_changed
+
+class ProjectAccessQuerySet(models.QuerySet):
+    def touch(self, plan=False):
+        """Bump the version (and with ``plan`` the plan version) of these projects in one UPDATE."""
+        if plan:
+            return self.update(version=F('version') + 1, plan_version=F('plan_version') + 1,
+                               modified_at=timezone.now())
+        return self.update(version=F('version') + 1, modified_at=timezone.now())
+
+
+def touch_projects(project_ids, plan=False):
+    """Record that something under the given projects changed (see ProjectAccess.version).
+
+    ``plan`` marks a change to the plan itself: sections or the planned
+    fields of items, as opposed to progress.
+    """
+    project_ids = set(project_ids) - {None}
+    if project_ids:
+        ProjectAccess.objects.filter(pk__in=project_ids).touch(plan)
+        transaction.on_commit(
+            lambda: project_changed.send(sender=ProjectAccess, project_ids=project_ids))
+
 
 class ProjectAccess(models.Model):
+    # Bumped, never written from an instance, whenever the project or any of
+    # its sections, items or entries changes; cheap to compare for caching.
+    # plan_version only moves with the plan (sections and planned item
+    # fields), so the plan editor's saves do not conflict with progress.
+    VERSION_FIELDS = ('version', 'plan_version', 'modified_at')
+
     PROJECT_TYPES = [
         ('ground mount', 'Ground Mount'),
         ('roof top', 'Roof Top'),
@@ -16,20 +49,224 @@ class ProjectAccess(models.Model):
     type_of_project = models.CharField(max_length=20, choices=PROJECT_TYPES)
     assigned_at = models.DateTimeField(auto_now_add=True)
 
+    version = models.PositiveBigIntegerField(default=1)
+    plan_version = models.PositiveBigIntegerField(default=1)
+    modified_at = models.DateTimeField(default=timezone.now)
+
+    objects = ProjectAccessQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.project_name} -> {self.user.username}"
 
+    def save(self, *args, **kwargs):
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.VERSION_FIELDS
+            ]
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                touch_projects([self.pk])
+            return
+        super().save(*args, **kwargs)
+
+
+class SectionQuerySet(models.QuerySet):
+    """Touches the owning projects on bulk writes; ``bulk_update`` goes through ``update``."""
+
+    def project_ids(self):
+        return set(self.values_list('project_id', flat=True))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            touch_projects((obj.project_id for obj in objs), plan=True)
+        return created
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db):
+            project_ids = self.project_ids()
+            if 'project' in kwargs or 'project_id' in kwargs:
+                project_ids.add(getattr(kwargs.get('project'), 'pk', kwargs.get('project_id')))
+            touch_projects(project_ids, plan=True)
+            return super().update(**kwargs)
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            touch_projects(self.project_ids(), plan=True)
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
 
 class Section(models.Model):
     project = models.ForeignKey(ProjectAccess, on_delete=models.CASCADE, related_name='sections')
     title = models.CharField(max_length=255)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    objects = SectionQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            touch_projects([self.project_id], plan=True)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            touch_projects([self.project_id], plan=True)
+            return super().delete(*args, **kwargs)
+
+
+def reaches_scope(scope, total):
+    """Whether ``total`` completes an item of ``scope``; an item without a scope never completes."""
+    return bool(scope) and total >= scope
+
+
+class ProgressItemQuerySet(models.QuerySet):
+    """Touches the owning projects on bulk writes and keeps the stored status current.
+
+    ``bulk_update`` and ``refresh_rollups`` go through ``update``, so entry
+    writes touch the project and refresh the status as well.
+    """
+
+    def project_ids(self):
+        return set(self.values_list('section__project_id', flat=True))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            section_ids = {obj.section_id for obj in objs}
+            touch_projects(Section.objects.filter(pk__in=section_ids).values_list('project_id', flat=True),
+                           plan=True)
+            # New rows have never been evaluated (their pks are unknown on MySQL).
+            self.model.objects.filter(section_id__in=section_ids, status_date__isnull=True).refresh_status()
+        return created
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db):
+            project_ids = self.project_ids()
+            if 'section' in kwargs or 'section_id' in kwargs:
+                section_id = getattr(kwargs.get('section'), 'pk', kwargs.get('section_id'))
+                project_ids.update(Section.objects.filter(pk=section_id).values_list('project_id', flat=True))
+            touch_projects(project_ids, plan=bool(self.model.PLAN_FIELDS.intersection(kwargs)))
+            if not self.model.STATUS_INPUTS.intersection(kwargs):
+                return super().update(**kwargs)
+            # Taken first: the update may change what this queryset matches.
+            item_ids = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            self.model.objects.filter(pk__in=item_ids).refresh_status()
+            return rows
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            touch_projects(self.project_ids(), plan=True)
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def refresh_rollups(self):
+        """Recompute the stored entry rollups of these items in one UPDATE."""
+        entries = ProgressEntry.objects.filter(item=OuterRef('pk')).order_by().values('item')
+        return self.update(
+            cumulative_done=Coalesce(
+                Subquery(entries.annotate(total=Sum('progress_done')).values('total')), 0.0,
+                output_field=models.FloatField()),
+            last_entry_date=Subquery(entries.annotate(last=Max('date')).values('last')),
+            entry_count=Coalesce(Subquery(entries.annotate(n=Count('id')).values('n')), 0),
+        )
+
+    def entry_dates(self):
+        """``{item_id: (first day with progress, day the total reached the scope)}`` for these items.
+
+        The actual start and completion dates the entries call for, with the
+        ``reaches_scope`` rule; either is ``None`` when it never happened.
+        One windowed query: per item only its first entry (carrying the
+        item-wide first progress day) and the one where the running total
+        crossed the scope come back.
+        """
+        by_item = [F('item_id')]
+        in_order = [F('date').asc()]
+        rows = (
+            ProgressEntry.objects.filter(item__in=self.values('pk')).order_by()
+            .annotate(
+                started=Window(Min(Case(When(progress_done__gt=0, then=F('date')))), partition_by=by_item),
+                position=Window(RowNumber(), partition_by=by_item, order_by=in_order),
+                running=Window(Sum('progress_done'), partition_by=by_item, order_by=in_order,
+                               frame=RowRange(None, 0)),
+                before=Window(Sum('progress_done'), partition_by=by_item, order_by=in_order,
+                              frame=RowRange(None, -1)),
+            )
+            .filter(Q(position=1) | Q(running__gte=F('item__scope'))
+                    & (Q(before__lt=F('item__scope')) | Q(before__isnull=True)))
+            .values_list('item_id', 'date', 'started', 'running', 'item__scope')
+        )
+        dates = {}
+        for item_id, day, started, running, scope in rows.iterator(chunk_size=10000):
+            completed = dates.get(item_id, (None, None))[1]
+            if reaches_scope(scope, running) and (completed is None or day < completed):
+                completed = day
+            dates[item_id] = (started, completed)
+        return dates
+
+    def refresh_status(self, today=None, batch_size=1000):
+        """Store the status and delay days of these items as of ``today``.
+
+        Uses the dashboard's rule (metrics.date_status). Only rows whose
+        status or delay changed are rewritten, with one UPDATE per batch;
+        project versions are left alone, since pages already vary by day.
+        Returns the number of rows that changed.
+        """
+        from .metrics import stored_status
+
+        today = today or timezone.now().date()
+        rows = list(self.order_by('pk').values_list(
+            'pk', 'scope', 'cumulative_done', 'targeted_end_date', 'scope_completed_date',
+            'status', 'delay_days', 'status_date'))
+        changed = [
+            (row[0], status, delay_days)
+            for row, (status, delay_days) in zip(rows, stored_status([row[1:5] for row in rows], today))
+            if (status, delay_days, today) != row[5:]
+        ]
+        for start in range(0, len(changed), batch_size):
+            batch = changed[start:start + batch_size]
+            # Not self.update(): that would touch the projects and call back here.
+            models.QuerySet.update(
+                self.model.objects.filter(pk__in=[pk for pk, _, _ in batch]),
+                status=Case(*[When(pk=pk, then=Value(status)) for pk, status, _ in batch]),
+                delay_days=Case(*[When(pk=pk, then=Value(days)) for pk, _, days in batch]),
+                status_date=today,
+            )
+        return len(changed)
+
 
 class ProgressItem(models.Model):
+    # Maintained from ProgressEntry writes, never from the item itself.
+    ROLLUP_FIELDS = ('cumulative_done', 'last_entry_date', 'entry_count')
+    # Edited in the plan editor; writing any of them bumps the plan version.
+    PLAN_FIELDS = frozenset({'section', 'section_id', 'description', 'uom', 'scope', 'order',
+                             'targeted_start_date', 'targeted_end_date'})
+    # Maintained by refresh_status() whenever one of STATUS_INPUTS changes,
+    # and for every item each night (manage.py refresh_item_status). The
+    # dashboard, section pages and PDF read today's status from here.
+    STATUS_FIELDS = ('status', 'delay_days', 'status_date')
+    STATUS_INPUTS = frozenset({'scope', 'cumulative_done', 'targeted_end_date', 'scope_completed_date'})
+
+    STATUS_MISSING = 'Missing Dates'
+    STATUS_ONTIME = 'Ontime'
+    STATUS_DELAY = 'Delay'
+    STATUS_CHOICES = [
+        (STATUS_MISSING, 'Missing Dates'),
+        (STATUS_ONTIME, 'Ontime'),
+        (STATUS_DELAY, 'Delay'),
+    ]
+
     section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name="items", null=True)
     description = models.CharField(max_length=255)
     uom = models.CharField(max_length=50)
@@ -42,11 +279,48 @@ class ProgressItem(models.Model):
     targeted_start_date = models.DateField(null=True, blank=True)
     targeted_end_date = models.DateField(null=True, blank=True)
 
+    cumulative_done = models.FloatField(default=0)
+    last_entry_date = models.DateField(null=True, blank=True)
+    entry_count = models.PositiveIntegerField(default=0)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_MISSING, db_index=True)
+    delay_days = models.PositiveIntegerField(default=0)
+    status_date = models.DateField(null=True, blank=True)
+
+    objects = ProgressItemQuerySet.as_manager()
+
     def __str__(self):
         return self.description
 
+    def save(self, *args, **kwargs):
+        # An instance loaded before its entries changed holds stale rollups;
+        # a plain save() must not write them back over the fresh values.
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.ROLLUP_FIELDS + self.STATUS_FIELDS
+            ]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.touch_project(plan=kwargs.get('update_fields') is None
+                               or bool(self.PLAN_FIELDS.intersection(kwargs['update_fields'])))
+            if ProgressItem.objects.filter(pk=self.pk).refresh_status():
+                self.refresh_from_db(fields=self.STATUS_FIELDS)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            self.touch_project(plan=True)
+            return super().delete(*args, **kwargs)
+
+    def touch_project(self, plan=False):
+        touch_projects(Section.objects.filter(pk=self.section_id).values_list('project_id', flat=True), plan)
+
+    def refresh_rollups(self):
+        ProgressItem.objects.filter(pk=self.pk).refresh_rollups()
+        self.refresh_from_db(fields=self.ROLLUP_FIELDS + self.STATUS_FIELDS)
+
     def total_progress(self):
-        return sum(entry.progress_done for entry in self.entries.all())
+        return self.cumulative_done
 
     def remaining_balance(self):
         return max(self.scope - self.total_progress(), 0) if self.scope else 0
@@ -58,22 +332,39 @@ class ProgressItem(models.Model):
                 return round(self.scope / days, 2)
         return 0
     
-    def set_auto_dates_if_missing(self):
+    def set_auto_dates_if_missing(self, started=None, completed=None, reset=False):
+        """Fill in the actual start/completion dates the progress calls for.
+
+        ``started`` is the first day with progress and ``completed`` the day
+        the running total reached the scope, as found in the entries (see
+        ``ProgressItemQuerySet.entry_dates``); today stands in for either when
+        not given. A completion date on an item that is no longer complete is
+        cleared. With ``reset`` both dates are replaced rather than filled in
+        (a start is kept if the entries show none). Returns whether anything
+        changed.
+        """
         today = timezone.now().date()
+        before = (self.scope_assigned_date, self.scope_completed_date)
+        if reset:
+            self.scope_assigned_date = started or self.scope_assigned_date
+            self.scope_completed_date = None
 
-        if not self.scope_assigned_date:
-            if self.targeted_start_date and self.targeted_start_date <= today:
-                self.scope_assigned_date = self.targeted_start_date
-            else:
-                self.scope_assigned_date = today
+        if not self.scope_assigned_date and self.cumulative_done > 0:
+            self.scope_assigned_date = started or today
+
+        if reaches_scope(self.scope, self.cumulative_done):
+            if not self.scope_completed_date:
+                self.scope_completed_date = completed or today
+        elif self.scope_completed_date:
+            self.scope_completed_date = None
 
-        total_done = self.entries.aggregate(total=models.Sum('progress_done'))['total'] or 0
-        if self.scope and total_done >= self.scope and not self.scope_completed_date:
-            self.scope_completed_date = today
+        return (self.scope_assigned_date, self.scope_completed_date) != before
 
     def get_status(self):
         today = timezone.now().date()
-        total_done = self.entries.aggregate(total=models.Sum('progress_done'))['total'] or 0
+        if self.status_date == today:
+            return self.status
+        total_done = self.cumulative_done
 
         # No target date → can't check
         if not self.targeted_end_date:
@@ -96,12 +387,159 @@ class ProgressItem(models.Model):
 
 
 
+class ProgressEntryQuerySet(models.QuerySet):
+    """Keeps ProgressItem rollups in step with bulk writes.
+
+    ``bulk_update`` goes through ``update`` and is covered by it.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            ProgressItem.objects.filter(pk__in={obj.item_id for obj in objs}).refresh_rollups()
+        return created
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db):
+            item_ids = set(self.values_list('item_id', flat=True))
+            rows = super().update(**kwargs)
+            if 'item' in kwargs or 'item_id' in kwargs:
+                item_ids.add(getattr(kwargs.get('item'), 'pk', kwargs.get('item_id')))
+            ProgressItem.objects.filter(pk__in=item_ids).refresh_rollups()
+        return rows
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            item_ids = set(self.values_list('item_id', flat=True))
+            result = super().delete()
+            ProgressItem.objects.filter(pk__in=item_ids).refresh_rollups()
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class ProgressEntry(models.Model):
     item = models.ForeignKey(ProgressItem, on_delete=models.CASCADE, related_name="entries")
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     date = models.DateField(default=timezone.now)
     progress_done = models.FloatField()
 
+    objects = ProgressEntryQuerySet.as_manager()
+
     class Meta:
         unique_together = ('item', 'date')
         ordering = ['date']
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            ProgressItem.objects.filter(pk=self.item_id).refresh_rollups()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            ProgressItem.objects.filter(pk=self.item_id).refresh_rollups()
+        return result
+
+
+class ProjectDailySnapshot(models.Model):
+    """Dashboard figures of one project, frozen as of the end of ``date``."""
+    project = models.ForeignKey(ProjectAccess, on_delete=models.CASCADE, related_name='snapshots')
+    date = models.DateField()
+
+    count_today = models.PositiveIntegerField(default=0)
+    count_ontime = models.PositiveIntegerField(default=0)
+    count_delay = models.PositiveIntegerField(default=0)
+    count_missing = models.PositiveIntegerField(default=0)
+
+    avg_ontime_percent = models.FloatField(default=0)
+    avg_delay_percent = models.FloatField(default=0)
+    overall_completion_percent = models.FloatField(default=0)
+    project_delay_days = models.IntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now=True)
+
+    FIGURES = (
+        'count_today', 'count_ontime', 'count_delay', 'count_missing',
+        'avg_ontime_percent', 'avg_delay_percent', 'overall_completion_percent',
+        'project_delay_days',
+    )
+
+    class Meta:
+        unique_together = ('project', 'date')
+        indexes = [models.Index(fields=['date'])]
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.project.project_name} @ {self.date}"
+
+
+class PdfJob(models.Model):
+    """A queued PDF export, rendered by the ``pdf_worker`` command."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    # ``report`` is PROJECT_REPORT, or ``rollup:<period>:<start>:<end>`` for
+    # a rollup report (see jobs.rollup_report).
+    PROJECT_REPORT = 'project'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(ProjectAccess, on_delete=models.CASCADE, related_name='pdf_jobs')
+    report = models.CharField(max_length=64, default=PROJECT_REPORT)
+    report_date = models.DateField()
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    file_path = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"PDF {self.project_id} {self.report} @ {self.report_date} ({self.status})"
+
+    def filename(self):
+        if self.report == self.PROJECT_REPORT:
+            return f"Project_{self.project_id}_Report.pdf"
+        period = self.report.split(':')[1]
+        return f"Project_{self.project_id}_{period.capitalize()}ly_Report.pdf"
+
+
+class SlowRequest(models.Model):
+    """A request over PROFILING_SLOW_MS, kept by the profiling middleware (newest rows only)."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+
+    total_ms = models.FloatField()
+    view_ms = models.FloatField()
+    db_ms = models.FloatField()
+    template_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    duplicate_count = models.PositiveIntegerField(default=0)
+    duplicate_sql = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['view_name', 'created_at'])]
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} {self.total_ms:.0f} ms"
@@ -0,0 +1,248 @@
+"""Project PDF reports and their on-disk cache.
+
+Rendering ``project_pdf_template.html`` through xhtml2pdf costs seconds of CPU
+for a large project, while the report itself only changes when the project's
+data does. Generated files are therefore kept under ``PDF_CACHE_DIR``, named
+after the project, the report date and a fingerprint of the report data, and
+served as-is on the next download. The fingerprint is taken over the computed
+report (one metrics query), so any edit that changes what the PDF would show
+produces a new file name.
+
+The cache is bounded by ``PDF_CACHE_MAX_BYTES``: a file's mtime is its last
+use, and the least recently used files are evicted after every write (see
+also the ``prune_pdf_cache`` command).
+"""
+from concurrent.futures import FIRST_COMPLETED, wait
+import hashlib
+import json
+import os
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import get_template
+from xhtml2pdf import pisa
+
+from .metrics import project_report
+from .models import ProjectAccess
+from .pool import process_pool
+from .rollups import project_rollup, report_tables
+
+
+PDF_TEMPLATE = 'project_pdf_template.html'
+ROLLUP_TEMPLATE = 'project_rollup_report.html'
+
+
+class PdfRenderError(Exception):
+    pass
+
+
+def cache_dir():
+    return Path(getattr(settings, 'PDF_CACHE_DIR', Path(settings.BASE_DIR) / 'pdf_cache'))
+
+
+def cache_max_bytes():
+    return getattr(settings, 'PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+
+
+def report_context(project, today, frame=None):
+    return {
+        'project': project,
+        'today': today,
+        **project_report(project, today, frame),
+    }
+
+
+def report_fingerprint(context, template_name=PDF_TEMPLATE):
+    """Digest of everything the rendered PDF depends on."""
+    project = context['project']
+    template_path = get_template(template_name).origin.name
+    stat = os.stat(template_path)
+    data = {
+        key: value for key, value in context.items() if key != 'project'
+    }
+    data['project'] = (
+        project.project_name, project.get_type_of_project_display(),
+        project.location, str(project.user),
+    )
+    data['template'] = (template_name, stat.st_mtime_ns, stat.st_size)
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def render_pdf(context, template_name=PDF_TEMPLATE):
+    html = get_template(template_name).render(context)
+    output = BytesIO()
+    pisa_status = pisa.CreatePDF(html, dest=output)
+    if pisa_status.err:
+        raise PdfRenderError(f"xhtml2pdf reported {pisa_status.err} error(s)")
+    return output.getvalue()
+
+
+def cache_path(prefix, today, fingerprint):
+    return cache_dir() / f"{prefix}-{today.isoformat()}-{fingerprint}.pdf"
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        # Evicted by another process between the lookup and now.
+        return False
+
+
+def _store(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(content)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def cached_pdf(context, prefix, template_name=PDF_TEMPLATE, render=True):
+    """Path of the PDF for ``context``, rendering it only on a cache miss.
+
+    Returns ``(path, hit)``; with ``render=False`` a miss returns
+    ``(None, False)`` instead. Older files of the same report (same prefix
+    and date, another fingerprint) are dropped when a new one is written.
+    """
+    today = context['today']
+    path = cache_path(prefix, today, report_fingerprint(context, template_name))
+    if path.exists() and _touch(path):
+        return path, True
+    if not render:
+        return None, False
+
+    content = render_pdf(context, template_name)
+    _store(path, content)
+    for stale in path.parent.glob(f"{prefix}-{today.isoformat()}-*.pdf"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    prune_cache(keep=path)
+    return path, False
+
+
+def project_pdf(project, today, frame=None):
+    """Cached PDF report of one project: ``(path, hit)``."""
+    return cached_pdf(report_context(project, today, frame), f"project-{project.id}")
+
+
+def rollup_context(project, today, kind, start, end):
+    rollup = project_rollup(project, kind, start, end)
+    return {'project': project, 'today': today, 'rollup': rollup, 'sections': report_tables(rollup)}
+
+
+def rollup_pdf(project, today, kind, start, end, render=True):
+    """Cached PDF of a rollup report: ``(path, hit)``, see ``cached_pdf``."""
+    context = {**rollup_context(project, today, kind, start, end), 'pdf': True}
+    prefix = f"rollup-{project.id}-{kind}-{context['rollup']['start']}-{end}"
+    return cached_pdf(context, prefix, ROLLUP_TEMPLATE, render)
+
+
+def render_project_file(project_id, today):
+    """Pool task: make sure the project's PDF is cached, return ``(path, project_name)``."""
+    project = ProjectAccess.objects.select_related('user').get(id=project_id)
+    path, _ = project_pdf(project, today)
+    return os.fspath(path), project.project_name
+
+
+def iter_project_pdfs(project_ids, today, processes, pool=None):
+    """Render the reports of ``project_ids`` in a process pool, yielding as each finishes.
+
+    Yields ``(project_id, path, project_name, error)``; at most two tasks per
+    process are in flight, so memory does not grow with the number of projects.
+    Without ``pool`` a private one is started and shut down at the end; a
+    given pool is left running and only this export's queued tasks are
+    cancelled if the caller stops early.
+    """
+    project_ids = iter(project_ids)
+    pending = {}
+    own_pool = pool is None
+    if own_pool:
+        pool = process_pool(processes)
+
+    def submit():
+        while len(pending) < processes * 2:
+            project_id = next(project_ids, None)
+            if project_id is None:
+                return
+            pending[pool.submit(render_project_file, project_id, today)] = project_id
+
+    try:
+        submit()
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                project_id = pending.pop(future)
+                try:
+                    path, name = future.result()
+                except Exception as exc:
+                    yield project_id, None, None, f"{type(exc).__name__}: {exc}"
+                else:
+                    yield project_id, path, name, None
+            submit()
+    finally:
+        if own_pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+        else:
+            for future in pending:
+                future.cancel()
+
+
+def zip_members(project_ids, today, processes, pool=None):
+    """``stream_zip`` members for a batch export, plus an errors.txt if any report failed."""
+    errors = []
+    for project_id, path, name, error in iter_project_pdfs(project_ids, today, processes, pool):
+        if error is None and not os.path.exists(path):
+            error = "evicted from the PDF cache before it could be sent"
+        if error is not None:
+            errors.append(f"Project {project_id}: {error}")
+            continue
+        safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+        yield f"Project_{project_id}_{safe_name}_{today.isoformat()}.pdf", path
+    if errors:
+        yield 'errors.txt', '\n'.join(errors).encode() + b'\n'
+
+
+def prune_cache(max_bytes=None, max_age=None, keep=None):
+    """Evict least recently used files until the cache fits ``max_bytes``.
+
+    ``max_age`` (seconds) additionally drops every file unused for that long.
+    Returns ``(files_removed, bytes_removed)``.
+    """
+    if max_bytes is None:
+        max_bytes = cache_max_bytes()
+    directory = cache_dir()
+    if not directory.is_dir():
+        return 0, 0
+
+    entries = []
+    for path in directory.glob('*.pdf'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    cutoff = time.time() - max_age if max_age is not None else None
+    removed = freed = 0
+    for mtime, size, path in entries:
+        expired = cutoff is not None and mtime < cutoff
+        if not expired and total <= max_bytes:
+            continue
+        if path == keep:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+        freed += size
+    return removed, freed
@@ -0,0 +1,215 @@
+"""Row-level edits of a project plan (the plan editor's PATCH endpoint).
+
+A batch is ``{"version": <ProjectAccess.plan_version the editor loaded>, "ops": [...]}``
+with operations such as
+
+* ``{"op": "create", "type": "section", "ref": "s1", "title": "Civil"}``
+* ``{"op": "update", "type": "section", "id": 5, "title": "Civil works"}``
+* ``{"op": "create", "type": "item", "ref": "i1", "section": 5 or "s1", "order": 3, "values": {...}}``
+* ``{"op": "update", "type": "item", "id": 9, "values": {"scope": "120"}}``
+* ``{"op": "move", "type": "item", "id": 9, "section": 6 or "s1", "order": 0}``
+* ``{"op": "delete", "type": "section" or "item", "id": 9}``
+
+``values`` holds any of ``ITEM_VALUES``, given as the editor's inputs hold
+them (dates as dd-mm-yyyy). ``ref`` names a new row so that later operations
+of the same batch can point at it; the response maps refs to the new ids.
+
+The batch is applied in one transaction with the project row locked, and is
+refused when the project's plan version is no longer the one given, so an
+editor never overwrites plan changes it has not seen. Progress entries do not
+move the plan version: logging progress never conflicts with a plan edit.
+Only the rows named in the batch are read and written, one statement per
+kind of change, so a save costs what the edit touches rather than what the
+plan holds.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import connection, transaction
+
+from .models import ProgressItem, ProjectAccess, Section
+
+
+ITEM_VALUES = ('description', 'uom', 'scope', 'targeted_start_date', 'targeted_end_date')
+
+OPERATIONS = {
+    ('create', 'section'), ('update', 'section'), ('delete', 'section'),
+    ('create', 'item'), ('update', 'item'), ('move', 'item'), ('delete', 'item'),
+}
+
+
+class PlanOpError(Exception):
+    """A batch that cannot be applied; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class VersionConflict(PlanOpError):
+    def __init__(self, version):
+        super().__init__("The plan was changed by someone else; reload it before saving.", status=409)
+        self.version = version
+
+
+def parse_plan_date(dstr):
+    try:
+        return datetime.strptime(dstr.strip(), "%d-%m-%Y").date() if dstr.strip() else None
+    except ValueError:
+        return None
+
+
+def _row_id(op, key='id'):
+    value = op.get(key)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise PlanOpError(f"{op['op']} {op['type']}: '{key}' must be a row id.")
+    return value
+
+
+def _order(op):
+    value = op.get('order', 0)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise PlanOpError(f"{op['op']} item: 'order' must be a non-negative integer.")
+    return value
+
+
+def _text(op, value, field, max_length, required=False):
+    text = str(value if value is not None else '').strip()
+    if required and not text:
+        raise PlanOpError(f"{op['op']} {op['type']}: '{field}' must not be blank.")
+    if len(text) > max_length:
+        raise PlanOpError(f"{op['op']} {op['type']}: '{field}' is longer than {max_length} characters.")
+    return text
+
+
+def _item_values(op, required=False):
+    values = op.get('values')
+    if not isinstance(values, dict) or not values.keys() <= set(ITEM_VALUES):
+        raise PlanOpError(f"{op['op']} item: 'values' may only hold {', '.join(ITEM_VALUES)}.")
+    if required and 'description' not in values:
+        raise PlanOpError("create item: a description is required.")
+    cleaned = {}
+    for field, value in values.items():
+        if field == 'scope':
+            text = str(value if value is not None else '').strip()
+            try:
+                cleaned[field] = float(text) if text else None
+            except ValueError:
+                raise PlanOpError(f"{op['op']} item: scope {value!r} is not a number.")
+        elif field in ('targeted_start_date', 'targeted_end_date'):
+            cleaned[field] = parse_plan_date(str(value or ''))
+        else:
+            max_length = ProgressItem._meta.get_field(field).max_length
+            cleaned[field] = _text(op, value, field, max_length, required=field == 'description')
+    return cleaned
+
+
+def _create(model, objs):
+    if connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(objs)
+    else:
+        # MySQL does not hand back the ids of bulk-inserted rows, which the
+        # editor (and items of new sections) need.
+        for obj in objs:
+            obj.save()
+
+
+def apply_plan_ops(project, user, version, ops):
+    """Apply a batch to ``project``; returns ``(new version, {ref: new id})``.
+
+    Raises VersionConflict when ``version`` is stale and PlanOpError when
+    the batch is malformed or names rows outside the project.
+    """
+    if isinstance(version, bool) or not isinstance(version, int):
+        raise PlanOpError("'version' must be the plan version the editor loaded.")
+    if not isinstance(ops, list):
+        raise PlanOpError("'ops' must be a list of operations.")
+    batch = defaultdict(list)
+    for op in ops:
+        kind = (op.get('op'), op.get('type')) if isinstance(op, dict) else None
+        if kind not in OPERATIONS:
+            raise PlanOpError(f"Unknown operation: {op!r}")
+        batch[kind].append(op)
+
+    with transaction.atomic():
+        current = (ProjectAccess.objects.select_for_update().filter(pk=project.pk)
+                   .values_list('plan_version', flat=True).get())
+        if version != current:
+            raise VersionConflict(current)
+        if not ops:
+            return current, {}
+
+        # Every row the batch names, one query per model.
+        item_refs = [op.get('section') for kind in (('create', 'item'), ('move', 'item')) for op in batch[kind]]
+        section_ids = {_row_id(op) for kind in (('update', 'section'), ('delete', 'section')) for op in batch[kind]}
+        section_ids.update(ref for ref in item_refs if isinstance(ref, int) and not isinstance(ref, bool))
+        sections = Section.objects.filter(project=project).in_bulk(section_ids)
+        item_ids = {_row_id(op) for kind in (('update', 'item'), ('move', 'item'), ('delete', 'item'))
+                    for op in batch[kind]}
+        items = ProgressItem.objects.filter(section__project=project).in_bulk(item_ids)
+        missing = (section_ids - sections.keys()) | (item_ids - items.keys())
+        if missing:
+            raise PlanOpError(f"Rows {sorted(missing)} are not part of this project.", status=404)
+
+        created = {}
+        new_sections = {}
+        for op in batch[('create', 'section')]:
+            ref = op.get('ref')
+            if not isinstance(ref, str) or ref in new_sections:
+                raise PlanOpError("create section: every new section needs its own string 'ref'.")
+            new_sections[ref] = Section(
+                project=project, created_by=user,
+                title=_text(op, op.get('title'), 'title', Section._meta.get_field('title').max_length, True))
+        _create(Section, list(new_sections.values()))
+        created.update((ref, section.id) for ref, section in new_sections.items())
+
+        def section_for(op):
+            ref = op.get('section')
+            section = new_sections.get(ref) if isinstance(ref, str) else sections.get(ref)
+            if section is None:
+                raise PlanOpError(f"{op['op']} item: 'section' must be a section id or a new section's ref.")
+            return section
+
+        renamed = []
+        for op in batch[('update', 'section')]:
+            section = sections[op['id']]
+            section.title = _text(op, op.get('title'), 'title', Section._meta.get_field('title').max_length, True)
+            renamed.append(section)
+        if renamed:
+            Section.objects.bulk_update(renamed, ['title'])
+
+        new_items = {}
+        for op in batch[('create', 'item')]:
+            ref = op.get('ref')
+            if not isinstance(ref, str) or ref in new_items or ref in created:
+                raise PlanOpError("create item: every new item needs its own string 'ref'.")
+            new_items[ref] = ProgressItem(section=section_for(op), created_by=user, order=_order(op),
+                                          **_item_values(op, required=True))
+        _create(ProgressItem, list(new_items.values()))
+        created.update((ref, item.id) for ref, item in new_items.items())
+
+        changed_fields = set()
+        changed_items = {}
+        for op in batch[('update', 'item')]:
+            item = items[op['id']]
+            for field, value in _item_values(op).items():
+                setattr(item, field, value)
+                changed_fields.add(field)
+            changed_items[item.id] = item
+        for op in batch[('move', 'item')]:
+            item = items[op['id']]
+            item.section = section_for(op)
+            item.order = _order(op)
+            changed_fields.update(('section', 'order'))
+            changed_items[item.id] = item
+        if changed_items:
+            ProgressItem.objects.bulk_update(list(changed_items.values()), sorted(changed_fields), batch_size=500)
+
+        deleted_items = {op['id'] for op in batch[('delete', 'item')]}
+        if deleted_items:
+            ProgressItem.objects.filter(pk__in=deleted_items).delete()
+        deleted_sections = {op['id'] for op in batch[('delete', 'section')]}
+        if deleted_sections:
+            Section.objects.filter(pk__in=deleted_sections).delete()
+
+        return ProjectAccess.objects.filter(pk=project.pk).values_list('plan_version', flat=True).get(), created
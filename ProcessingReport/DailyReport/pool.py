@@ -0,0 +1,47 @@
+"""Process pools for CPU-bound work (PDF rendering) outside the request cycle.
+
+Kept free of model imports: spawned children import this module to run the
+initializer before the app registry is ready.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import threading
+
+import django
+from django.conf import settings
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def init_process():
+    django.setup()
+
+
+def process_pool(processes):
+    """A spawn-based pool whose children set up Django and open their own connections.
+
+    A spawned child starts a fresh interpreter and inherits none of the
+    caller's database connections, so those are left open.
+    """
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_process,
+    )
+
+
+def shared_pool():
+    """The pool shared by every request of this server process.
+
+    Started on first use with ``PDF_EXPORT_PROCESSES`` workers and kept until
+    the process exits, so concurrent downloads queue on the same warm
+    children instead of each spawning its own. A broken pool (a child died)
+    is replaced on the next call.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None or _shared._broken:
+            _shared = process_pool(getattr(settings, 'PDF_EXPORT_PROCESSES', 2))
+        return _shared
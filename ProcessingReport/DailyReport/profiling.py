@@ -0,0 +1,301 @@
+"""Query counting and per-request profiling.
+
+``ProfilingMiddleware`` measures every request: SQL statements and their
+time (through ``execute_wrapper``), template rendering, the view and the
+whole request. Django hands the wrapper parameterised SQL, so identical
+strings are the same statement with different arguments; one repeated
+``PROFILING_DUPLICATE_THRESHOLD`` times or more is flagged as an N+1 pattern.
+
+The figures go out in a ``Server-Timing`` header; requests slower than
+``PROFILING_SLOW_MS`` are also stored as SlowRequest rows, of which only the
+newest ``PROFILING_SLOW_LOG_SIZE`` are kept. The overhead is a counter and a
+dict update per query and two clock reads per template.
+
+The middleware runs natively under WSGI and ASGI. The current request's
+profile lives in a context variable, which follows the request into
+``sync_to_async`` threads, and every connection carries one wrapper that
+reports to it, so queries made in worker threads are counted too. A streamed
+body is produced after the headers have gone out: its ``Server-Timing``
+covers the view only and says so (``body;desc="streamed"``), while the slow
+request check runs once the body is finished and covers all of it. File
+downloads are timed as ordinary responses, since sending a file runs no
+code of ours.
+"""
+from collections import Counter
+from contextvars import ContextVar
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.http import FileResponse
+
+
+logger = logging.getLogger(__name__)
+
+_current_profile = ContextVar('request_profile', default=None)
+
+
+class QueryCounter:
+    """Counts the SQL statements run on one connection inside a ``with`` block.
+
+    Uses ``execute_wrapper`` so it works with DEBUG off and costs one
+    function call per query.
+    """
+
+    def __init__(self, using='default'):
+        self.connection = connections[using]
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.count = 0
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+
+class RequestProfile(QueryCounter):
+    """QueryCounter that also times queries and remembers repeated statements."""
+
+    def __init__(self, using='default'):
+        super().__init__(using)
+        self.statements = Counter()
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.view_started = None
+        self.view_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.statements[sql] += 1
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+
+    def duplicates(self, threshold):
+        """``(repeats, sql)`` of the most repeated statement, if it reaches ``threshold``."""
+        if not self.statements:
+            return 0, ''
+        sql, repeats = self.statements.most_common(1)[0]
+        return (repeats, sql) if repeats >= threshold else (0, '')
+
+
+def _profiled_execute(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def _instrument_connection(connection, **kwargs):
+    # First in the list: ``execute_wrapper`` blocks (QueryCounter) pop the last one.
+    if _profiled_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _profiled_execute)
+
+
+def _instrument_templates():
+    """Time top-level template renders for the current request's profile."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'profiled', False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        profile = _current_profile.get()
+        if profile is None:
+            return original(self, context, request)
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            profile.template_time += time.perf_counter() - started
+
+    render.profiled = True
+    Template.render = render
+
+
+def _view_starts():
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.view_started = time.perf_counter()
+
+
+def _header_text(value):
+    return ' '.join(value.replace('"', "'").replace('\\', '/').split())[:100]
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # Django would run a sync process_view in a thread on every request.
+            self.process_view = self.aprocess_view
+        self.enabled = getattr(settings, 'PROFILING_ENABLED', True)
+        self.slow_ms = getattr(settings, 'PROFILING_SLOW_MS', 1000)
+        self.duplicate_threshold = getattr(settings, 'PROFILING_DUPLICATE_THRESHOLD', 5)
+        self.log_size = getattr(settings, 'PROFILING_SLOW_LOG_SIZE', 1000)
+        if self.enabled:
+            _instrument_templates()
+            connection_created.connect(_instrument_connection, dispatch_uid='profiling')
+            for connection in connections.all(initialized_only=True):
+                _instrument_connection(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+
+        if self.is_streamed(response):
+            return self.profile_body(request, response, profile, started)
+        total = self.add_header(response, profile, started)
+        if total * 1000 >= self.slow_ms:
+            self.log_slow_request(request, response, profile, total)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+
+        if self.is_streamed(response):
+            return self.profile_body(request, response, profile, started)
+        total = self.add_header(response, profile, started)
+        if total * 1000 >= self.slow_ms:
+            await sync_to_async(self.log_slow_request)(request, response, profile, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _view_starts()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        _view_starts()
+
+    @staticmethod
+    def is_streamed(response):
+        return response.streaming and not isinstance(response, FileResponse)
+
+    def add_header(self, response, profile, started, streamed=False):
+        """Set ``Server-Timing`` from the figures so far; returns the elapsed seconds."""
+        total = time.perf_counter() - started
+        if profile.view_started is not None:
+            profile.view_time = time.perf_counter() - profile.view_started
+
+        repeats, duplicate_sql = profile.duplicates(self.duplicate_threshold)
+        timings = [
+            f'db;dur={profile.db_time * 1000:.1f};desc="{profile.count} queries"',
+            f'tpl;dur={profile.template_time * 1000:.1f}',
+            f'view;dur={profile.view_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        if repeats:
+            timings.append(f'dup;desc="{repeats}x {_header_text(duplicate_sql)}"')
+        if streamed:
+            timings.append('body;desc="streamed"')
+        response['Server-Timing'] = ', '.join(timings)
+        return total
+
+    def profile_body(self, request, response, profile, started):
+        self.add_header(response, profile, started, streamed=True)
+        stream = self.astream if response.is_async else self.stream
+        response.streaming_content = stream(response.streaming_content, request, response, profile, started)
+        return response
+
+    def stream(self, content, request, response, profile, started):
+        """``content`` produced with ``profile`` current; the request is checked for slowness once it is sent."""
+        chunks = iter(content)
+        try:
+            while True:
+                token = _current_profile.set(profile)
+                try:
+                    chunk = next(chunks, None)
+                finally:
+                    _current_profile.reset(token)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            total = time.perf_counter() - started
+            if total * 1000 >= self.slow_ms:
+                self.log_slow_request(request, response, profile, total)
+
+    async def astream(self, content, request, response, profile, started):
+        chunks = aiter(content)
+        try:
+            while True:
+                token = _current_profile.set(profile)
+                try:
+                    chunk = await anext(chunks, None)
+                finally:
+                    _current_profile.reset(token)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            total = time.perf_counter() - started
+            if total * 1000 >= self.slow_ms:
+                await sync_to_async(self.log_slow_request)(request, response, profile, total)
+
+    def log_slow_request(self, request, response, profile, total):
+        from .models import SlowRequest
+
+        repeats, duplicate_sql = profile.duplicates(self.duplicate_threshold)
+        match = getattr(request, 'resolver_match', None)
+        user = getattr(request, 'user', None)
+        logger.warning("Slow request %s %s: %.0f ms, %d queries (%.0f ms)",
+                       request.method, request.path, total * 1000, profile.count, profile.db_time * 1000)
+        try:
+            row = SlowRequest.objects.create(
+                method=request.method,
+                path=request.path[:500],
+                view_name=(match.view_name if match else '')[:200],
+                status_code=response.status_code,
+                user=user if user is not None and user.is_authenticated else None,
+                total_ms=round(total * 1000, 1),
+                view_ms=round(profile.view_time * 1000, 1),
+                db_ms=round(profile.db_time * 1000, 1),
+                template_ms=round(profile.template_time * 1000, 1),
+                query_count=profile.count,
+                duplicate_count=repeats,
+                duplicate_sql=duplicate_sql[:2000],
+            )
+            if row.pk % 50 == 0:
+                # Rolling log: drop everything older than the newest log_size rows.
+                cutoff = (SlowRequest.objects.order_by('-pk')
+                          .values_list('pk', flat=True)[self.log_size:self.log_size + 1].first())
+                if cutoff is not None:
+                    SlowRequest.objects.filter(pk__lte=cutoff).delete()
+        except DatabaseError:
+            logger.exception("Could not store the slow request log entry.")
@@ -0,0 +1,189 @@
+"""Weekly and monthly progress rollups of a project, aggregated in the database.
+
+Entries in the report range are truncated to their week (Monday) or month
+and summed by the database, in one query each: per item, per section and
+for the whole project. One more query gives each item's progress from
+before the range, so running totals start from the right value. Item rows
+are in the item's own unit. Sections and the project are in percent of
+scope, with every item that has a scope weighing the same, as in the
+dashboard.
+
+An item's planned quantity for a period is ``expected_per_day()`` times the
+days of the period that fall between its target start and end dates.
+"""
+from datetime import date, timedelta
+
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import ProgressEntry, ProgressItem
+
+
+PERIODS = ('week', 'month')
+TRUNC = {'week': TruncWeek, 'month': TruncMonth}
+DEFAULT_PERIODS = 12
+
+
+def period_start(kind, day):
+    if kind == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def next_period(kind, start):
+    if kind == 'week':
+        return start + timedelta(days=7)
+    return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def default_range(kind, today):
+    """The last ``DEFAULT_PERIODS`` periods up to ``today``."""
+    start = period_start(kind, today)
+    for _ in range(DEFAULT_PERIODS - 1):
+        start = period_start(kind, start - timedelta(days=1))
+    return start, today
+
+
+def period_axis(kind, start, end):
+    """``(first day, last day)`` of every period from the one holding ``start`` to the one holding ``end``."""
+    periods = []
+    first = period_start(kind, start)
+    while first <= end:
+        following = next_period(kind, first)
+        periods.append((first, following - timedelta(days=1)))
+        first = following
+    return periods
+
+
+def period_label(kind, first):
+    if kind == 'week':
+        year, week, _ = first.isocalendar()
+        return f"W{week:02d} {year}"
+    return first.strftime('%b %Y')
+
+
+def _planned(item, periods):
+    rate = item.expected_per_day()
+    if not rate:
+        return [0] * len(periods)
+    return [
+        round(rate * max((min(last, item.targeted_end_date) - max(first, item.targeted_start_date)).days + 1, 0), 2)
+        for first, last in periods
+    ]
+
+
+def _percent(total, weight):
+    return round(100 * total / weight, 2) if weight else 0
+
+
+def project_rollup(project, kind, start, end):
+    """Per-period actual and planned progress of ``project`` between ``start`` and ``end``."""
+    periods = period_axis(kind, start, end)
+    start = periods[0][0]
+    position = {first: i for i, (first, _) in enumerate(periods)}
+    size = len(periods)
+
+    items = list(
+        ProgressItem.objects.filter(section__project=project).select_related('section')
+        .only('id', 'description', 'uom', 'scope', 'order', 'targeted_start_date', 'targeted_end_date',
+              'section__id', 'section__title')
+        .order_by('section_id', 'order', 'id')
+    )
+    entries = ProgressEntry.objects.filter(
+        item__section__project=project, date__gte=start, date__lte=end,
+    ).annotate(period=TRUNC[kind]('date')).order_by()
+    weighted = entries.filter(item__scope__gt=0).annotate(share=F('progress_done') / F('item__scope'))
+
+    done = {}
+    for item_id, first, total in entries.values('item_id', 'period').annotate(
+            total=Sum('progress_done')).values_list('item_id', 'period', 'total'):
+        done.setdefault(item_id, [0] * size)[position[first]] = total
+    section_share = {}
+    for section_id, first, share in weighted.values('item__section_id', 'period').annotate(
+            total=Sum('share')).values_list('item__section_id', 'period', 'total'):
+        section_share.setdefault(section_id, [0] * size)[position[first]] = share
+    project_share = [0] * size
+    for first, share in weighted.values('period').annotate(total=Sum('share')).values_list('period', 'total'):
+        project_share[position[first]] = share
+    opening = dict(
+        ProgressEntry.objects.filter(item__section__project=project, date__lt=start).order_by()
+        .values('item_id').annotate(total=Sum('progress_done')).values_list('item_id', 'total')
+    )
+
+    sections = []
+    project_planned = [0] * size
+    project_weight = 0
+    for item in items:
+        if not sections or sections[-1]['id'] != item.section_id:
+            sections.append({'id': item.section_id, 'title': item.section.title, 'items': [],
+                             'planned_share': [0] * size, 'weight': 0})
+        section = sections[-1]
+        item_done = done.get(item.id, [0] * size)
+        planned = _planned(item, periods)
+        cumulative, running = [], opening.get(item.id, 0)
+        for value in item_done:
+            running += value
+            cumulative.append(round(running, 2))
+        section['items'].append({
+            'id': item.id,
+            'description': item.description,
+            'uom': item.uom,
+            'scope': item.scope,
+            'done': [round(value, 2) for value in item_done],
+            'planned': planned,
+            'cumulative': cumulative,
+            'done_total': round(sum(item_done), 2),
+            'planned_total': round(sum(planned), 2),
+        })
+        if item.scope and item.scope > 0:
+            section['weight'] += 1
+            for i, value in enumerate(planned):
+                section['planned_share'][i] += value / item.scope
+
+    for section in sections:
+        weight = section.pop('weight')
+        planned_share = section.pop('planned_share')
+        actual_share = section_share.get(section['id'], [0] * size)
+        section['actual_pct'] = [_percent(value, weight) for value in actual_share]
+        section['planned_pct'] = [_percent(value, weight) for value in planned_share]
+        project_weight += weight
+        project_planned = [a + b for a, b in zip(project_planned, planned_share)]
+
+    return {
+        'period': kind,
+        'start': start,
+        'end': end,
+        'periods': [{'start': first, 'end': last, 'label': period_label(kind, first)} for first, last in periods],
+        'actual_pct': [_percent(value, project_weight) for value in project_share],
+        'planned_pct': [_percent(value, project_weight) for value in project_planned],
+        'sections': sections,
+    }
+
+
+def report_tables(rollup):
+    """Rows of the report, one list per section: the section (in percent), then its items.
+
+    ``cells`` pairs actual with planned per period; ``total`` is the pair
+    over the whole range. One table per section keeps the PDF renderer from
+    splitting a single table of every item across pages, which it does in
+    quadratic time.
+    """
+    tables = []
+    for section in rollup['sections']:
+        rows = [{
+            'section': True,
+            'label': section['title'],
+            'unit': '%',
+            'cells': list(zip(section['actual_pct'], section['planned_pct'])),
+            'total': (round(sum(section['actual_pct']), 2), round(sum(section['planned_pct']), 2)),
+        }]
+        for item in section['items']:
+            rows.append({
+                'section': False,
+                'label': item['description'],
+                'unit': item['uom'],
+                'cells': list(zip(item['done'], item['planned'])),
+                'total': (item['done_total'], item['planned_total']),
+            })
+        tables.append(rows)
+    return tables
@@ -0,0 +1,147 @@
+"""Planned vs actual cumulative progress (S-curves) for an item, section or project.
+
+Items and entries are read with one query each, the entries ordered by date;
+both curves are then built on a daily NumPy axis:
+
+* planned: an item's scope spread evenly from its targeted start to its
+  targeted end date (a difference array, summed twice);
+* actual: the daily ``progress_done`` of its entries, summed once.
+
+Items measure different things, so sections and projects are shown in
+percent: every item with a scope weighs the same, as in the dashboard's
+overall completion. A single item also gets its curves in its own unit.
+Items without both target dates count towards the total but add nothing to
+the planned line. Weekly and monthly buckets keep the value of each
+bucket's last day.
+"""
+import numpy as np
+
+from .models import ProgressEntry, ProgressItem
+
+
+BUCKETS = ('day', 'week', 'month')
+
+ITEM_FIELDS = ('id', 'uom', 'scope', 'targeted_start_date', 'targeted_end_date')
+
+
+def load_curve_rows(project_id, section_id=None, item_id=None):
+    """``(items, entries)`` value rows of one project, optionally narrowed to a section or item."""
+    items = ProgressItem.objects.filter(section__project_id=project_id)
+    if section_id is not None:
+        items = items.filter(section_id=section_id)
+    if item_id is not None:
+        items = items.filter(pk=item_id)
+    item_rows = list(items.order_by('id').values_list(*ITEM_FIELDS))
+    entry_rows = list(
+        ProgressEntry.objects.filter(item__in=items.values('pk'))
+        .order_by('date', 'item_id')
+        .values_list('item_id', 'date', 'progress_done')
+    )
+    return item_rows, entry_rows
+
+
+def _days(dates):
+    return np.array(dates, dtype='datetime64[D]')
+
+
+def _bucket_ends(axis, bucket):
+    """Indices into ``axis`` of the last day of each bucket."""
+    if bucket == 'day':
+        return np.arange(len(axis))
+    if bucket == 'week':
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday.
+        keys = (axis.astype(np.int64) + 3) // 7
+    else:
+        keys = axis.astype('datetime64[M]').astype(np.int64)
+    return np.append(np.flatnonzero(keys[1:] != keys[:-1]), len(axis) - 1)
+
+
+def _values(series, mask=None):
+    values = np.round(series, 2).tolist()
+    if mask is not None:
+        values = [None if hidden else value for value, hidden in zip(values, mask.tolist())]
+    return values
+
+
+def build_s_curve(item_rows, entry_rows, today, bucket='day', quantities=False):
+    """Dates and planned/actual cumulative series for the given rows.
+
+    ``actual`` is ``None`` after the later of ``today`` and the last entry.
+    With ``quantities`` (one item) ``planned_qty`` and ``actual_qty`` are
+    included in the item's unit.
+    """
+    ids = np.array([row[0] for row in item_rows], dtype=np.int64)
+    scope = np.array([row[2] or 0 for row in item_rows], dtype=np.float64)
+    start = _days([row[3] for row in item_rows])
+    end = _days([row[4] for row in item_rows])
+
+    weighted = scope > 0
+    planned_item = weighted & ~np.isnat(start) & ~np.isnat(end) & (end >= start)
+    weight = np.where(weighted, 100 / np.where(weighted, scope, 1) / max(int(weighted.sum()), 1), 0)
+
+    entry_item = np.searchsorted(ids, np.array([row[0] for row in entry_rows], dtype=np.int64))
+    entry_day = _days([row[1] for row in entry_rows])
+    done = np.array([row[2] for row in entry_rows], dtype=np.float64)
+
+    result = {
+        'bucket': bucket,
+        'items': len(item_rows),
+        'weighted_items': int(weighted.sum()),
+        'missing_dates': int((weighted & ~planned_item).sum()),
+        'dates': [], 'planned': [], 'actual': [],
+    }
+    if quantities:
+        result.update(planned_qty=[], actual_qty=[])
+
+    bounds = [start[planned_item], end[planned_item], entry_day[:1], entry_day[-1:]]
+    known = np.concatenate(bounds)
+    if not len(known):
+        return result
+    first = known.min()
+    last = max(known.max(), np.datetime64(today, 'D'))
+    axis = np.arange(first, last + 1, dtype='datetime64[D]')
+    size = len(axis)
+
+    # Planned: each item's daily rate between its target dates, summed into a curve.
+    s = (start[planned_item] - first).astype(np.int64)
+    e = (end[planned_item] - first).astype(np.int64)
+    rate = scope[planned_item] / (e - s + 1)
+    diff = np.zeros((2, size + 1))
+    for row, per_day in enumerate((rate * weight[planned_item], rate)):
+        np.add.at(diff[row], s, per_day)
+        np.add.at(diff[row], e + 1, -per_day)
+    planned = np.cumsum(np.cumsum(diff[:, :size], axis=1), axis=1)
+
+    # Actual: entries added on their day, then summed.
+    daily = np.zeros((2, size))
+    day_index = (entry_day - first).astype(np.int64)
+    np.add.at(daily[0], day_index, done * weight[entry_item])
+    np.add.at(daily[1], day_index, done)
+    actual = np.cumsum(daily, axis=1)
+
+    ends = _bucket_ends(axis, bucket)
+    actual_last = max(int((np.datetime64(today, 'D') - first).astype(np.int64)),
+                      int(day_index[-1]) if len(day_index) else -1)
+    # A bucket that began by then shows its value on that day.
+    hidden = np.concatenate(([0], ends[:-1] + 1)) > actual_last
+    taken = np.minimum(ends, max(actual_last, 0))
+
+    result['dates'] = [str(day) for day in axis[ends]]
+    result['planned'] = _values(planned[0, ends])
+    result['actual'] = _values(actual[0, taken], hidden)
+    if quantities:
+        result['planned_qty'] = _values(planned[1, ends])
+        result['actual_qty'] = _values(actual[1, taken], hidden)
+    return result
+
+
+def project_s_curve(project_id, today, section_id=None, item_id=None, bucket='day'):
+    """S-curve payload of a project, section or item; ``None`` if nothing matches."""
+    item_rows, entry_rows = load_curve_rows(project_id, section_id, item_id)
+    if (section_id is not None or item_id is not None) and not item_rows:
+        return None
+    curve = build_s_curve(item_rows, entry_rows, today, bucket, quantities=item_id is not None)
+    if item_id is not None:
+        curve['uom'] = item_rows[0][1]
+        curve['scope'] = item_rows[0][2]
+    return curve
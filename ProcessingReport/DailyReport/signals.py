@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent after commit with ``project_ids`` whenever a project or any of its
+# sections, items or entries changed (see models.touch_projects).
+project_changed = Signal()
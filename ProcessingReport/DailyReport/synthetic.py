@@ -0,0 +1,120 @@
+"""Synthetic portfolios for local testing and the benchmark suite.
+
+Everything is written through the real models and their bulk paths, so the
+entry rollups and project versions come out exactly as in production.
+Synthetic rows are recognisable by the ``synth_`` usernames that own them.
+"""
+from datetime import timedelta
+import random
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .models import ProgressEntry, ProgressItem, ProjectAccess, Section
+
+
+USER_PREFIX = 'synth_'
+PASSWORD = 'synthetic'
+ENTRY_BATCH = 5000
+
+
+def clear_portfolio():
+    """Delete every synthetic user with their projects, sections, items and entries."""
+    return User.objects.filter(username__startswith=USER_PREFIX).delete()
+
+
+def synthetic_admin():
+    admin, created = User.objects.get_or_create(
+        username=f'{USER_PREFIX}admin',
+        defaults={'is_staff': True, 'is_superuser': True, 'email': 'admin@example.com'},
+    )
+    if created:
+        admin.set_password(PASSWORD)
+        admin.save(update_fields=['password'])
+    return admin
+
+
+def _plan_item(rng, section, admin, order, today, days):
+    item = ProgressItem(section=section, description=f'Activity {section.title}.{order + 1}',
+                        uom=rng.choice(['m', 'nos', 'kWp', 'set']), created_by=admin, order=order)
+    roll = rng.random()
+    if roll < 0.05:
+        return item  # no scope, no dates
+    item.scope = rng.choice([0, round(rng.uniform(10, 5000), 1)]) if roll < 0.1 else round(rng.uniform(10, 5000), 1)
+    item.targeted_start_date = today - timedelta(days=rng.randint(0, max(days, 1)))
+    item.targeted_end_date = item.targeted_start_date + timedelta(days=rng.randint(5, 120))
+    if roll < 0.15:
+        item.targeted_start_date = None
+    return item
+
+
+def _entries(rng, item, user, today, days):
+    start = max(item.targeted_start_date or today - timedelta(days=days), today - timedelta(days=days))
+    span = ((item.targeted_end_date or today) - start).days + 1
+    daily = (item.scope or 10) / max(span, 1)
+    day = start
+    while day <= today:
+        if rng.random() < 0.6:
+            yield ProgressEntry(item=item, user=user, date=day,
+                                progress_done=round(rng.uniform(0, daily * 1.6), 2))
+        day += timedelta(days=1)
+
+
+def generate_portfolio(projects, sections, items, days, seed=0, today=None, log=None):
+    """Create ``projects`` projects of ``sections`` x ``items`` activities with ``days`` of history.
+
+    Returns a dict of row counts.
+    """
+    rng = random.Random(seed)
+    today = today or timezone.now().date()
+    admin = synthetic_admin()
+    first = User.objects.filter(username__startswith=f'{USER_PREFIX}site').count()
+    counts = {'projects': 0, 'sections': 0, 'items': 0, 'entries': 0}
+
+    for number in range(first, first + projects):
+        user, _ = User.objects.get_or_create(username=f'{USER_PREFIX}site{number}')
+        user.set_password(PASSWORD)
+        user.save(update_fields=['password'])
+        project = ProjectAccess.objects.create(
+            user=user, project_name=f'Synthetic Project {number}', location=f'Site {number}',
+            type_of_project=rng.choice(ProjectAccess.PROJECT_TYPES)[0],
+        )
+
+        # Re-read the bulk-created rows: MySQL does not return their ids.
+        Section.objects.bulk_create([
+            Section(project=project, title=f'S{index + 1}', created_by=admin) for index in range(sections)
+        ])
+        project_sections = list(Section.objects.filter(project=project).order_by('id'))
+        ProgressItem.objects.bulk_create([
+            _plan_item(rng, section, admin, order, today, days)
+            for section in project_sections for order in range(items)
+        ], batch_size=1000)
+        project_items = list(ProgressItem.objects.filter(section__project=project).order_by('id'))
+
+        batch = []
+        for item in project_items:
+            batch.extend(_entries(rng, item, user, today, days))
+            if len(batch) >= ENTRY_BATCH:
+                ProgressEntry.objects.bulk_create(batch)
+                counts['entries'] += len(batch)
+                batch = []
+        if batch:
+            ProgressEntry.objects.bulk_create(batch)
+            counts['entries'] += len(batch)
+
+        # Actual start/finish dates as the progress form would have set them.
+        finished = []
+        for item in ProgressItem.objects.filter(section__project=project, entry_count__gt=0):
+            item.scope_assigned_date = item.targeted_start_date or today - timedelta(days=days)
+            if item.scope and item.cumulative_done >= item.scope:
+                item.scope_completed_date = item.last_entry_date
+            finished.append(item)
+        ProgressItem.objects.bulk_update(
+            finished, ['scope_assigned_date', 'scope_completed_date'], batch_size=1000)
+
+        counts['projects'] += 1
+        counts['sections'] += len(project_sections)
+        counts['items'] += len(project_items)
+        if log:
+            log(f"{project.project_name}: {len(project_items)} items")
+    return counts
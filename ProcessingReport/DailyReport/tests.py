@@ -1,3 +1,1063 @@
-from django.test import TestCase
+import json
+import math
+import os
+import re
+import tempfile
+import time
+import zipfile
+from concurrent.futures import Future
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F, QuerySet
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+
+from . import pool as pool_module
+from .benchmark import row_payload, run_scale
+from .dashboard_cache import block_key, cached_dashboard_data, dashboard_cache, fragment_key
+from .editor_payload import build_plan_payload, decode_plan_payload, dumps
+from .entry_import import import_entries
+from .metrics import (
+    MetricsFrame, build_dashboard_data, compute_metrics, custom_round, project_report, stored_status)
+from .models import ProgressEntry, ProgressItem, ProjectAccess, Section, SlowRequest
+from .pdf import prune_cache, project_pdf
+from .plan_ops import PlanOpError, VersionConflict, apply_plan_ops
+from .pool import shared_pool
+from .profiling import ProfilingMiddleware
+from .rollups import next_period, period_axis, period_start, project_rollup
+from .scurve import _bucket_ends, build_s_curve
+from .synthetic import USER_PREFIX
+from .views import save_progress_batch
+
+
+class PlanFixture(TestCase):
+    """One project with one section and one dated item (scope 100)."""
+
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.user = User.objects.create_user('engineer', password='x')
+        self.project = ProjectAccess.objects.create(
+            user=self.user, project_name='Solar Park', location='Pune', type_of_project='ground mount')
+        self.section = Section.objects.create(project=self.project, title='Civil', created_by=self.user)
+        self.item = self.add_item('Piling')
+
+    def add_item(self, description, scope=100, days=30):
+        return ProgressItem.objects.create(
+            section=self.section, description=description, uom='Nos', scope=scope, created_by=self.user,
+            targeted_start_date=self.today - timedelta(days=days), targeted_end_date=self.today + timedelta(days=days))
+
+    def entry(self, item, days_ago, done):
+        return ProgressEntry(item=item, user=self.user, date=self.today - timedelta(days=days_ago), progress_done=done)
+
+    def versions(self):
+        return ProjectAccess.objects.values_list('version', 'plan_version').get(pk=self.project.pk)
+
+
+# 🔢 Section views run the same queries whatever the item count
+
+class SectionViewQueryTests(PlanFixture):
+    def grow(self, count):
+        items = [self.add_item(f'Item {n}') for n in range(count)]
+        ProgressEntry.objects.bulk_create(
+            [self.entry(item, days_ago, 2) for item in items for days_ago in (0, 1, 3)])
+
+    def assertFlatQueries(self, url):
+        self.grow(2)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.grow(40)
+        with self.assertNumQueries(len(small)):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_admin_project_sections(self):
+        User.objects.create_superuser('admin', password='x')
+        self.client.login(username='admin', password='x')
+        self.assertFlatQueries(f"{reverse('admin_project_sections')}?project_id={self.project.pk}")
+
+    def test_user_project_sections(self):
+        self.client.login(username='engineer', password='x')
+        self.assertFlatQueries(reverse('user_project_sections'))
+
+
+# 📈 Entry rollups stay in step with bulk writes
+
+class EntryRollupTests(PlanFixture):
+    def assertRollups(self, item, cumulative, last, count):
+        item.refresh_from_db()
+        self.assertAlmostEqual(item.cumulative_done, cumulative)
+        self.assertEqual(item.last_entry_date, last)
+        self.assertEqual(item.entry_count, count)
+
+    def test_bulk_create(self):
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 2, 10), self.entry(self.item, 1, 5.5)])
+        self.assertRollups(self.item, 15.5, self.today - timedelta(days=1), 2)
+
+    def test_update(self):
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 2, 10), self.entry(self.item, 1, 5)])
+        ProgressEntry.objects.filter(item=self.item, date=self.today - timedelta(days=1)).update(progress_done=20)
+        self.assertRollups(self.item, 30, self.today - timedelta(days=1), 2)
+
+    def test_update_moves_entries_between_items(self):
+        other = self.add_item('Trenching')
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 2, 10), self.entry(self.item, 1, 5)])
+        ProgressEntry.objects.filter(item=self.item, progress_done=5).update(item=other)
+        self.assertRollups(self.item, 10, self.today - timedelta(days=2), 1)
+        self.assertRollups(other, 5, self.today - timedelta(days=1), 1)
+
+    def test_delete(self):
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 2, 10), self.entry(self.item, 1, 5)])
+        ProgressEntry.objects.filter(item=self.item, progress_done=5).delete()
+        self.assertRollups(self.item, 10, self.today - timedelta(days=2), 1)
+        ProgressEntry.objects.filter(item=self.item).delete()
+        self.assertRollups(self.item, 0, None, 0)
+
+    def test_entry_writes_refresh_stored_status_but_not_plan_version(self):
+        version, plan_version = self.versions()
+        ProgressItem.objects.filter(pk=self.item.pk).update(targeted_end_date=self.today - timedelta(days=3))
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.status, self.item.delay_days), (ProgressItem.STATUS_DELAY, 3))
+        self.assertEqual(self.versions()[1], plan_version + 1)
+
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 4, 100)])
+        self.item.scope_completed_date = self.today - timedelta(days=4)
+        self.item.save(update_fields=['scope_completed_date'])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, ProgressItem.STATUS_ONTIME)
+        self.assertEqual(self.item.status_date, self.today)
+        self.assertEqual(self.versions()[1], plan_version + 1)
+        self.assertGreater(self.versions()[0], version + 1)
+
+
+# 🧮 The metrics frame gives the figures of the old per-item loops
+
+def legacy_status(item, total_done, today):
+    # ProgressItem.get_status as it was before the stored status column.
+    if not item.targeted_end_date:
+        return 'Missing Dates'
+    if item.scope and total_done >= item.scope and item.scope_completed_date:
+        return 'Ontime' if item.scope_completed_date <= item.targeted_end_date else 'Delay'
+    return 'Ontime' if today <= item.targeted_end_date else 'Delay'
+
+
+def legacy_report(project, today):
+    """The admin dashboard's per-item loop, with expected today rounded up."""
+    report = {'activities_today': [], 'delay_activities': [], 'ontime_activities': [], 'missing_activities': []}
+    total_scope = total_completed = 0
+    ontime_percentages, delay_percentages = [], []
+    target_end_dates, completed_dates = [], []
+
+    for item in ProgressItem.objects.filter(section__project=project).order_by('pk'):
+        entries = list(item.entries.all())
+        total_progress = sum(entry.progress_done for entry in entries)
+        today_progress = sum(entry.progress_done for entry in entries if entry.date == today)
+        status = legacy_status(item, total_progress, today)
+
+        if today_progress > 0:
+            done_so_far = total_progress - today_progress
+            expected_today = 'N/A'
+            if item.scope and item.targeted_end_date:
+                remaining_scope = item.scope - done_so_far
+                remaining_days = (item.targeted_end_date - today).days + 1
+                expected_today = math.ceil(remaining_scope / remaining_days) if remaining_days > 0 else remaining_scope
+            report['activities_today'].append({
+                'description': item.description,
+                'total_progress': total_progress,
+                'balance': max(item.scope - total_progress, 0) if item.scope else 'N/A',
+                'expected_today': expected_today,
+                'status': status,
+                'today_progress': today_progress,
+            })
+
+        percentage = round((total_progress / item.scope) * 100, 2) if item.scope else 0
+        activity = {
+            'description': item.description,
+            'total_progress': total_progress,
+            'balance': max(item.scope - total_progress, 0) if item.scope else 0,
+            'percentage': percentage,
+        }
+        if item.scope:
+            total_scope += item.scope
+            total_completed += total_progress
+        if status == 'Missing Dates':
+            report['missing_activities'].append(activity)
+        elif status == 'Ontime':
+            ontime_percentages.append(percentage)
+            report['ontime_activities'].append(activity)
+        else:
+            activity['delay_days'] = max(((item.scope_completed_date or today) - item.targeted_end_date).days, 0)
+            delay_percentages.append(percentage)
+            report['delay_activities'].append(activity)
+        if item.targeted_end_date:
+            target_end_dates.append(item.targeted_end_date)
+        if item.scope_completed_date:
+            completed_dates.append(item.scope_completed_date)
+
+    counted = ontime_percentages + delay_percentages
+    if total_scope > 0 and total_completed >= total_scope and completed_dates and target_end_dates:
+        project_delay_days = max((max(completed_dates) - max(target_end_dates)).days, 0)
+    else:
+        project_delay_days = sum(activity['delay_days'] for activity in report['delay_activities'])
+    report.update({
+        'count_today': len(report['activities_today']),
+        'count_delay': len(delay_percentages),
+        'count_ontime': len(ontime_percentages),
+        'count_missing': len(report['missing_activities']),
+        'avg_ontime_percent': round(sum(ontime_percentages) / len(ontime_percentages)) if ontime_percentages else 0,
+        'avg_delay_percent': round(sum(delay_percentages) / len(delay_percentages)) if delay_percentages else 0,
+        'project_delay_days': project_delay_days,
+        'overall_completion_percent': custom_round(sum(counted) / len(counted)) if counted else 0,
+    })
+    return report
+
+
+class MetricsParityTests(PlanFixture):
+    SUMMARY = ('count_today', 'count_delay', 'count_ontime', 'count_missing', 'avg_ontime_percent',
+               'avg_delay_percent', 'project_delay_days', 'overall_completion_percent')
+
+    def setUp(self):
+        super().setUp()
+        day = lambda offset: self.today + timedelta(days=offset)
+        trenching = self.add_item('Trenching', scope=50)
+        fencing = self.add_item('Fencing', scope=10)
+        survey = self.add_item('Survey', scope=10)
+        earthing = self.add_item('Earthing', scope=30)
+        signage = self.add_item('Signage', scope=0)
+        cabling = ProgressItem.objects.create(
+            section=self.section, description='Cabling', uom='m', scope=400, created_by=self.user)
+        ProgressEntry.objects.bulk_create([
+            self.entry(self.item, 3, 20), self.entry(self.item, 0, 7),
+            self.entry(trenching, 10, 10), self.entry(trenching, 0, 5),
+            self.entry(fencing, 3, 10),
+            self.entry(survey, 8, 10),
+            self.entry(earthing, 1, 12), self.entry(earthing, 0, 1),
+            self.entry(cabling, 2, 40),
+        ])
+        # Late, finished late, finished early, due soon.
+        ProgressItem.objects.filter(pk=trenching.pk).update(targeted_end_date=day(-5))
+        ProgressItem.objects.filter(pk=fencing.pk).update(targeted_end_date=day(-5), scope_completed_date=day(-3))
+        ProgressItem.objects.filter(pk=survey.pk).update(targeted_end_date=day(-5), scope_completed_date=day(-8))
+        ProgressItem.objects.filter(pk=earthing.pk).update(targeted_end_date=day(2))
+        ProgressItem.objects.filter(pk=signage.pk).update(targeted_end_date=day(-1))
+
+    def assertMatchesLegacy(self, report):
+        legacy = legacy_report(self.project, self.today)
+        for name in self.SUMMARY:
+            self.assertEqual(report[name], legacy[name], name)
+        for table in ('activities_today', 'delay_activities', 'ontime_activities', 'missing_activities'):
+            rows = [{key: row[key] for key in expected} for row, expected in zip(report[table], legacy[table])]
+            for row in rows:
+                # A forecast delay is still on time by the old rules.
+                if row.get('status') == 'Forecast Delay':
+                    row['status'] = 'Ontime'
+            self.assertEqual(rows, legacy[table], table)
+            self.assertEqual(len(report[table]), len(legacy[table]), table)
+
+    def test_project_report(self):
+        report = project_report(self.project, self.today)
+        self.assertEqual([report[name] for name in self.SUMMARY[:4]], [3, 3, 3, 1])
+        self.assertMatchesLegacy(report)
+
+    def test_dashboard(self):
+        [card] = build_dashboard_data(self.today)
+        self.assertEqual(card['project_id'], self.project.pk)
+        self.assertMatchesLegacy(card)
+
+    def test_expected_today_is_rounded_up(self):
+        # 80 left over 31 days: the dashboard used to show 2.58.
+        [piling] = [row for row in project_report(self.project, self.today)['activities_today']
+                    if row['description'] == 'Piling']
+        self.assertEqual(piling['expected_today'], 3)
+
+
+# 🗂️ The plan editor form is saved as one diff
+
+class PlanSaveTests(PlanFixture):
+    def setUp(self):
+        super().setUp()
+        User.objects.create_superuser('admin', password='x')
+        self.client.login(username='admin', password='x')
+        self.url = reverse('admin_project_sections')
+
+    def post_plan(self, sections):
+        """POST the editor form; ``sections`` is [(id, title, [(id, description, scope, end), ...]), ...]."""
+        data = {'project_id': self.project.pk, 'total_sections': len(sections)}
+        for idx, (section_id, title, rows) in enumerate(sections):
+            data[f'section_id_{idx}'] = section_id or ''
+            data[f'section_title_{idx}'] = title
+            for key, values in (('item_id', [row[0] or '' for row in rows]),
+                                ('description', [row[1] for row in rows]),
+                                ('uom', ['Nos' for row in rows]),
+                                ('scope', [row[2] for row in rows]),
+                                ('targeted_start_date', ['' for row in rows]),
+                                ('targeted_end_date', [row[3] for row in rows])):
+                data[f'{key}_{idx}[]'] = values
+        return self.client.post(self.url, data)
+
+    def test_diff_is_applied(self):
+        fencing = self.add_item('Fencing')
+        old = Section.objects.create(project=self.project, title='Old', created_by=self.user)
+        ProgressItem.objects.create(section=old, description='Gone', uom='Nos', scope=1, created_by=self.user)
+
+        response = self.post_plan([
+            (self.section.pk, 'Civil works', [(self.item.pk, 'Piling', '120', '31-12-2030'), ('', 'Trenching', '50', '')]),
+            ('', 'Electrical', [('', 'Cabling', '', '')]),
+        ])
+        self.assertEqual(response.status_code, 302)
+
+        plan = {section.title: [(item.description, item.scope, item.targeted_end_date, item.order)
+                                for item in section.items.order_by('order')]
+                for section in Section.objects.filter(project=self.project)}
+        self.assertEqual(plan, {
+            'Civil works': [('Piling', 120, date(2030, 12, 31), 0), ('Trenching', 50, None, 1)],
+            'Electrical': [('Cabling', None, None, 0)],
+        })
+        self.assertFalse(ProgressItem.objects.filter(pk=fencing.pk).exists())
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.section_id, self.section.pk)
+
+    def test_query_count_does_not_grow_with_the_plan(self):
+        def plan(count):
+            return [(self.section.pk, 'Civil', [('', f'Item {n}', str(n + 1), '') for n in range(count)])]
+
+        small = int(self.post_plan(plan(3))['X-Query-Count'])
+        large = int(self.post_plan(plan(60))['X-Query-Count'])
+        self.assertEqual(ProgressItem.objects.filter(section=self.section).count(), 60)
+        # Each post inserts the new items and deletes the previous ones in bulk.
+        self.assertEqual(large, small)
+
+    def test_unknown_item_rolls_back(self):
+        response = self.post_plan([(self.section.pk, 'Renamed', [(987654, 'Ghost', '1', '')])])
+        self.assertEqual(response.status_code, 404)
+        self.section.refresh_from_db()
+        self.assertEqual(self.section.title, 'Civil')
+        self.assertTrue(ProgressItem.objects.filter(pk=self.item.pk).exists())
+
+
+# 📝 Progress for all items is saved in one batch
+
+class ProgressBatchTests(PlanFixture):
+    def save(self, *values):
+        request = RequestFactory().post('/user/sections/', {f'progress_{item.pk}': value for item, value in values})
+        request.user = self.user
+        return save_progress_batch(request, self.project, self.today)
+
+    def today_entries(self):
+        return dict(ProgressEntry.objects.filter(date=self.today).values_list('item__description', 'progress_done'))
+
+    def test_entries_are_upserted_and_dates_follow(self):
+        trenching = self.add_item('Trenching', scope=10)
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 2, 20)])
+
+        self.assertEqual(self.save((self.item, '30'), (trenching, '10')), [])
+        self.assertEqual(self.today_entries(), {'Piling': 30, 'Trenching': 10})
+        trenching.refresh_from_db()
+        self.assertEqual((trenching.scope_assigned_date, trenching.scope_completed_date), (self.today, self.today))
+
+        # Posting again replaces today's value instead of adding a row.
+        self.assertEqual(self.save((self.item, '40'), (trenching, '4')), [])
+        self.assertEqual(self.today_entries(), {'Piling': 40, 'Trenching': 4})
+        self.item.refresh_from_db()
+        trenching.refresh_from_db()
+        self.assertEqual((self.item.cumulative_done, self.item.entry_count), (60, 2))
+        self.assertIsNone(trenching.scope_completed_date)
+
+    def test_invalid_values_are_reported_and_skipped(self):
+        undated = ProgressItem.objects.create(
+            section=self.section, description='Undated', uom='Nos', scope=5, created_by=self.user)
+        negative = self.add_item('Negative')
+        text = self.add_item('Text')
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 2, 90)])
+
+        errors = self.save((self.item, '15'), (undated, '1'), (negative, '-1'), (text, 'abc'))
+        self.assertEqual(errors, [
+            "Cannot enter progress for 'Undated' due to missing dates.",
+            "Negative value not allowed for 'Negative'.",
+            "Invalid input for 'Text'.",
+            "Progress for 'Piling' exceeds scope. Max allowed today: 10.0",
+        ])
+        self.assertEqual(self.today_entries(), {})
+
+    def test_post_saves_through_the_view(self):
+        self.client.login(username='engineer', password='x')
+        response = self.client.post(reverse('user_project_sections'), {f'progress_{self.item.pk}': '12.5'})
+        self.assertRedirects(response, reverse('user_project_sections'), fetch_redirect_response=False)
+        self.assertEqual(self.today_entries(), {'Piling': 12.5})
+
+
+# 🗄️ Exported PDFs are cached by fingerprint and pruned least recently used first
+
+class PdfCacheTests(PlanFixture):
+    def setUp(self):
+        super().setUp()
+        self.cache = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(PDF_CACHE_DIR=self.cache))
+
+    def test_hit_and_new_fingerprint(self):
+        path, hit = project_pdf(self.project, self.today)
+        self.assertFalse(hit)
+        self.assertTrue(path.read_bytes().startswith(b'%PDF'))
+        self.assertEqual(project_pdf(self.project, self.today), (path, True))
+
+        # Progress changes the report, so the next export is a new file and replaces the old one.
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 0, 5)])
+        new_path, hit = project_pdf(self.project, self.today)
+        self.assertFalse(hit)
+        self.assertNotEqual(new_path, path)
+        self.assertEqual(list(self.cache.glob('*.pdf')), [new_path])
+
+    def test_prune_least_recently_used(self):
+        now = time.time()
+        files = []
+        for age in (40, 30, 20, 10):
+            path = self.cache / f'project-{age}.pdf'
+            path.write_bytes(b'x' * 100)
+            os.utime(path, (now - age, now - age))
+            files.append(path)
+        oldest, older, newer, newest = files
+
+        self.assertEqual(prune_cache(max_bytes=250, keep=oldest), (2, 200))
+        self.assertEqual(sorted(self.cache.glob('*.pdf')), sorted([oldest, newest]))
+
+        self.assertEqual(prune_cache(max_bytes=10 ** 6, max_age=25), (1, 100))
+        self.assertEqual(list(self.cache.glob('*.pdf')), [newest])
+
+
+# 📦 The ZIP export renders on the server's shared pool
+
+class InlinePool:
+    """Stands in for the process pool: runs each task at once, in this thread and transaction."""
+
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def shutdown(self, **kwargs):
+        self.shut_down = True
+
+
+class ZipExportPoolTests(PlanFixture):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(PDF_CACHE_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+
+    def test_shared_pool_is_reused(self):
+        self.addCleanup(setattr, pool_module, '_shared', None)
+        with override_settings(PDF_EXPORT_PROCESSES=3):
+            pool = shared_pool()
+            self.addCleanup(pool.shutdown)
+            self.assertIs(shared_pool(), pool)
+            self.assertEqual(pool._max_workers, 3)
+
+    def test_export_keeps_the_pool_and_the_connection(self):
+        User.objects.create_user('manager', password='x', is_staff=True)
+        self.client.login(username='manager', password='x')
+        pool = InlinePool()
+        with mock.patch('DailyReport.views.shared_pool', return_value=pool):
+            response = self.client.get(reverse('export_projects_zip'))
+            archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+
+        self.assertEqual(archive.namelist(), [f'Project_{self.project.pk}_Solar_Park_{self.today}.pdf'])
+        self.assertFalse(pool.shut_down)
+        # The request's own connection is still usable afterwards.
+        self.assertEqual(ProjectAccess.objects.count(), 1)
+
+
+# 🏷️ The PDF export answers conditional GETs, only for users who may see the project
+
+class PdfConditionalTests(PlanFixture):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(PDF_CACHE_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        self.url = reverse('export_project_pdf', args=[self.project.pk])
+
+    def test_not_modified_until_an_entry_is_written(self):
+        self.client.login(username='engineer', password='x')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 0, 5)])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_no_etag_for_other_users(self):
+        User.objects.create_user('outsider', password='x')
+        self.client.login(username='outsider', password='x')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('ETag', response)
+        self.assertEqual(self.client.get(reverse('export_project_pdf', args=[987654])).status_code, 404)
+
+
+# 🧊 Cached dashboard cards are dropped when their project changes
+
+class DashboardCacheTests(PlanFixture):
+    def setUp(self):
+        super().setUp()
+        self.cache = dashboard_cache()
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+        User.objects.create_user('manager', password='x', is_staff=True)
+        self.client.login(username='manager', password='x')
+
+    def cache_header(self):
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response['X-Dashboard-Cache']
+
+    def cached(self):
+        return [self.cache.get(key) is not None
+                for key in (block_key(self.project.pk, self.today), fragment_key(self.project.pk, self.today))]
+
+    def test_writes_invalidate_the_card(self):
+        self.assertEqual(self.cache_header(), 'hits=0; misses=1')
+        self.assertEqual(self.cached(), [True, True])
+        self.assertEqual(self.cache_header(), 'hits=1; misses=0')
+
+        def add_entry():
+            ProgressEntry.objects.bulk_create([self.entry(self.item, 0, 5)])
+
+        def edit_plan():
+            self.item.scope = 120
+            self.item.save()
+
+        for write in (add_entry, edit_plan):
+            with self.subTest(write=write.__name__):
+                with self.captureOnCommitCallbacks(execute=True):
+                    write()
+                self.assertEqual(self.cached(), [False, False])
+                self.assertEqual(self.cache_header(), 'hits=0; misses=1')
+
+    def test_rebuilt_block_drops_the_fragment(self):
+        self.cache_header()
+        # A version bump whose signal never arrived: the block is stale but still cached.
+        QuerySet.update(ProjectAccess.objects.filter(pk=self.project.pk), version=F('version') + 1)
+        self.assertEqual(self.cached(), [True, True])
+
+        _, hits, misses = cached_dashboard_data(self.today, ProjectAccess.objects.all())
+        self.assertEqual((hits, misses), (0, 1))
+        self.assertEqual(self.cached(), [True, False])
+
+
+# 🧪 Synthetic portfolios and the view benchmarks
+
+class SyntheticPortfolioTests(TestCase):
+    def test_generate_portfolio_command(self):
+        output = StringIO()
+        call_command('generate_portfolio', projects=2, sections=3, items=4, days=10, seed=1, stdout=output)
+
+        projects = ProjectAccess.objects.filter(user__username__startswith=USER_PREFIX)
+        items = ProgressItem.objects.filter(section__project__in=projects)
+        entries = ProgressEntry.objects.filter(item__in=items).count()
+        self.assertEqual(
+            (projects.count(), Section.objects.filter(project__in=projects).count(), items.count()), (2, 6, 24))
+        self.assertIn(f"Created 2 projects, 6 sections, 24 items and {entries} entries.", output.getvalue())
+        self.assertGreater(entries, 0)
+        # Rollups come out as the entry writes left them.
+        self.assertEqual(sum(items.values_list('entry_count', flat=True)), entries)
+
+    def test_benchmark_report(self):
+        scale = {'projects': 1, 'sections': 2, 'items': 3, 'days': 5}
+        entry = run_scale(scale, 1, ['admin_dashboard', 'user_project_sections_get'], seed=2)
+
+        self.assertEqual(set(entry), {'projects', 'sections', 'items', 'days', 'rows', 'scenarios', 'editor_payload'})
+        self.assertEqual({name: entry['rows'][name] for name in ('projects', 'sections', 'items')},
+                         {'projects': 1, 'sections': 2, 'items': 6})
+        results = entry['scenarios']
+        self.assertEqual(set(results), {'admin_dashboard', 'user_project_sections_get'})
+        for figures in results.values():
+            self.assertEqual(set(figures), {
+                'status', 'wall_ms', 'first_card_ms', 'response_kb', 'queries', 'peak_kb'})
+            self.assertEqual(set(figures['wall_ms']), {'min', 'median', 'max'})
+            self.assertEqual(figures['status'], [200])
+            self.assertGreater(figures['queries'], 0)
+        self.assertIsNotNone(results['admin_dashboard']['first_card_ms'])
+        payloads = entry['editor_payload']
+        self.assertEqual(set(payloads), {'rows_json', 'rows_orjson', 'columnar_json', 'columnar_orjson'})
+        self.assertLess(payloads['columnar_json']['kb'], payloads['rows_json']['kb'])
+
+
+# ⏱️ Every request is profiled, streamed bodies included
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SLOW_MS=0)
+class ProfilingMiddlewareTests(PlanFixture):
+    def setUp(self):
+        super().setUp()
+        self.manager = User.objects.create_user('manager', password='x', is_staff=True)
+
+    def header_queries(self, response):
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+        return int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', timing).group(1))
+
+    def test_header_and_slow_request_log(self):
+        self.client.login(username='engineer', password='x')
+        with self.assertLogs('DailyReport.profiling', 'WARNING'):
+            response = self.client.get(reverse('user_project_sections'))
+        queries = self.header_queries(response)
+        self.assertNotIn('streamed', response['Server-Timing'])
+
+        row = SlowRequest.objects.get()
+        self.assertEqual((row.view_name, row.status_code, row.user, row.query_count),
+                         ('user_project_sections', 200, self.user, queries))
+        self.assertGreater(queries, 0)
+
+    def test_streamed_body_is_measured_when_sent(self):
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 1, 5)])
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('export_progress_entries'))
+        self.assertIn('body;desc="streamed"', response['Server-Timing'])
+        queries = self.header_queries(response)
+        self.assertFalse(SlowRequest.objects.exists())
+
+        with self.assertLogs('DailyReport.profiling', 'WARNING'):
+            self.assertIn(b'Piling', b''.join(response.streaming_content))
+        row = SlowRequest.objects.get()
+        self.assertEqual(row.view_name, 'export_progress_entries')
+        # The entries are read while the body is produced.
+        self.assertGreater(row.query_count, queries)
+
+    async def stream_items(self, request):
+        count_items = sync_to_async(ProgressItem.objects.count)
+
+        async def body():
+            yield b'items: '
+            yield str(await count_items()).encode()
+
+        await count_items()
+        return StreamingHttpResponse(body())
+
+    def test_async_stream(self):
+        # Built outside the event loop, as Django does at startup.
+        middleware = ProfilingMiddleware(self.stream_items)
+        self.assertTrue(iscoroutinefunction(middleware))
+        async_to_sync(self.check_async_stream)(middleware)
+
+    async def check_async_stream(self, middleware):
+        response = await middleware(RequestFactory().get('/stream/'))
+        self.assertIn('body;desc="streamed"', response['Server-Timing'])
+        self.assertEqual(self.header_queries(response), 1)
+
+        with self.assertLogs('DailyReport.profiling', 'WARNING'):
+            self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'items: 1')
+        row = await SlowRequest.objects.aget()
+        self.assertEqual((row.path, row.query_count), ('/stream/', 2))
+
+
+# 📈 S-curve buckets
+
+class SCurveTests(PlanFixture):
+    def axis(self, first, last):
+        return np.arange(np.datetime64(first), np.datetime64(last) + 1, dtype='datetime64[D]')
+
+    def test_bucket_ends(self):
+        # Monday 29 January to Sunday 11 February 2024: two whole weeks across a month end.
+        axis = self.axis('2024-01-29', '2024-02-11')
+        self.assertEqual(_bucket_ends(axis, 'week').tolist(), [6, 13])
+        self.assertEqual(_bucket_ends(axis, 'month').tolist(), [2, 13])
+        self.assertEqual(_bucket_ends(axis, 'day').tolist(), list(range(14)))
+        # Partial weeks at both ends still close on Sunday and on the last day.
+        self.assertEqual(_bucket_ends(self.axis('2024-01-31', '2024-02-06'), 'week').tolist(), [4, 6])
+
+    def test_weekly_curve(self):
+        items = [(1, 'm', 100, date(2024, 1, 29), date(2024, 2, 7))]
+        entries = [(1, date(2024, 1, 30), 20), (1, date(2024, 2, 5), 30)]
+        curve = build_s_curve(items, entries, date(2024, 2, 6), 'week', quantities=True)
+        self.assertEqual(curve['dates'], ['2024-02-04', '2024-02-07'])
+        self.assertEqual(curve['planned_qty'], [70, 100])
+        # The open week shows its value as of today.
+        self.assertEqual(curve['actual_qty'], [20, 50])
+        self.assertEqual(curve['planned'], [70, 100])
+
+    def test_monthly_curve_hides_future_buckets(self):
+        items = [(1, 'm', 100, date(2024, 1, 29), date(2024, 2, 7)), (2, 'm', 50, None, None)]
+        entries = [(1, date(2024, 1, 30), 20), (2, date(2024, 1, 30), 25)]
+        curve = build_s_curve(items, entries, date(2024, 1, 31), 'month')
+        self.assertEqual(curve['dates'], ['2024-01-31', '2024-02-07'])
+        # Two weighted items: each counts for half, and the undated one plans nothing.
+        self.assertEqual(curve['planned'], [15, 50])
+        self.assertEqual(curve['actual'], [35, None])
+        self.assertEqual((curve['weighted_items'], curve['missing_dates']), (2, 1))
+
+    def test_access_is_checked_before_the_etag(self):
+        User.objects.create_user('outsider', password='x')
+        self.client.login(username='outsider', password='x')
+        response = self.client.get(reverse('project_s_curve', args=[self.project.pk]), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('ETag', response)
+
+
+# 🔮 Completion forecasts from the recent run rate
+
+@override_settings(FORECAST_WINDOW_DAYS=14)
+class ForecastTests(TestCase):
+    today = date(2024, 3, 1)
+
+    def frame(self, *items):
+        rows = [{
+            'id': pk, 'section__project_id': 1, 'description': f'Item {pk}', 'uom': 'm',
+            'scope': scope, 'targeted_start_date': date(2024, 1, 1), 'targeted_end_date': date(2024, 3, 20),
+            'scope_assigned_date': started, 'scope_completed_date': None,
+            'total_done': total, 'today_progress': None, 'recent_done': recent,
+        } for pk, (scope, total, recent, started) in enumerate(items, 1)]
+        return MetricsFrame(rows, self.today)
+
+    def forecast(self, item):
+        return item['forecast_end_date'], item['slip_days'], item['status']
+
+    def test_projection(self):
+        frame = self.frame(
+            (100, 40, 28, date(2024, 1, 10)),   # 2 a day over the whole window: 30 more days
+            (100, 20, 20, date(2024, 2, 27)),   # started 4 days ago: 5 a day, 16 more days
+            (100, 100, 28, date(2024, 1, 10)),  # finished
+        )
+        self.assertEqual(self.forecast(frame.item(1)), (date(2024, 3, 31), 11, 'Forecast Delay'))
+        self.assertEqual(self.forecast(frame.item(2)), (date(2024, 3, 17), 0, 'Ontime'))
+        self.assertEqual(self.forecast(frame.item(3)), (None, 0, 'Ontime'))
+        summary = frame.project_summary(1)
+        self.assertEqual((summary['count_forecast_delay'], summary['forecast_slip_days']), (1, 11))
+        # A forecast delay still counts as on time.
+        self.assertEqual(summary['count_ontime'], 3)
+
+    def test_no_recent_progress(self):
+        frame = self.frame((100, 40, None, date(2024, 1, 10)), (100, 40, 0, date(2024, 1, 10)))
+        for pk in (1, 2):
+            self.assertEqual(self.forecast(frame.item(pk)), (None, 0, 'Ontime'))
+        self.assertEqual(frame.project_summary(1)['forecast_slip_days'], 0)
+
+    def test_forecast_is_clamped_to_date_max(self):
+        frame = self.frame((1e12, 0, 1e-6, date(2024, 1, 10)))
+        end, slip, status = self.forecast(frame.item(1))
+        self.assertEqual(end, date.max)
+        self.assertEqual(slip, (date.max - date(2024, 3, 20)).days)
+        self.assertEqual(status, 'Forecast Delay')
+
+
+# 📥 Historical entries are imported from CSV or XLSX
+
+class EntryImportTests(PlanFixture):
+    def run_import(self, lines, dry_run=False):
+        text = 'Project ID,Item ID,Date,Progress Done\n' + ''.join(f'{line}\n' for line in lines)
+        return import_entries(BytesIO(text.encode()), 'entries.csv', self.user, dry_run=dry_run, today=self.today)
+
+    def row(self, days_ago, done, item=None, project=None):
+        day = self.today - timedelta(days=days_ago)
+        return f"{project or self.project.id},{item or self.item.id},{day.isoformat()},{done}"
+
+    def test_valid_rows_are_imported(self):
+        summary = self.run_import([self.row(3, 10), self.row(2, 15)])
+        self.assertEqual((summary['created'], summary['errors']), (2, []))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.cumulative_done, 25)
+        self.assertEqual(self.item.scope_assigned_date, self.today - timedelta(days=3))
+
+    def test_dry_run_writes_nothing(self):
+        summary = self.run_import([self.row(3, 10)], dry_run=True)
+        self.assertEqual(summary['created'], 1)
+        self.assertFalse(ProgressEntry.objects.exists())
+
+    def test_future_dates_are_rejected(self):
+        summary = self.run_import([self.row(-1, 10), self.row(1, 10)])
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual([line for line, _ in summary['errors']], [2])
+        self.assertIn('in the future', summary['errors'][0][1])
+
+    def test_rows_over_scope_are_rejected_per_item(self):
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 10, 50)])
+        other = self.add_item('Trenching', scope=20)
+        summary = self.run_import([self.row(3, 30), self.row(2, 30), self.row(2, 20, item=other.id)])
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual([line for line, _ in summary['errors']], [2])
+        self.assertIn('above its scope of 100', summary['errors'][0][1])
+        self.assertEqual(ProgressEntry.objects.filter(item=self.item).count(), 1)
+        # Replacing an existing value counts only the difference.
+        summary = self.run_import([self.row(10, 100)])
+        self.assertEqual((summary['updated'], summary['errors']), (1, []))
+
+    def test_unreadable_ids_are_row_errors(self):
+        summary = self.run_import([self.row(1, 5, project='inf'), self.row(1, 5, item='1e999'),
+                                   self.row(1, 5, item='nan'), self.row(1, 5, item=self.item.id + 1000)])
+        self.assertEqual([line for line, _ in summary['errors']], [2, 3, 4, 5])
+        self.assertFalse(ProgressEntry.objects.exists())
+
+    def dates(self, item):
+        item.refresh_from_db()
+        return item.scope_assigned_date, item.scope_completed_date
+
+    def assertReconciled(self, item):
+        """The reconcile command finds nothing left to change after an import."""
+        dates = self.dates(item)
+        for reset in ([], ['--reset']):
+            call_command('reconcile_item_dates', *reset, stdout=StringIO())
+            self.assertEqual(self.dates(item), dates)
+
+    def test_completion_date_follows_the_scope(self):
+        self.run_import([self.row(3, 60), self.row(2, 40)])
+        self.assertEqual(self.dates(self.item), (self.today - timedelta(days=3), self.today - timedelta(days=2)))
+        self.assertReconciled(self.item)
+        # Lowering an entry leaves the item short of its scope again.
+        self.run_import([self.row(2, 10)])
+        self.assertEqual(self.dates(self.item), (self.today - timedelta(days=3), None))
+        self.assertReconciled(self.item)
+
+    def test_scope_zero_never_completes(self):
+        item = self.add_item('Fencing', scope=0)
+        summary = self.run_import([self.row(2, 0, item=item.id)])
+        self.assertEqual((summary['created'], summary['errors']), (1, []))
+        self.assertEqual(self.dates(item), (None, None))
+        self.assertReconciled(item)
+
+
+# 🚦 The stored/vectorized status follows the original get_status rules
+
+class DateStatusTests(PlanFixture):
+    def test_matches_get_status(self):
+        today = self.today
+        before, after = today - timedelta(days=5), today + timedelta(days=5)
+        cases = [
+            # scope, done, target end, completion date
+            (100, 0, None, None),
+            (100, 40, after, None),
+            (100, 40, before, None),
+            (100, 100, after, None),
+            (100, 100, before, None),
+            (100, 100, before, before - timedelta(days=2)),
+            (100, 100, before, before + timedelta(days=2)),
+            (100, 60, before, before - timedelta(days=2)),
+            (0, 0, after, None),
+            (0, 0, before, None),
+            (None, 0, before, None),
+        ]
+        items = [ProgressItem(scope=scope, cumulative_done=done, targeted_end_date=end,
+                              scope_completed_date=completed) for scope, done, end, completed in cases]
+        stored = stored_status(cases, today)
+        for case, item, (status, delay_days) in zip(cases, items, stored):
+            with self.subTest(case=case):
+                self.assertEqual(status, item.get_status())
+                if status == ProgressItem.STATUS_DELAY:
+                    # The dashboard's rule: a recorded completion date ends the delay.
+                    self.assertEqual(delay_days, max(((case[3] or today) - case[2]).days, 0))
+                else:
+                    self.assertEqual(delay_days, 0)
+
+    def test_nightly_refresh(self):
+        later = self.today + timedelta(days=35)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.status, self.item.delay_days), (ProgressItem.STATUS_ONTIME, 0))
+        out = StringIO()
+        call_command('refresh_item_status', f'--date={later.isoformat()}', '--batch-size=1', stdout=out)
+        self.assertIn('1 row(s) written', out.getvalue())
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.status, self.item.delay_days, self.item.status_date),
+                         (ProgressItem.STATUS_DELAY, 5, later))
+        # Nothing moved since: nothing is rewritten.
+        call_command('refresh_item_status', f'--date={later.isoformat()}', stdout=out)
+        self.assertIn('0 row(s) written', out.getvalue())
+
+
+# 🗜️ The plan editor payload decodes back to the rows it replaced
+
+class EditorPayloadTests(PlanFixture):
+    def test_round_trip(self):
+        self.add_item('Fencing </script>', scope=None)
+        late = self.add_item('Trenching', scope=20, days=10)
+        ProgressItem.objects.filter(pk=late.pk).update(targeted_end_date=self.today - timedelta(days=2))
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 3, 40), self.entry(late, 0, 20)])
+        Section.objects.create(project=self.project, title='Empty', created_by=self.user)
+
+        sections = list(Section.objects.filter(project=self.project).prefetch_related('items').order_by('id'))
+        metrics = compute_metrics([self.project.id], self.today)
+        expected = row_payload(sections, metrics)
+        for section in expected:
+            for row in section['items']:
+                del row['order']
+                row['scope'] = '' if row['scope'] is None else row['scope']
+        payload = build_plan_payload(sections, metrics)
+        for serializer in ('json', 'orjson'):
+            with self.subTest(serializer=serializer), override_settings(JSON_SERIALIZER=serializer):
+                text = dumps(payload)
+                self.assertNotIn('</script>', text)
+                self.assertEqual(decode_plan_payload(json.loads(text)), expected)
+        self.assertEqual(decode_plan_payload(None), [])
+
+
+# ✏️ Row-level plan edits
+
+class PlanOpsTests(PlanFixture):
+    def apply(self, ops, version=None):
+        if version is None:
+            version = self.versions()[1]
+        return apply_plan_ops(self.project, self.user, version, ops)
+
+    def test_create_update_move_and_delete(self):
+        version, created = self.apply([
+            {'op': 'create', 'type': 'section', 'ref': 's1', 'title': 'Electrical'},
+            {'op': 'create', 'type': 'item', 'ref': 'i1', 'section': 's1', 'order': 0,
+             'values': {'description': 'Cabling', 'uom': 'm', 'scope': '250',
+                        'targeted_start_date': '01-01-2026', 'targeted_end_date': '31-01-2026'}},
+            {'op': 'update', 'type': 'item', 'id': self.item.id, 'values': {'scope': '80'}},
+        ])
+        self.assertEqual(version, self.versions()[1])
+        cabling = ProgressItem.objects.get(pk=created['i1'])
+        self.assertEqual((cabling.section_id, cabling.scope, cabling.targeted_end_date),
+                         (created['s1'], 250, date(2026, 1, 31)))
+        self.assertEqual(ProgressItem.objects.get(pk=self.item.pk).scope, 80)
+
+        self.apply([{'op': 'move', 'type': 'item', 'id': self.item.id, 'section': created['s1'], 'order': 1},
+                    {'op': 'delete', 'type': 'section', 'id': self.section.id}])
+        self.assertFalse(Section.objects.filter(pk=self.section.pk).exists())
+        self.assertEqual(ProgressItem.objects.get(pk=self.item.pk).section_id, created['s1'])
+
+    def test_stale_version_is_refused(self):
+        loaded = self.versions()[1]
+        self.apply([{'op': 'update', 'type': 'section', 'id': self.section.id, 'title': 'Civil works'}])
+        with self.assertRaises(VersionConflict) as raised:
+            self.apply([{'op': 'update', 'type': 'item', 'id': self.item.id, 'values': {'uom': 'm'}}], loaded)
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(raised.exception.version, self.versions()[1])
+        self.assertEqual(ProgressItem.objects.get(pk=self.item.pk).uom, 'Nos')
+
+    def test_progress_does_not_conflict_with_plan_edits(self):
+        loaded = self.versions()[1]
+        ProgressEntry.objects.bulk_create([self.entry(self.item, 0, 5)])
+        self.apply([{'op': 'update', 'type': 'item', 'id': self.item.id, 'values': {'uom': 'm'}}], loaded)
+        self.assertEqual(ProgressItem.objects.get(pk=self.item.pk).uom, 'm')
+
+    def test_bad_input(self):
+        other_user = User.objects.create_user('other', password='x')
+        other = ProjectAccess.objects.create(
+            user=other_user, project_name='Roof', location='Goa', type_of_project='roof top')
+        foreign = Section.objects.create(project=other, title='Roof', created_by=other_user)
+        bad_batches = [
+            ([{'op': 'rename', 'type': 'item', 'id': self.item.id}], 400),
+            ([{'op': 'update', 'type': 'item', 'id': '7', 'values': {}}], 400),
+            ([{'op': 'update', 'type': 'item', 'id': self.item.id, 'values': {'scope': 'lots'}}], 400),
+            ([{'op': 'update', 'type': 'item', 'id': self.item.id, 'values': {'created_by': 1}}], 400),
+            ([{'op': 'update', 'type': 'item', 'id': self.item.id, 'values': {'description': ' '}}], 400),
+            ([{'op': 'move', 'type': 'item', 'id': self.item.id, 'section': self.section.id, 'order': -1}], 400),
+            ([{'op': 'create', 'type': 'item', 'ref': 'i1', 'section': self.section.id, 'values': {'uom': 'm'}}], 400),
+            ([{'op': 'update', 'type': 'section', 'id': foreign.id, 'title': 'Mine'}], 404),
+            # The new section is rolled back with the batch.
+            ([{'op': 'create', 'type': 'section', 'ref': 's1', 'title': 'Electrical'},
+              {'op': 'create', 'type': 'item', 'ref': 'i1', 'section': 's2', 'values': {'description': 'x'}}], 400),
+        ]
+        for ops, status in bad_batches:
+            with self.subTest(ops=ops), self.assertRaises(PlanOpError) as raised:
+                self.apply(ops)
+            self.assertEqual(raised.exception.status, status)
+        with self.assertRaises(PlanOpError):
+            apply_plan_ops(self.project, self.user, '1', [])
+        self.assertEqual(list(Section.objects.filter(project=self.project)), [self.section])
+        self.assertEqual(Section.objects.get(pk=foreign.pk).title, 'Roof')
+
+    def test_endpoint_cost_follows_the_edit_not_the_plan(self):
+        admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(admin)
+        url = reverse('patch_project_plan', args=[self.project.id])
+
+        def patch(scope, version=None):
+            body = {'version': self.versions()[1] if version is None else version,
+                    'ops': [{'op': 'update', 'type': 'item', 'id': self.item.id, 'values': {'scope': scope}}]}
+            return self.client.patch(url, json.dumps(body), content_type='application/json')
+
+        small = patch('90')
+        self.assertEqual(small.status_code, 200)
+        self.assertEqual(small.json(), {'version': self.versions()[1], 'created': {}})
+        for n in range(30):
+            self.add_item(f'Item {n}')
+        large = patch('80')
+        self.assertEqual(large['X-Query-Count'], small['X-Query-Count'])
+
+        stale = patch('70', version=self.versions()[1] - 1)
+        self.assertEqual((stale.status_code, stale.json()['version']), (409, self.versions()[1]))
+        self.assertEqual(ProgressItem.objects.get(pk=self.item.pk).scope, 80)
+        self.client.force_login(self.user)
+        self.assertEqual(patch('70').status_code, 403)
+
+
+# 📅 Weekly and monthly rollups
+
+class RollupTests(PlanFixture):
+    def test_periods(self):
+        self.assertEqual(next_period('month', date(2025, 11, 1)), date(2025, 12, 1))
+        self.assertEqual(next_period('month', date(2025, 12, 1)), date(2026, 1, 1))
+        self.assertEqual(next_period('week', date(2025, 12, 29)), date(2026, 1, 5))
+        self.assertEqual(period_start('week', date(2026, 1, 4)), date(2025, 12, 29))
+        self.assertEqual(period_start('month', date(2024, 2, 29)), date(2024, 2, 1))
+        self.assertEqual(period_axis('week', date(2025, 12, 31), date(2026, 1, 12)), [
+            (date(2025, 12, 29), date(2026, 1, 4)),
+            (date(2026, 1, 5), date(2026, 1, 11)),
+            (date(2026, 1, 12), date(2026, 1, 18)),
+        ])
+        self.assertEqual(period_axis('month', date(2023, 12, 15), date(2024, 2, 1)), [
+            (date(2023, 12, 1), date(2023, 12, 31)),
+            (date(2024, 1, 1), date(2024, 1, 31)),
+            (date(2024, 2, 1), date(2024, 2, 29)),
+        ])
+
+    def test_project_rollup(self):
+        section = Section.objects.create(project=self.project, title='Electrical', created_by=self.user)
+        cabling = ProgressItem.objects.create(
+            section=section, description='Cabling', uom='m', scope=60, created_by=self.user,
+            targeted_start_date=date(2024, 1, 16), targeted_end_date=date(2024, 2, 14))   # 2 a day
+        ProgressItem.objects.create(section=section, description='Unplanned', uom='m', created_by=self.user)
+        ProgressEntry.objects.bulk_create([
+            ProgressEntry(item=cabling, user=self.user, date=day, progress_done=done)
+            for day, done in ((date(2023, 12, 31), 6), (date(2024, 1, 10), 10), (date(2024, 2, 5), 12))
+        ])
+
+        rollup = project_rollup(self.project, 'month', date(2024, 1, 20), date(2024, 2, 29))
+        self.assertEqual(rollup['start'], date(2024, 1, 1))
+        self.assertEqual([period['label'] for period in rollup['periods']], ['Jan 2024', 'Feb 2024'])
+        civil, electrical = rollup['sections']
+        row = electrical['items'][0]
+        self.assertEqual((row['done'], row['planned']), ([10, 12], [32, 28]))
+        # The running total starts from the progress made before the range.
+        self.assertEqual(row['cumulative'], [16, 28])
+        self.assertEqual((row['done_total'], row['planned_total']), (22, 60))
+        self.assertEqual(electrical['items'][1]['planned'], [0, 0])
+        # Items without a scope carry no weight; Piling (Civil) weighs as much as Cabling.
+        self.assertEqual((electrical['actual_pct'], electrical['planned_pct']), ([16.67, 20.0], [53.33, 46.67]))
+        self.assertEqual((civil['actual_pct'], civil['planned_pct']), ([0, 0], [0, 0]))
+        self.assertEqual((rollup['actual_pct'], rollup['planned_pct']), ([8.33, 10.0], [26.67, 23.33]))
+
+    def test_views_check_access_before_the_etag(self):
+        User.objects.create_user('outsider', password='x')
+        urls = [reverse('project_rollup', args=[self.project.pk]),
+                reverse('project_rollup_report', args=[self.project.pk])]
+        self.client.login(username='outsider', password='x')
+        for url in urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+            self.assertEqual(response.status_code, 403)
+            self.assertNotIn('ETag', response)
+
+        self.client.login(username='engineer', password='x')
+        response = self.client.get(urls[0], {'period': 'week'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['periods']), 12)
+        self.assertEqual(self.client.get(urls[0], HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertEqual(self.client.get(urls[0], {'period': 'week'},
+                                         HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(urls[0], {'period': 'day'}).status_code, 400)
 
-# Create your tests here.
@@ -15,8 +15,20 @@ urlpatterns = [
 
     path('custom-admin/assign-access/', views.assign_project_access, name='assign_project_access'),   
     path('custom-admin/project-sections/', views.admin_project_sections, name='admin_project_sections'),
+    path('custom-admin/project-sections/<int:project_id>/rows/', views.patch_project_plan, name='patch_project_plan'),
+    path('custom-admin/import-entries/', views.import_progress_entries, name='import_progress_entries'),
+    path('custom-admin/slow-requests/', views.slow_requests_report, name='slow_requests_report'),
     path('user/sections/', views.user_project_sections, name='user_project_sections'),
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin-dashboard/stream/', views.admin_dashboard_stream, name='admin_dashboard_stream'),
+    path('admin-dashboard/project/<int:project_id>/', views.admin_dashboard_project, name='admin_dashboard_project'),
+    path('projects/<int:project_id>/s-curve/', views.project_s_curve_data, name='project_s_curve'),
+    path('projects/<int:project_id>/rollup/', views.project_rollup_data, name='project_rollup'),
+    path('projects/<int:project_id>/rollup/report/', views.project_rollup_report, name='project_rollup_report'),
+    path('admin-dashboard/cache-stats/', views.dashboard_cache_stats, name='dashboard_cache_stats'),
     path('export-pdf/<int:project_id>/', views.export_project_pdf, name='export_project_pdf'),
+    path('export-pdf/jobs/<uuid:job_id>/', views.pdf_job_status, name='pdf_job_status'),
+    path('export-pdf/zip/', views.export_projects_zip, name='export_projects_zip'),
+    path('export-entries/', views.export_progress_entries, name='export_progress_entries'),
 
 ]
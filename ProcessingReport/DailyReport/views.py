@@ -107,116 +107,107 @@ def assign_project_access(request):
 
 
 
-from datetime import datetime
 from django.urls import reverse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import HttpResponseForbidden
 from django.utils import timezone
+from django.db import connection, transaction
 from django.db.models import Sum
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_http_methods
 from .models import ProjectAccess, Section, ProgressItem
-import json,math
+from .metrics import compute_metrics
+from .profiling import QueryCounter
+from .conditional import portfolio_state, project_condition, project_state, query_part
+from .editor_payload import build_plan_payload, dumps
+from .plan_ops import PlanOpError, VersionConflict, apply_plan_ops, parse_plan_date
+import json,math,logging
+
+logger = logging.getLogger(__name__)
 
 
 @login_required
+@project_condition('plan', portfolio_state, extra=query_part('project_id'))
 def admin_project_sections(request):
     if not request.user.is_superuser:
         return HttpResponseForbidden("Admins only.")
 
     project_access_list = ProjectAccess.objects.all()
     selected_project_id = request.GET.get('project_id')
-    sections_data = []
+    plan = None
+    rows_url = ''
     today = timezone.now().date()
 
-    def format_date(date_obj):
-        return date_obj.strftime("%d-%m-%Y") if date_obj else ''
+    # 1. Handle Save
+    if request.method == 'POST':
+        project_id = request.POST.get('project_id')
+        project = get_object_or_404(ProjectAccess, id=project_id)
+
+        with QueryCounter() as queries:
+            save_project_plan(request, project)
+        logger.info("Saved plan of project %s in %d queries.", project.id, queries.count)
 
-    # 1. Load data to render
+        messages.success(request, "Sections and items updated.")
+        response = redirect(f"{reverse('admin_project_sections')}?project_id={project_id}")
+        response['X-Query-Count'] = queries.count
+        return response
+
+    # 2. Load data to render
     if selected_project_id:
         try:
             project = ProjectAccess.objects.get(id=selected_project_id)
-            sections = Section.objects.filter(project=project).prefetch_related("items__entries")
-
-            for sec in sections:
-                section_items = []
-
-                for item in item_sort(sec.items.all()):
-                    expected_today = 'N/A'
-                    today_progress = 0
-                    completed = 0
-                    balance = 'N/A'
-                    status = 'Missing Dates'
-
-                    if item.targeted_start_date and item.targeted_end_date and item.scope is not None:
-                        done_so_far = item.entries.filter(
-                            date__lt=today
-                        ).aggregate(total=Sum('progress_done'))['total'] or 0
-
-                        today_entry = item.entries.filter(
-                            date=today
-                        ).order_by('-id').first()
-
-                        today_progress = today_entry.progress_done if today_entry else 0
-                        completed = done_so_far + today_progress
-                        balance = max(item.scope - completed, 0)
-
-                        expected_balance = max(item.scope - done_so_far, 0)
-                        remaining_days = (item.targeted_end_date - today).days + 1
-
-                        # expected_today = round(expected_balance / remaining_days, 2) if remaining_days > 0 else expected_balance
-                        expected_today = math.ceil(expected_balance / remaining_days) if remaining_days > 0 else expected_balance
-                        # status = 'Ontime' if today <= item.targeted_end_date else 'Delay'
-                        status = item.get_status()
-
-                    section_items.append({
-                        'id': item.id,
-                        'description': item.description,
-                        'uom': item.uom,
-                        'order': item.order,
-                        'scope': item.scope,
-                        'targeted_start_date': format_date(item.targeted_start_date),
-                        'targeted_end_date': format_date(item.targeted_end_date),
-                        'expected_today': expected_today,
-                        'today_progress': today_progress,
-                        'completed': completed,
-                        'balance': balance,
-                        'status': status,
-                        'actual_start_date': format_date(item.scope_assigned_date),  # ✅ Replaced
-                        'actual_end_date': format_date(item.scope_completed_date),  # ✅ Replaced
-                    })
-
-                sections_data.append({
-                    'id': sec.id,
-                    'title': sec.title,
-                    'items': section_items,
-                })
+            sections = Section.objects.filter(project=project).prefetch_related("items")
+            plan = build_plan_payload(sections, compute_metrics([project.id], today), project.plan_version)
+            rows_url = reverse('patch_project_plan', args=[project.id])
         except ProjectAccess.DoesNotExist:
             messages.error(request, "Invalid project.")
 
-    # 2. Handle Save
-    if request.method == 'POST':
-        project_id = request.POST.get('project_id')
-        project = get_object_or_404(ProjectAccess, id=project_id)
+    return render(request, 'admin_project_sections.html', {
+        'project_access_list': project_access_list,
+        'selected_project_id': selected_project_id,
+        'sections_data': dumps(plan),
+        'rows_url': rows_url,
+    })
 
-        total_sections = int(request.POST.get('total_sections', 0))
-        submitted_section_ids = []
-        submitted_item_ids = []
 
+PLAN_ITEM_FIELDS = ['description', 'uom', 'scope', 'order', 'targeted_start_date', 'targeted_end_date']
+
+
+def save_project_plan(request, project):
+    """Apply the posted plan editor form to ``project`` as one diff.
+
+    Existing sections and items are loaded with one query each; changed rows
+    are written with bulk_update, new ones with bulk_create and removed ones
+    with one delete per model, all inside a single transaction, so the query
+    count does not grow with the size of the plan.
+    """
+    with transaction.atomic():
+        sections = {sec.id: sec for sec in Section.objects.filter(project=project)}
+        items = {item.id: item for item in ProgressItem.objects.filter(section__project=project)}
+
+        # Parse the form into (section, [item rows]) before touching the database.
+        posted = []
+        sections_to_update = []
+        new_sections = []
+        total_sections = int(request.POST.get('total_sections', 0))
         for idx in range(total_sections):
             section_id = request.POST.get(f'section_id_{idx}')
-            title = request.POST.get(f'section_title_{idx}').strip()
+            title = (request.POST.get(f'section_title_{idx}') or '').strip()
             if not title:
                 continue
 
             if section_id:
-                section = get_object_or_404(Section, id=section_id, project=project)
-                section.title = title
-                section.save()
+                section = sections.get(int(section_id))
+                if section is None:
+                    raise Http404("No Section matches the given query.")
+                if section.title != title:
+                    section.title = title
+                    sections_to_update.append(section)
             else:
-                section = Section.objects.create(project=project, title=title, created_by=request.user)
-
-            submitted_section_ids.append(section.id)
+                section = Section(project=project, title=title, created_by=request.user)
+                new_sections.append(section)
 
             descriptions = request.POST.getlist(f'description_{idx}[]')
             uoms = request.POST.getlist(f'uom_{idx}[]')
@@ -225,63 +216,96 @@ def admin_project_sections(request):
             targeted_starts = request.POST.getlist(f'targeted_start_date_{idx}[]')
             targeted_ends = request.POST.getlist(f'targeted_end_date_{idx}[]')
 
+            rows = []
             for order_index, (desc, uom, scope, start_str, end_str) in enumerate(zip(descriptions, uoms, scopes, targeted_starts, targeted_ends)):
                 desc = desc.strip()
-                uom = uom.strip()
-                scope = float(scope) if scope.strip() else None
-
-                def parse_date(dstr):
-                    try:
-                        return datetime.strptime(dstr.strip(), "%d-%m-%Y").date() if dstr.strip() else None
-                    except ValueError:
-                        return None
-
-                targeted_start = parse_date(start_str)
-                targeted_end = parse_date(end_str)
-
                 if not desc:
                     continue
-
                 item_id = item_ids[order_index] if order_index < len(item_ids) else None
-
+                rows.append((item_id, {
+                    'description': desc,
+                    'uom': uom.strip(),
+                    'scope': float(scope) if scope.strip() else None,
+                    'order': order_index,
+                    'targeted_start_date': parse_plan_date(start_str),
+                    'targeted_end_date': parse_plan_date(end_str),
+                }))
+            posted.append((section, rows))
+
+        if new_sections:
+            if connection.features.can_return_rows_from_bulk_insert:
+                Section.objects.bulk_create(new_sections)
+            else:
+                # MySQL does not hand back the ids of bulk-inserted rows,
+                # which the new sections' items need.
+                for section in new_sections:
+                    section.save()
+        if sections_to_update:
+            Section.objects.bulk_update(sections_to_update, ['title'])
+
+        kept_section_ids = set()
+        kept_item_ids = set()
+        items_to_update = []
+        new_items = []
+        for section, rows in posted:
+            kept_section_ids.add(section.id)
+            for item_id, values in rows:
                 if item_id:
-                    item = get_object_or_404(ProgressItem, id=item_id, section=section)
-                    item.description = desc
-                    item.uom = uom
-                    item.scope = scope
-                    item.order = order_index
-                    item.targeted_start_date = targeted_start
-                    item.targeted_end_date = targeted_end
-                    item.save()
+                    item = items.get(int(item_id))
+                    if item is None or item.section_id != section.id:
+                        raise Http404("No ProgressItem matches the given query.")
+                    kept_item_ids.add(item.id)
+                    if any(getattr(item, field) != value for field, value in values.items()):
+                        for field, value in values.items():
+                            setattr(item, field, value)
+                        items_to_update.append(item)
                 else:
-                    item = ProgressItem.objects.create(
-                        section=section,
-                        description=desc,
-                        uom=uom,
-                        scope=scope,
-                        order=order_index,
-                        targeted_start_date=targeted_start,
-                        targeted_end_date=targeted_end,
-                        created_by=request.user
-                    )
-
-                submitted_item_ids.append(item.id)
-
-        Section.objects.filter(project=project).exclude(id__in=submitted_section_ids).delete()
-        ProgressItem.objects.filter(section__project=project).exclude(id__in=submitted_item_ids).delete()
+                    new_items.append(ProgressItem(section=section, created_by=request.user, **values))
 
-        messages.success(request, "Sections and items updated.")
-        return redirect(f"{reverse('admin_project_sections')}?project_id={project_id}")
+        if items_to_update:
+            ProgressItem.objects.bulk_update(items_to_update, PLAN_ITEM_FIELDS, batch_size=500)
+        if new_items:
+            ProgressItem.objects.bulk_create(new_items, batch_size=500)
 
-    return render(request, 'admin_project_sections.html', {
-        'project_access_list': project_access_list,
-        'selected_project_id': selected_project_id,
-        'sections_data': json.dumps(sections_data)
-    })
+        stale_section_ids = set(sections) - kept_section_ids
+        stale_item_ids = {
+            item.id for item in items.values()
+            if item.id not in kept_item_ids and item.section_id not in stale_section_ids
+        }
+        if stale_item_ids:
+            ProgressItem.objects.filter(id__in=stale_item_ids).delete()
+        if stale_section_ids:
+            Section.objects.filter(id__in=stale_section_ids).delete()
 
 
-def item_sort(items):
-    return sorted(items, key=lambda x: x.order if x.order is not None else 0)
+@login_required
+@require_http_methods(['PATCH'])
+def patch_project_plan(request, project_id):
+    """Apply a batch of row operations from the plan editor (see plan_ops)."""
+    if not request.user.is_superuser:
+        return HttpResponseForbidden("Admins only.")
+    project = get_object_or_404(ProjectAccess, id=project_id)
+
+    try:
+        batch = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': "The body must be JSON."}, status=400)
+    if not isinstance(batch, dict):
+        return JsonResponse({'error': 'Expected {"version": ..., "ops": [...]}.'}, status=400)
+
+    try:
+        with QueryCounter() as queries:
+            version, created = apply_plan_ops(project, request.user, batch.get('version'), batch.get('ops'))
+    except VersionConflict as exc:
+        return JsonResponse({'error': str(exc), 'version': exc.version}, status=409)
+    except PlanOpError as exc:
+        return JsonResponse({'error': str(exc)}, status=exc.status)
+    logger.info("Applied %d plan operation(s) to project %s in %d queries.",
+                len(batch['ops']), project.id, queries.count)
+
+    response = JsonResponse({'version': version, 'created': created})
+    response['X-Query-Count'] = queries.count
+    return response
 
 
 
@@ -451,10 +475,95 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from django.http import HttpResponseForbidden
 from django.utils import timezone
-from django.db.models import Sum
+from django.db import transaction
 from .models import ProjectAccess, Section, ProgressItem, ProgressEntry
+from .bulk import upsert_options
+
+
+def save_progress_batch(request, project, today):
+    """Record the posted ``progress_<item id>`` values of ``project`` for ``today``.
+
+    Prior totals come from the items' stored rollups, plus one query for the
+    entries already made today; entries are then upserted on (item, date)
+    and changed item dates bulk-updated in a single transaction. Returns the
+    validation messages.
+    """
+    error_messages = []
+    submitted = []
+    for item in ProgressItem.objects.filter(section__project=project):
+        progress_raw = request.POST.get(f"progress_{item.id}", "").strip()
+
+        if not item.targeted_start_date or not item.targeted_end_date or item.scope is None:
+            if progress_raw:
+                error_messages.append(f"Cannot enter progress for '{item.description}' due to missing dates.")
+            continue
+
+        if progress_raw == "":
+            continue
+
+        try:
+            progress_val = float(progress_raw)
+        except ValueError:
+            error_messages.append(f"Invalid input for '{item.description}'.")
+            continue
+
+        if progress_val < 0:
+            error_messages.append(f"Negative value not allowed for '{item.description}'.")
+            continue
+
+        submitted.append((item, progress_val))
+
+    touched_today = [item.id for item, _ in submitted if item.last_entry_date == today]
+    today_values = dict(
+        ProgressEntry.objects.filter(item_id__in=touched_today, date=today).values_list('item_id', 'progress_done')
+    ) if touched_today else {}
+
+    entries = []
+    changed_items = []
+    for item, progress_val in submitted:
+        existing_today_progress = today_values.get(item.id)
+        done_so_far = item.cumulative_done - (existing_today_progress or 0)
+
+        if done_so_far + progress_val > item.scope:
+            allowed_today_max = item.scope - done_so_far
+            error_messages.append(
+                f"Progress for '{item.description}' exceeds scope. Max allowed today: {allowed_today_max}")
+            continue
+
+        dates_before = (item.scope_assigned_date, item.scope_completed_date)
+
+        # 🔹 First time progress → assign scope_assigned_date
+        if not item.scope_assigned_date:
+            if progress_val > 0 and done_so_far == 0:
+                item.scope_assigned_date = today
+        elif progress_val == 0 and done_so_far == 0:
+            # 🔹 If progress reset to 0 and total is 0 → clear scope_assigned_date
+            item.scope_assigned_date = None
+
+        # 🔹 End Date update/reset logic
+        if done_so_far + progress_val >= item.scope:
+            if not item.scope_completed_date:
+                item.scope_completed_date = today
+        elif item.scope_completed_date:
+            item.scope_completed_date = None
+
+        # 🔹 Only rows whose value for today actually changes are written
+        if existing_today_progress != progress_val and not (existing_today_progress is None and progress_val == 0):
+            entries.append(ProgressEntry(item=item, user=request.user, date=today, progress_done=progress_val))
+        if (item.scope_assigned_date, item.scope_completed_date) != dates_before:
+            changed_items.append(item)
+
+    with transaction.atomic():
+        if entries:
+            ProgressEntry.objects.bulk_create(entries, **upsert_options(('item', 'date'), ('progress_done',)))
+        if changed_items:
+            ProgressItem.objects.bulk_update(changed_items, ['scope_assigned_date', 'scope_completed_date'])
+
+    return error_messages
+
 
 @login_required
+@project_condition('sections', project_state(lambda request: {'user': request.user}))
 def user_project_sections(request):
     if request.user.is_superuser:
         return HttpResponseForbidden("Admins only.")
@@ -466,83 +575,21 @@ def user_project_sections(request):
             'error': 'You do not have access to any project.'
         })
 
-    sections = Section.objects.filter(project=project).prefetch_related("items__entries")
+    sections = Section.objects.filter(project=project).prefetch_related("items")
     today = timezone.now().date()
     error_messages = []
 
     #### ✏️ PART 1: On POST - Save progress
     if request.method == 'POST':
-        for item in ProgressItem.objects.filter(section__project=project):
-            progress_raw = request.POST.get(f"progress_{item.id}", "").strip()
-
-            if not item.targeted_start_date or not item.targeted_end_date or item.scope is None:
-                if progress_raw:
-                    error_messages.append(f"Cannot enter progress for '{item.description}' due to missing dates.")
-                continue
-
-            if progress_raw == "":
-                continue
-
-            try:
-                progress_val = float(progress_raw)
-                if progress_val < 0:
-                    error_messages.append(f"Negative value not allowed for '{item.description}'.")
-                    continue
-
-                done_so_far = item.entries.filter(user=request.user, date__lt=today).aggregate(
-                    total=Sum('progress_done'))['total'] or 0
-
-                today_entry = item.entries.filter(user=request.user, date=today).first()
-                existing_today_progress = today_entry.progress_done if today_entry else 0
-
-                new_total = done_so_far + progress_val
-                if new_total > item.scope:
-                    allowed_today_max = item.scope - done_so_far
-                    error_messages.append(
-                        f"Progress for '{item.description}' exceeds scope. Max allowed today: {allowed_today_max}")
-                    continue
-
-                # 🔹 First time progress → assign scope_assigned_date
-                if not item.scope_assigned_date:
-                    if progress_val > 0:
-                        prev_total = item.entries.exclude(date=today).aggregate(total=Sum('progress_done'))['total'] or 0
-                        if prev_total == 0:
-                            item.scope_assigned_date = today
-                else:
-                    # 🔹 If progress reset to 0 and total is 0 → clear scope_assigned_date
-                    total_without_today = item.entries.exclude(date=today).aggregate(total=Sum('progress_done'))['total'] or 0
-                    if progress_val == 0 and total_without_today == 0:
-                        item.scope_assigned_date = None
-
-                # 🔹 Save today's progress
-                if today_entry:
-                    today_entry.progress_done = progress_val
-                    today_entry.save()
-                else:
-                    ProgressEntry.objects.create(user=request.user, item=item, progress_done=progress_val)
-
-                # 🔁 Recalculate total
-                total_progress = item.entries.aggregate(total=Sum('progress_done'))['total'] or 0
-
-                # 🔹 End Date update/reset logic
-                if total_progress >= item.scope:
-                    if not item.scope_completed_date:
-                        item.scope_completed_date = today
-                elif item.scope_completed_date:
-                    item.scope_completed_date = None
-
-                item.save()
-
-            except ValueError:
-                error_messages.append(f"Invalid input for '{item.description}'.")
-
+        error_messages = save_progress_batch(request, project, today)
         return redirect('user_project_sections')
 
     #### 📦 PART 2: Render Data
+    metrics = compute_metrics([project.id], today)
     sections_data = []
     for section in sections:
         item_data = []
-        for item in section.items.all().order_by('order', 'id'):
+        for item in sorted(section.items.all(), key=lambda item: (item.order, item.id)):
             expected_today = 'N/A'
             balance = 'N/A'
             completed = 0
@@ -551,21 +598,14 @@ def user_project_sections(request):
             max_today_input = None
 
             if item.targeted_start_date and item.targeted_end_date and item.scope is not None:
-                done_so_far = item.entries.filter(user=request.user, date__lt=today).aggregate(
-                    total=Sum('progress_done'))['total'] or 0
-
-                today_entry = item.entries.filter(user=request.user, date=today).first()
-                today_progress = today_entry.progress_done if today_entry else 0
+                values = metrics.item(item.id)
+                done_so_far = values['done_before']
+                today_progress = values['today_progress']
 
                 completed = round(done_so_far + today_progress)
                 balance = round(max(item.scope - completed, 0))
-
-                expected_balance = round(max(item.scope - done_so_far, 0))
-                remaining_days = (item.targeted_end_date - today).days + 1
-                expected_today = math.ceil(expected_balance / remaining_days) if remaining_days > 0 else expected_balance
-
-                # status = 'Ontime' if today <= item.targeted_end_date else 'Delay'
-                status = item.get_status()
+                expected_today = values['expected_today']
+                status = values['status']
                 max_today_input = item.scope - done_so_far
 
 
@@ -599,12 +639,6 @@ def user_project_sections(request):
     })
 
 
-from decimal import Decimal, ROUND_HALF_UP
-
-def custom_round(value):
-    return int(Decimal(value).quantize(0, rounding=ROUND_HALF_UP))
-
-
 # from django.utils.timezone import now
 # from django.contrib.admin.views.decorators import staff_member_required
 # from django.db.models import Sum
@@ -783,143 +817,124 @@ from django.utils.timezone import now
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import Sum
 from django.shortcuts import render
-from .models import ProjectAccess, ProgressItem
-from decimal import Decimal, ROUND_HALF_UP
+from .models import ProjectAccess, ProgressItem, ProjectDailySnapshot
+from .dashboard_cache import cache_stats, cached_dashboard_data
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from asgiref.sync import sync_to_async
+from .async_dashboard import iter_cards, project_detail_async
+from datetime import date, timedelta
+from itertools import groupby
+
+def dashboard_etag_part(request):
+    if request.GET.get('mode') == 'history':
+        return None
+    return query_part('page')(request)
+
 
 @staff_member_required
+@project_condition('dashboard', portfolio_state, extra=dashboard_etag_part)
 def admin_dashboard(request):
     today = now().date()
-    dashboard_data = []
-    projects = ProjectAccess.objects.all()
-
-    for project in projects:
-        items = ProgressItem.objects.filter(section__project=project).prefetch_related('entries')
-
-        activities_today = []
-        delay_activities = []
-        ontime_activities = []
-        missing_activities = []
-
-        total_scope = 0
-        total_completed = 0
-        delay_percentages = []
-        ontime_percentages = []
-        all_target_end_dates = []
-        all_completed_dates = []
-
-        for item in items:
-            today_entry = item.entries.filter(date=today).first()
-            if today_entry and today_entry.progress_done > 0:
-                done_so_far = item.entries.filter(date__lt=today).aggregate(total=Sum('progress_done'))['total'] or 0
-                today_progress = today_entry.progress_done or 0
-                total_completed_item = done_so_far + today_progress
-                balance = max(item.scope - total_completed_item, 0) if item.scope else 'N/A'
-                expected_today = 'N/A'
-                if item.scope and item.targeted_end_date:
-                    remaining_scope = item.scope - done_so_far
-                    remaining_days = (item.targeted_end_date - today).days + 1
-                    expected_today = round(remaining_scope / remaining_days, 2) if remaining_days > 0 else remaining_scope
-
-                status = item.get_status()
-
-                activities_today.append({
-                    'description': item.description,
-                    'uom': item.uom,
-                    'scope': item.scope,
-                    'targeted_start_date': item.targeted_start_date,
-                    'targeted_end_date': item.targeted_end_date,
-                    'scope_assigned_date': item.scope_assigned_date,
-                    'scope_completed_date': item.scope_completed_date,
-                    'total_progress': total_completed_item,
-                    'balance': balance,
-                    'expected_today': expected_today,
-                    'status': status,
-                    'today_progress': today_progress
-                })
-
-            # === Total Status Check ===
-            total_progress = item.total_progress()
-            balance = item.remaining_balance()
-            percentage = round((total_progress / item.scope) * 100, 2) if item.scope else 0
-
-            activity_data = {
-                'description': item.description,
-                'uom': item.uom,
-                'scope': item.scope,
-                'targeted_start_date': item.targeted_start_date,
-                'targeted_end_date': item.targeted_end_date,
-                'scope_assigned_date': item.scope_assigned_date,
-                'scope_completed_date': item.scope_completed_date,
-                'total_progress': total_progress,
-                'balance': balance,
-                'percentage': percentage
-            }
-
-            if item.scope:
-                total_scope += item.scope
-                total_completed += total_progress
-
-            status = item.get_status()
-            if status == 'Missing Dates':
-                missing_activities.append(activity_data)
-            elif status == 'Ontime':
-                ontime_percentages.append(percentage)
-                ontime_activities.append(activity_data)
-            elif status == 'Delay':
-                actual_end = item.scope_completed_date or today
-                activity_data['delay_days'] = max((actual_end - item.targeted_end_date).days, 0)
-                delay_percentages.append(percentage)
-                delay_activities.append(activity_data)
-
-            if item.targeted_end_date:
-                all_target_end_dates.append(item.targeted_end_date)
-            if item.scope_completed_date:
-                all_completed_dates.append(item.scope_completed_date)
-
-        avg_ontime = round(sum(ontime_percentages) / len(ontime_percentages)) if ontime_percentages else 0
-        avg_delay = round(sum(delay_percentages) / len(delay_percentages)) if delay_percentages else 0
-
-        total_activities_count = len(ontime_percentages) + len(delay_percentages)
-        total_activities_percent = sum(ontime_percentages) + sum(delay_percentages)
-
-        if total_activities_count > 0:
-            overall_completion_percent = custom_round(total_activities_percent / total_activities_count)
-        else:
-            overall_completion_percent = 0
+    if request.GET.get('mode') == 'history':
+        return admin_dashboard_history(request, today)
 
-        project_completed = (total_scope > 0) and (total_completed >= total_scope)
-        if project_completed and all_completed_dates and all_target_end_dates:
-            actual_end = max(all_completed_dates)
-            latest_target = max(all_target_end_dates)
-            project_delay_days = max((actual_end - latest_target).days, 0)
-        else:
-            project_delay_days = sum([act.get('delay_days', 0) for act in delay_activities])
-
-        dashboard_data.append({
-            'project_id': project.id,
-            'project_name': project.project_name,
-            'user': project.user.username,
-            'location': project.location,
-            'type': project.type_of_project,
-
-            'activities_today': activities_today,
-            'delay_activities': delay_activities,
-            'ontime_activities': ontime_activities,
-            'missing_activities': missing_activities,
-
-            'count_today': len(activities_today),
-            'count_delay': len(delay_activities),
-            'count_ontime': len(ontime_activities),
-            'count_missing': len(missing_activities),
-
-            'avg_ontime_percent': avg_ontime,
-            'avg_delay_percent': avg_delay,
-            'project_delay_days': project_delay_days,
-            'overall_completion_percent': overall_completion_percent,
-        })
+    # 📄 Only one page of project summaries; activity tables load per card
+    page = dashboard_page(request)
+    dashboard_data, hits, misses = cached_dashboard_data(today, page.object_list)
 
-    return render(request, 'admin_project_dashboard.html', {
+    response = render(request, 'admin_project_dashboard.html', {
         'dashboard_data': dashboard_data,
+        'page': page,
+        'today': today,
+    })
+    response['X-Dashboard-Cache'] = f"hits={hits}; misses={misses}"
+    return response
+
+
+def dashboard_page(request):
+    paginator = Paginator(
+        ProjectAccess.objects.order_by('id'),
+        getattr(settings, 'DASHBOARD_PAGE_SIZE', 20),
+    )
+    return paginator.get_page(request.GET.get('page'))
+
+
+CARD_SLOT = 'DASHBOARD-CARD-SLOT'
+
+def dashboard_shell(request, today):
+    """The dashboard page split around its cards, or the whole page if it has none."""
+    page = dashboard_page(request)
+    project_ids = [project.id for project in page.object_list]
+    html = render_to_string('admin_project_dashboard.html', {
+        'card_slot': CARD_SLOT if project_ids else '',
+        'page': page,
+        'today': today,
+    }, request=request)
+    return project_ids, html.split(CARD_SLOT)
+
+
+@staff_member_required
+@project_condition('dashboard-stream', portfolio_state, extra=dashboard_etag_part)
+async def admin_dashboard_stream(request):
+    """``admin_dashboard`` for ASGI: cards are computed concurrently and streamed in order."""
+    today = now().date()
+    project_ids, parts = await sync_to_async(dashboard_shell)(request, today)
+    if len(parts) == 1:
+        return HttpResponse(parts[0])
+
+    # 🚀 Head first, then each card as soon as it and the ones above it are ready
+    async def content():
+        yield parts[0]
+        async for card in iter_cards(today, project_ids):
+            yield card
+        yield parts[1]
+
+    return StreamingHttpResponse(content(), content_type='text/html; charset=utf-8')
+
+
+@staff_member_required
+def dashboard_cache_stats(request):
+    return JsonResponse(cache_stats())
+
+
+@staff_member_required
+@project_condition('activities', project_state(lambda request, project_id: {'pk': project_id}))
+async def admin_dashboard_project(request, project_id):
+    """Activity tables of one dashboard card, fetched when the card is first opened."""
+    return JsonResponse(await project_detail_async(project_id, now().date()))
+
+
+@staff_member_required
+def admin_dashboard_history(request, today):
+    """Trend of the stored daily snapshots, one indexed range query for all projects."""
+    def parse_day(value, default):
+        try:
+            return date.fromisoformat(value) if value else default
+        except ValueError:
+            return default
+
+    date_to = parse_day(request.GET.get('to'), today - timedelta(days=1))
+    date_from = parse_day(request.GET.get('from'), date_to - timedelta(days=29))
+
+    snapshots = (
+        ProjectDailySnapshot.objects
+        .filter(date__range=(date_from, date_to))
+        .select_related('project__user')
+        .order_by('project_id', 'date')
+    )
+
+    history = [
+        {'project': project, 'snapshots': list(rows)}
+        for project, rows in groupby(snapshots, key=lambda snap: snap.project)
+    ]
+
+    return render(request, 'admin_dashboard_history.html', {
+        'history': history,
+        'date_from': date_from,
+        'date_to': date_to,
         'today': today,
     })
 
@@ -1081,166 +1096,353 @@ def admin_dashboard(request):
 #     return response
 
 
-from django.template.loader import get_template
-from django.http import HttpResponse
-from xhtml2pdf import pisa
+from functools import wraps
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.utils.timezone import now
-from django.db.models import Sum
-from .models import ProjectAccess, ProgressItem
-from decimal import Decimal, ROUND_HALF_UP
-
-def custom_round(value):
-    return int(Decimal(value).quantize(0, rounding=ROUND_HALF_UP))
+from .models import ProjectAccess, PdfJob
+from .pdf import PdfRenderError, project_pdf
+from .jobs import enqueue_pdf_job
+
+def can_see_project(user, project):
+    return user.is_staff or project.user_id == user.id
+
+def project_access_required(view):
+    """404/403 for a project the user may not see, before ``view`` or its conditional GET runs.
+
+    Goes above ``project_condition``, so no ETag (or 304) is ever sent for
+    someone else's project.
+    """
+    @wraps(view)
+    def wrapper(request, project_id, *args, **kwargs):
+        project = ProjectAccess.objects.only('user_id').filter(id=project_id).first()
+        if project is None:
+            return HttpResponse("Project not found", status=404)
+        if not can_see_project(request.user, project):
+            return HttpResponseForbidden("Not your project.")
+        return view(request, project_id, *args, **kwargs)
+    return wrapper
 
+@login_required
+@project_access_required
+@project_condition(
+    'pdf', project_state(lambda request, project_id: {'pk': project_id}),
+    extra=lambda request: None if request.GET.get('async') else '',
+)
 def export_project_pdf(request, project_id):
     today = now().date()
+    project = get_object_or_404(ProjectAccess.objects.select_related('user'), id=project_id)
+
+    # ⏳ Async mode: queue the render for the pdf_worker command and answer at once
+    if request.GET.get('async'):
+        job = enqueue_pdf_job(project, today, request.user)
+        return JsonResponse(pdf_job_payload(request, job), status=202)
 
     try:
-        project = ProjectAccess.objects.get(id=project_id)
-    except ProjectAccess.DoesNotExist:
-        return HttpResponse("Project not found", status=404)
-
-    items = ProgressItem.objects.filter(section__project=project).prefetch_related('entries')
-
-    activities_today = []
-    delay_activities = []
-    ontime_activities = []
-    missing_activities = []
-
-    total_scope = 0
-    total_completed = 0
-    delay_percentages = []
-    ontime_percentages = []
-    all_target_end_dates = []
-    all_completed_dates = []
-
-    for item in items:
-        # === Calculate today's activity ===
-        today_entry = item.entries.filter(date=today).first()
-        if today_entry and today_entry.progress_done > 0:
-            done_so_far = item.entries.filter(date__lt=today).aggregate(total=Sum('progress_done'))['total'] or 0
-            today_progress = today_entry.progress_done or 0
-            total_completed_item = done_so_far + today_progress
-            balance = max(item.scope - total_completed_item, 0) if item.scope else 'N/A'
-            expected_today = 'N/A'
-            if item.scope and item.targeted_end_date:
-                remaining_scope = item.scope - done_so_far
-                remaining_days = (item.targeted_end_date - today).days + 1
-                expected_today = -(-remaining_scope // remaining_days) if remaining_days > 0 else remaining_scope  # ceil
+        path, hit = project_pdf(project, today)
+    except PdfRenderError:
+        logger.exception("PDF export failed for project %s", project.id)
+        return HttpResponse("PDF generation failed", status=500)
 
-            status = get_item_status(item, today)
+    response = FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f"Project_{project.id}_Report.pdf",
+        content_type='application/pdf',
+    )
+    response['X-PDF-Cache'] = 'hit' if hit else 'miss'
+    return response
 
-            activities_today.append({
-                'description': item.description,
-                'uom': item.uom,
-                'scope': item.scope,
-                'targeted_start_date': item.targeted_start_date,
-                'targeted_end_date': item.targeted_end_date,
-                'scope_assigned_date': item.scope_assigned_date,
-                'scope_completed_date': item.scope_completed_date,
-                'total_progress': total_completed_item,
-                'balance': balance,
-                'expected_today': expected_today,
-                'status': status,
-                'today_progress': today_progress
-            })
 
-        # === Total progress status ===
-        total_progress = item.total_progress()
-        balance = item.remaining_balance()
-        percentage = round((total_progress / item.scope) * 100, 2) if item.scope else 0
-
-        activity_data = {
-            'description': item.description,
-            'uom': item.uom,
-            'scope': item.scope,
-            'targeted_start_date': item.targeted_start_date,
-            'targeted_end_date': item.targeted_end_date,
-            'scope_assigned_date': item.scope_assigned_date,
-            'scope_completed_date': item.scope_completed_date,
-            'total_progress': total_progress,
-            'balance': balance,
-            'percentage': percentage
-        }
+def pdf_job_payload(request, job):
+    status_url = request.build_absolute_uri(reverse('pdf_job_status', args=[job.id]))
+    payload = {
+        'job_id': str(job.id),
+        'project_id': job.project_id,
+        'report': job.report,
+        'report_date': job.report_date.isoformat(),
+        'status': job.status,
+        'status_url': status_url,
+    }
+    if job.status == PdfJob.DONE:
+        payload['download_url'] = f"{status_url}?download=1"
+    elif job.status == PdfJob.FAILED:
+        payload['error'] = job.error
+    return payload
 
-        if item.scope:
-            total_scope += item.scope
-            total_completed += total_progress
-
-        status = get_item_status(item, today)
-
-        if status == 'Missing Dates':
-            missing_activities.append(activity_data)
-        elif status == 'Ontime':
-            ontime_percentages.append(percentage)
-            ontime_activities.append(activity_data)
-        elif status == 'Delay':
-            actual_end = item.scope_completed_date or today
-            activity_data['delay_days'] = max((actual_end - item.targeted_end_date).days, 0)
-            delay_percentages.append(percentage)
-            delay_activities.append(activity_data)
-
-        if item.targeted_end_date:
-            all_target_end_dates.append(item.targeted_end_date)
-        if item.scope_completed_date:
-            all_completed_dates.append(item.scope_completed_date)
-
-    avg_ontime = round(sum(ontime_percentages) / len(ontime_percentages), 2) if ontime_percentages else 0
-    avg_delay = round(sum(delay_percentages) / len(delay_percentages), 2) if delay_percentages else 0
-
-    total_activities_count = len(ontime_percentages) + len(delay_percentages)
-    total_activities_percent = sum(ontime_percentages) + sum(delay_percentages)
-    if total_activities_count > 0:
-        overall_completion_percent = custom_round(total_activities_percent / total_activities_count)
-    else:
-        overall_completion_percent = 0
 
-    project_completed = (total_scope > 0) and (total_completed >= total_scope)
-    if project_completed and all_completed_dates and all_target_end_dates:
-        actual_end = max(all_completed_dates)
-        latest_target = max(all_target_end_dates)
-        project_delay_days = max((actual_end - latest_target).days, 0)
-    else:
-        project_delay_days = sum([act.get('delay_days', 0) for act in delay_activities])
+@login_required
+def pdf_job_status(request, job_id):
+    job = get_object_or_404(PdfJob.objects.select_related('project'), id=job_id)
+    if not can_see_project(request.user, job.project):
+        return HttpResponseForbidden("Not your project.")
 
-    context = {
-        'project': project,
-        'today': today,
-        'activities_today': activities_today,
-        'delay_activities': delay_activities,
-        'ontime_activities': ontime_activities,
-        'missing_activities': missing_activities,
-
-        'count_today': len(activities_today),
-        'count_delay': len(delay_activities),
-        'count_ontime': len(ontime_activities),
-        'count_missing': len(missing_activities),
-
-        'avg_ontime_percent': avg_ontime,
-        'avg_delay_percent': avg_delay,
-        'project_delay_days': project_delay_days,
-        'overall_completion_percent': overall_completion_percent,
-    }
+    if job.status == PdfJob.DONE and request.GET.get('download'):
+        try:
+            handle = open(job.file_path, 'rb')
+        except FileNotFoundError:
+            # Evicted from the PDF cache since it was rendered: render it again.
+            PdfJob.objects.filter(id=job.id).update(status=PdfJob.QUEUED, file_path='', started_at=None)
+            job.refresh_from_db()
+        else:
+            return FileResponse(
+                handle,
+                as_attachment=True,
+                filename=job.filename(),
+                content_type='application/pdf',
+            )
 
-    template = get_template('project_pdf_template.html')
-    html = template.render(context)
+    return JsonResponse(pdf_job_payload(request, job))
 
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="Project_{project.id}_Report.pdf"'
 
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    if pisa_status.err:
-        return HttpResponse("PDF generation failed", status=500)
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from .pdf import zip_members
+from .pool import shared_pool
+from .zipstream import stream_zip
 
+@staff_member_required
+def export_projects_zip(request):
+    """Reports of the selected projects (``?project=<id>``, repeatable; default all) as one ZIP."""
+    today = now().date()
+    projects = ProjectAccess.objects.order_by('id')
+    selected = request.GET.getlist('project')
+    if selected:
+        try:
+            projects = projects.filter(id__in=[int(pk) for pk in selected])
+        except ValueError:
+            return HttpResponse("Invalid project id", status=400)
+    project_ids = list(projects.values_list('id', flat=True))
+    if not project_ids:
+        return HttpResponse("No projects selected", status=404)
+
+    # Renders run on the server's shared pool; this export keeps at most
+    # two tasks per worker queued on it.
+    processes = min(getattr(settings, 'PDF_EXPORT_PROCESSES', 2), len(project_ids))
+    response = StreamingHttpResponse(
+        stream_zip(zip_members(project_ids, today, processes, shared_pool())),
+        content_type='application/zip',
+    )
+    response['Content-Disposition'] = f'attachment; filename="Project_Reports_{today.isoformat()}.zip"'
     return response
 
 
-def get_item_status(item, today):
-    """Applies the exact OnTime/Delay rules."""
-    if not item.targeted_start_date or not item.targeted_end_date:
-        return "Missing Dates"
+import tempfile
+from .entry_export import csv_chunks, entry_queryset, iter_entry_rows, write_xlsx
 
-    if item.scope_completed_date:
-        return "Ontime" if item.scope_completed_date <= item.targeted_end_date else "Delay"
-    else:
-        return "Ontime" if today <= item.targeted_end_date else "Delay"
+@staff_member_required
+def export_progress_entries(request):
+    """Raw daily entries as CSV (default) or ``?format=xlsx``.
+
+    Filters: ``project`` (repeatable), ``from`` and ``to`` (ISO dates).
+    """
+    try:
+        project_ids = [int(pk) for pk in request.GET.getlist('project')]
+        start = date.fromisoformat(request.GET['from']) if request.GET.get('from') else None
+        end = date.fromisoformat(request.GET['to']) if request.GET.get('to') else None
+    except ValueError:
+        return HttpResponse("Invalid project id or date", status=400)
+
+    rows = iter_entry_rows(entry_queryset(project_ids, start, end))
+    filename = f"Progress_Entries_{now().date().isoformat()}"
+
+    if request.GET.get('format') == 'xlsx':
+        # Write-only workbooks still have to be finished before they can be sent.
+        output = tempfile.TemporaryFile()
+        write_xlsx(rows, output)
+        output.seek(0)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f"{filename}.xlsx",
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+    response = StreamingHttpResponse(csv_chunks(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+from django.db.models import Avg, Count, Max, Q
+from .models import SlowRequest
+
+@login_required
+def slow_requests_report(request):
+    if not request.user.is_superuser:
+        return HttpResponseForbidden("Admins only.")
+
+    endpoints = (
+        SlowRequest.objects.values('view_name')
+        .annotate(
+            hits=Count('id'),
+            avg_ms=Avg('total_ms'),
+            max_ms=Max('total_ms'),
+            avg_db_ms=Avg('db_ms'),
+            avg_template_ms=Avg('template_ms'),
+            avg_queries=Avg('query_count'),
+            max_queries=Max('query_count'),
+            n_plus_one=Count('id', filter=Q(duplicate_count__gt=0)),
+            last_seen=Max('created_at'),
+        )
+        .order_by('-avg_ms')
+    )
+
+    return render(request, 'admin_slow_requests.html', {
+        'endpoints': endpoints,
+        'recent': SlowRequest.objects.select_related('user')[:50],
+        'slow_ms': getattr(settings, 'PROFILING_SLOW_MS', 1000),
+    })
+
+
+from .entry_import import ImportFileError, import_entries
+
+IMPORT_ERRORS_SHOWN = 200
+
+@login_required
+def import_progress_entries(request):
+    """Upload historical entries as CSV or XLSX (``dry_run`` validates only)."""
+    if not request.user.is_superuser:
+        return HttpResponseForbidden("Admins only.")
+
+    result = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if upload is None:
+            messages.error(request, "Choose a CSV or XLSX file to import.")
+        elif not upload.name.lower().endswith(('.csv', '.xlsx')):
+            messages.error(request, "Only .csv and .xlsx files can be imported.")
+        else:
+            try:
+                result = import_entries(upload, upload.name, request.user, dry_run=bool(request.POST.get('dry_run')))
+            except ImportFileError as exc:
+                messages.error(request, str(exc))
+
+    return render(request, 'admin_import_entries.html', {
+        'result': result,
+        'errors_shown': result['errors'][:IMPORT_ERRORS_SHOWN] if result else [],
+    })
+
+
+from .scurve import BUCKETS, project_s_curve
+
+def s_curve_etag_part(request):
+    bucket = request.GET.get('bucket', 'day')
+    return f"{query_part('section')(request)}{query_part('item')(request)}-{bucket}"[:80]
+
+@login_required
+@project_access_required
+@project_condition('scurve', project_state(lambda request, project_id: {'pk': project_id}),
+                   extra=s_curve_etag_part)
+def project_s_curve_data(request, project_id):
+    """Planned vs actual cumulative progress of a project, ``?section=<id>`` or ``?item=<id>``.
+
+    ``?bucket=week`` or ``month`` down-samples the daily series.
+    """
+    project = get_object_or_404(ProjectAccess, id=project_id)
+
+    bucket = request.GET.get('bucket', 'day')
+    try:
+        section_id = int(request.GET['section']) if request.GET.get('section') else None
+        item_id = int(request.GET['item']) if request.GET.get('item') else None
+    except ValueError:
+        return HttpResponse("Invalid section or item id", status=400)
+    if bucket not in BUCKETS:
+        return HttpResponse(f"bucket must be one of {', '.join(BUCKETS)}", status=400)
+
+    today = now().date()
+    curve = project_s_curve(project.id, today, section_id, item_id, bucket)
+    if curve is None:
+        raise Http404("No such section or item in this project.")
+
+    return JsonResponse({
+        'project_id': project.id,
+        'section_id': section_id,
+        'item_id': item_id,
+        'today': today,
+        **curve,
+    })
+
+
+from .jobs import rollup_report
+from .pdf import ROLLUP_TEMPLATE, rollup_context, rollup_pdf
+from .rollups import PERIODS, default_range, period_axis, project_rollup
+
+ROLLUP_MAX_PERIODS = 160
+
+def rollup_etag_part(request):
+    if request.GET.get('format') == 'pdf':
+        # Either a file or a queued job; neither is revalidated.
+        return None
+    values = (request.GET.get(name, '')[:10] for name in ('period', 'start', 'end', 'format'))
+    return ''.join(f"-{''.join(c for c in value if c.isalnum() or c == '-')}" for value in values)
+
+def rollup_range(request, today):
+    """``(period, start, end)`` from ``?period=week|month&start=&end=`` (ISO dates); ValueError if invalid."""
+    kind = request.GET.get('period', 'month')
+    if kind not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    default_start, default_end = default_range(kind, today)
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else default_start
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else default_end
+    except ValueError:
+        raise ValueError("start and end must be YYYY-MM-DD dates")
+    if start > end:
+        raise ValueError("start must not be after end")
+    if len(period_axis(kind, start, end)) > ROLLUP_MAX_PERIODS:
+        raise ValueError(f"at most {ROLLUP_MAX_PERIODS} periods per report")
+    return kind, start, end
+
+def rollup_project(request, project_id):
+    """``(project, rollup_range)``, or a 400 response for a bad range."""
+    project = get_object_or_404(ProjectAccess.objects.select_related('user'), id=project_id)
+    try:
+        return project, rollup_range(request, now().date())
+    except ValueError as exc:
+        return project, HttpResponse(str(exc), status=400)
+
+@login_required
+@project_access_required
+@project_condition('rollup', project_state(lambda request, project_id: {'pk': project_id}),
+                   extra=rollup_etag_part)
+def project_rollup_data(request, project_id):
+    """Weekly (``?period=week``) or monthly actual vs planned progress of a project.
+
+    ``?start=`` and ``?end=`` (YYYY-MM-DD) set the range; the default is the
+    last twelve periods up to today.
+    """
+    project, args = rollup_project(request, project_id)
+    if isinstance(args, HttpResponse):
+        return args
+    return JsonResponse({'project_id': project.id, **project_rollup(project, *args)})
+
+@login_required
+@project_access_required
+@project_condition('rollup-report', project_state(lambda request, project_id: {'pk': project_id}),
+                   extra=rollup_etag_part)
+def project_rollup_report(request, project_id):
+    """The rollup as a page, or ``?format=pdf``.
+
+    A PDF already in the cache is sent at once; otherwise the render is
+    queued for the pdf_worker (a large project takes close to a minute) and
+    the answer is the job, as with ``export_project_pdf?async=1``.
+    """
+    project, args = rollup_project(request, project_id)
+    if isinstance(args, HttpResponse):
+        return args
+    today = now().date()
+
+    if request.GET.get('format') != 'pdf':
+        return render(request, ROLLUP_TEMPLATE, rollup_context(project, today, *args))
+
+    path, hit = rollup_pdf(project, today, *args, render=False)
+    if not hit:
+        job = enqueue_pdf_job(project, today, request.user, report=rollup_report(*args))
+        return JsonResponse(pdf_job_payload(request, job), status=202)
+    response = FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f"Project_{project.id}_{args[0].capitalize()}ly_Report.pdf",
+        content_type='application/pdf',
+    )
+    response['X-PDF-Cache'] = 'hit'
+    return response
@@ -0,0 +1,50 @@
+"""Write a ZIP archive as a stream of byte chunks.
+
+``zipfile`` supports non-seekable outputs (entries get data descriptors), so
+each member is compressed straight into a small buffer that is drained after
+every chunk: memory stays at one chunk whatever the archive size.
+"""
+import time
+import zipfile
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _Sink:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_zip(members):
+    """Yield the bytes of a ZIP holding ``members``: ``(arcname, path)`` or ``(arcname, bytes)``."""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for arcname, source in members:
+            info = zipfile.ZipInfo(arcname, time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w') as dest:
+                if isinstance(source, bytes):
+                    dest.write(source)
+                else:
+                    with open(source, 'rb') as handle:
+                        while chunk := handle.read(CHUNK_SIZE):
+                            dest.write(chunk)
+                            if data := sink.drain():
+                                yield data
+            if data := sink.drain():
+                yield data
+    if data := sink.drain():
+        yield data
@@ -52,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'DailyReport.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -108,6 +109,16 @@ DATABASES = {
     }
 }
 
+# Local development and the benchmark suite (manage.py run_benchmarks):
+# DATABASE_ENGINE=sqlite uses a SQLite file instead of MySQL.
+if os.getenv('DATABASE_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DATABASE_NAME') or BASE_DIR / 'db.sqlite3',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -154,6 +165,66 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# The planning editor posts six fields per activity; large plans go well
+# past Django's default of 1000.
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 20000
+
+
+# Generated project PDFs, reused until the project's data changes.
+# Least recently used files are evicted beyond PDF_CACHE_MAX_BYTES.
+PDF_CACHE_DIR = BASE_DIR / 'pdf_cache'
+PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Workers of the process pool shared by all multi-project ZIP exports
+# of one server process.
+PDF_EXPORT_PROCESSES = 2
+
+
+# Project cards per page on the management dashboard.
+DASHBOARD_PAGE_SIZE = 20
+
+# admin-dashboard/stream/ (ASGI): projects per worker chunk and chunks
+# computed at the same time. More concurrency only helps while queries wait
+# on the database server; the metrics themselves hold the GIL.
+DASHBOARD_ASYNC_CHUNK = 5
+DASHBOARD_ASYNC_CONCURRENCY = 2
+
+# Completion forecasts use each activity's average daily progress over the
+# last FORECAST_WINDOW_DAYS days.
+FORECAST_WINDOW_DAYS = 14
+
+# Computed dashboard cards are cached per project and day (see
+# DailyReport/dashboard_cache.py). DASHBOARD_CACHE_BACKEND=file shares them
+# between worker processes through DASHBOARD_CACHE_DIR.
+DASHBOARD_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dashboard',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('DASHBOARD_CACHE_DIR', str(BASE_DIR / 'dashboard_cache')),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        **DASHBOARD_CACHE_BACKENDS[os.getenv('DASHBOARD_CACHE_BACKEND', 'locmem')],
+        'TIMEOUT': 2 * 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Request profiling (DailyReport/profiling.py): Server-Timing on every
+# response, requests slower than PROFILING_SLOW_MS kept in a rolling log
+# shown at custom-admin/slow-requests/.
+PROFILING_ENABLED = True
+PROFILING_SLOW_MS = 1000
+PROFILING_SLOW_LOG_SIZE = 1000
+PROFILING_DUPLICATE_THRESHOLD = 5
+
 LOGIN_URL = '/home/'
 LOGOUT_REDIRECT_URL = '/home/'
 